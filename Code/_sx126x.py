@@ -9,10 +9,10 @@ if implementation.name == 'circuitpython':
         sleep(ms/1000)
 
 def ASSERT(state):
+    # only failures are printed: ASSERT runs several times per packet, and printing
+    # to the USB console on every call slows down the TX path
     if state != ERR_NONE:
         print(f"ASSERT: {ERROR[state]}")
-    else:
-        print("ASSERT: No error")
     # assert state == ERR_NONE, ERROR[state]
 
 def yield_():
@@ -3,7 +3,6 @@ import badge
 class App(badge.BaseApp):
     def __init__(self):
         self.light_status = False
-        self.button_light = False
 
     def on_open(self) -> None:
         me = badge.contacts.my_contact()
@@ -16,17 +15,17 @@ class App(badge.BaseApp):
         self.render_display(me)
 
     def loop(self) -> None:
-        if badge.input.get_button(badge.input.Buttons.SW15):
-            self.button_light = True
-        else:
-            if self.button_light:
+        event = badge.input.get_event()
+        while event is not None:
+            button, pressed, _ = event
+            if button == badge.input.Buttons.SW15 and not pressed:
                 if self.light_status:
                     badge.utils.set_led(False)
                     self.light_status = False
                 else:
                     badge.utils.set_led_pwm(65535)
                     self.light_status = True
-            self.button_light = False
+            event = badge.input.get_event()
 
     def render_display(self, contact) -> None:
         badge.display.fill(1)  # Clear the display
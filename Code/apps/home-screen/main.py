@@ -4,17 +4,15 @@ import utime
 # NOTE: MOST APPS RFC2119-SHOULD-NOT NEED THESE IMPORTS.
 # home-screen is messing with app launches, so it's special.
 # Please especially note that asyncio is not likely to work for
-# normal apps - it _will_ interfere with the main OS's event loop
-import asyncio
+# normal apps - it _will_ interfere with the main OS's event loop,
+# which runs on the other core. Launches are handed over to it.
 from internal_os.internalos import InternalOS
 internal_os = InternalOS.instance()
 
 class App(badge.BaseApp):
     def __init__(self):
         self.cursor_pos = 0
-        self.old_button_f = False
-        self.old_button_b = False
-        self.old_button_l = False
+        self.show_launch_times = False  # debug overlay with the launch timing of the selected app
         self.button_time = utime.ticks_ms()
 
     def on_open(self) -> None:
@@ -30,42 +28,43 @@ class App(badge.BaseApp):
         badge.utils.set_led_pwm(10000)
 
     def loop(self) -> None:
-        if badge.input.get_button(badge.input.Buttons.SW12):
-            self.old_button_b = True
-        else:
-            if self.old_button_b:
-                # just released
-                self.logger.info("Button 1 pressed")
-                self.cursor_pos = (self.cursor_pos - 1) % len(self.get_apps_to_show())
-                self.beep()
-                self.render_home_screen()
-                badge.utils.set_led(False)
-            self.old_button_b = False
+        event = badge.input.get_event()
+        while event is not None:
+            button, pressed, _ = event
+            if not pressed:  # act on release
+                if self.on_button_released(button):
+                    return # don't run the rest of the loop - return control to the OS
+            event = badge.input.get_event()
 
-        if badge.input.get_button(badge.input.Buttons.SW11):
-            self.old_button_f = True
-        else:
-            if self.old_button_f:
-                # just released
-                self.logger.info("Button 8 pressed")
-                self.cursor_pos = (self.cursor_pos + 1) % len(self.get_apps_to_show())
-                self.beep()
-                self.render_home_screen()
-                badge.utils.set_led(False)
-            self.old_button_f = False
-
-        if badge.input.get_button(badge.input.Buttons.SW4):
-            self.old_button_l = True
-        else:
-            if self.old_button_l:
-                # just released
-                self.logger.info("Button 9 pressed")
-                self.logger.info(f"Launching app at position {self.cursor_pos}")
-                self.beep()
-                self.launch_app(self.get_apps_to_show()[self.cursor_pos])
-                badge.utils.set_led(False)
-                return # don't run the rest of the loop - return control to the OS
-            self.old_button_l = False
+    def on_button_released(self, button) -> bool:
+        """
+        Handle a button release.
+        :return: True if an app was launched.
+        """
+        if button == badge.input.Buttons.SW12:
+            self.logger.info("Button 1 pressed")
+            self.cursor_pos = (self.cursor_pos - 1) % len(self.get_apps_to_show())
+            self.beep()
+            self.render_home_screen()
+            badge.utils.set_led(False)
+        elif button == badge.input.Buttons.SW11:
+            self.logger.info("Button 8 pressed")
+            self.cursor_pos = (self.cursor_pos + 1) % len(self.get_apps_to_show())
+            self.beep()
+            self.render_home_screen()
+            badge.utils.set_led(False)
+        elif button == badge.input.Buttons.SW4:
+            self.logger.info("Button 9 pressed")
+            self.logger.info(f"Launching app at position {self.cursor_pos}")
+            self.beep()
+            self.launch_app(self.get_apps_to_show()[self.cursor_pos])
+            badge.utils.set_led(False)
+            return True
+        elif button == badge.input.Buttons.SW5:
+            self.show_launch_times = not self.show_launch_times
+            self.logger.info(f"Launch time overlay {'on' if self.show_launch_times else 'off'}")
+            self.render_home_screen()
+        return False
 
     def render_home_screen(self):
         """Render the home screen display."""
@@ -78,6 +77,8 @@ class App(badge.BaseApp):
             app_y = (i // 3) * 78 + 12
             self.draw_app_icon(app, app_x, app_y, self.cursor_pos == i)
         self.logger.debug(f"Cursor position: {self.cursor_pos}, total apps: {len(self.get_apps_to_show())}")
+        if self.show_launch_times:
+            self.draw_launch_times()
         badge.display.show()
 
     def get_apps_to_show(self):
@@ -91,12 +92,31 @@ class App(badge.BaseApp):
         for i, frag in enumerate([app_repr.display_name[j:j+7] for j in range(0, len(app_repr.display_name), 7)]):
             badge.display.text(frag, x+5, y+50+i*9, 0)
 
+    def draw_launch_times(self):
+        """Overlay the heap use of the selected app and how long launching it took, stage by stage (in ms, averaged over the last launches)."""
+        apps = self.get_apps_to_show()
+        if not apps:
+            return
+        app_repr = apps[self.cursor_pos]
+        stats = internal_os.apps.launch_stats.snapshot(app_repr.app_path)
+        memory = internal_os.apps.app_memory_report(app_repr)
+        badge.display.fill_rect(0, 160, 200, 40, 0)
+        budget = f"/{memory['budget_bytes'] // 1024}" if memory['budget_bytes'] else ""
+        badge.display.text(f"mem {memory.get('steady_bytes', 0) // 1024}K pk{memory.get('peak_bytes', 0) // 1024}K{budget}", 2, 161, 1)
+        if stats is None:
+            badge.display.text("not launched yet", 2, 176, 1)
+            return
+        avg = stats['avg_ms']
+        badge.display.text(f"{stats['avg_total_ms']:.0f}ms avg n={stats['launches']}", 2, 171, 1)
+        badge.display.text(f"stp{avg['stop']:.0f} thr{avg['thread']:.0f} lck{avg['lock']:.0f}", 2, 181, 1)
+        badge.display.text(f"imp{avg['import']:.0f} ini{avg['init']:.0f} opn{avg['open']:.0f}", 2, 191, 1)
+
     def launch_app(self, app_repr) -> None:
         """
         Launch the specified app.
         :param app_repr: The AppRepr instance representing the app to launch.
         """
         self.logger.info(f"Launching app: {app_repr.display_name}")
-        asyncio.create_task(internal_os.apps.launch_app(app_repr))
+        internal_os.apps.request_launch(app_repr)  # we run on core 1, the event loop on core 0
         while internal_os.apps.fg_app_running:
             utime.sleep(0.1)  # Wait for the app machinery to tell us to stop
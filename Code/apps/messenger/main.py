@@ -6,7 +6,6 @@ import logging
 import gc
 import os
 import utime
-import asyncio
 import time
 print(f"Free memory before import: {gc.mem_free()} bytes")
 gc.collect()  # Collect garbage to free up memory
@@ -49,6 +48,17 @@ class Message:
         self._signature_valid = Ecdsa.verify(sigless_msg, self.signature, vk)
         return self._signature_valid
 
+    def check_signature_steps(self):
+        """
+        Same as is_signature_valid(), as a generator that yields regularly while the signature is verified.
+        Use `yield from` to get the result.
+        """
+        if self._signature_valid is not None:
+            return self._signature_valid
+        sigless_msg = struct.pack(SIGLESS_MSG_FMT, self.creation_timestamp, len(self.message), self.message.encode('utf-8') + b'\x00' * (195 - len(self.message)))
+        self._signature_valid = yield from Ecdsa.verifySteps(sigless_msg, self.signature, vk)
+        return self._signature_valid
+
     @classmethod
     def from_bytes(cls, data: bytes) -> 'Message':
         logger = logging.getLogger("Message.from_bytes")
@@ -94,7 +104,7 @@ class Message:
         return struct.pack(MSG_FMT, reserved, self.signature, self.creation_timestamp, length, message_bytes)
     
     def __repr__(self) -> str:
-        return f"Message(creation_timestamp={self.creation_timestamp}, message='{self.message}', signature_valid={self.is_signature_valid()}, signature={self.signature} (r={self.signature.r}, s={self.signature.s}))"
+        return f"Message(creation_timestamp={self.creation_timestamp}, message='{self.message}', signature_valid={self._signature_valid}, signature={self.signature} (r={self.signature.r}, s={self.signature.s}))"
 
 class App(badge.BaseApp):
     def __init__(self) -> None:
@@ -162,7 +172,7 @@ class App(badge.BaseApp):
             badge.display.nice_text('\n'.join(wrapped_message), 0, title_size + 2 + font_size, font_size)
             badge.display.show()
             if self.should_display_message(self.received_message):
-                asyncio.create_task(self.notify())
+                badge.tasks.start(self.notify())
             self.set_last_displayed_message_timestamp(self.received_message.creation_timestamp)
             self.received_message = None
 
@@ -191,48 +201,51 @@ class App(badge.BaseApp):
     async def siren(self) -> None:
         """
         Siren the LED to indicate a new message.
-        This async function runs on the OS thread - make sure it yields properly.
+        This runs as a badge task on the OS thread - make sure it yields properly.
         """
         for i in range(0, 65535, 5000):
             badge.utils.set_led_pwm(i)
-            await asyncio.sleep(0.05)
+            await badge.tasks.sleep(0.05)
         badge.utils.set_led(True)
         for i in range(65535, 0, -5000):
             badge.utils.set_led_pwm(i)
-            await asyncio.sleep(0.05)
+            await badge.tasks.sleep(0.05)
         badge.utils.set_led_pwm(0)
 
     async def ring(self) -> None:
         """
         Ring the buzzer to indicate a new message.
-        This async function runs on the OS thread - make sure it yields properly.
+        This runs as a badge task on the OS thread - make sure it yields properly.
         """
         # siren the buzzer - for loop with audible tones
-        badge.buzzer.tone(523, 0.5)  # C5
-        await asyncio.sleep(0.1)
-        badge.buzzer.tone(392, 0.25)  # G4
-        await asyncio.sleep(0.05)
-        badge.buzzer.tone(392, 0.25)  # G4
-        await asyncio.sleep(0.05)
-        badge.buzzer.tone(415, 0.5)  # G#4
-        await asyncio.sleep(0.1)
-        badge.buzzer.tone(392, 0.5)  # G4
-        await asyncio.sleep(0.6)
-        badge.buzzer.tone(493, 0.5)  # B4
-        await asyncio.sleep(0.1)
-        badge.buzzer.tone(523, 0.5)  # C5
-        await asyncio.sleep(0.1)
+        await badge.buzzer.tone_async(523, 0.5)  # C5
+        await badge.tasks.sleep(0.1)
+        await badge.buzzer.tone_async(392, 0.25)  # G4
+        await badge.tasks.sleep(0.05)
+        await badge.buzzer.tone_async(392, 0.25)  # G4
+        await badge.tasks.sleep(0.05)
+        await badge.buzzer.tone_async(415, 0.5)  # G#4
+        await badge.tasks.sleep(0.1)
+        await badge.buzzer.tone_async(392, 0.5)  # G4
+        await badge.tasks.sleep(0.6)
+        await badge.buzzer.tone_async(493, 0.5)  # B4
+        await badge.tasks.sleep(0.1)
+        await badge.buzzer.tone_async(523, 0.5)  # C5
+        await badge.tasks.sleep(0.1)
         badge.buzzer.no_tone()
 
     async def notify(self) -> None:
         """
         Asynchronously notify the user of a new message.
         """
-
-        # is this the right way to do this?
-        await self.siren()
-        await self.ring()
-        await self.siren()
+        try:
+            await self.siren()
+            await self.ring()
+            await self.siren()
+        finally:
+            # the task is cancelled if the app closes mid-notification
+            badge.utils.set_led_pwm(0)
+            badge.buzzer.no_tone()
 
     def should_display_message(self, message: Message) -> bool:
         """
@@ -241,17 +254,18 @@ class App(badge.BaseApp):
         """
         return message.creation_timestamp > self.get_last_displayed_message_timestamp() and message.is_signature_valid()
     
-    def should_receive_message(self, message: Message) -> bool:
+    def should_receive_message(self, message: Message):
         """
         Confirm that the message is newer than the last one we received,
         and that its signature is valid.
+        Verifying the signature takes seconds, so this is a generator: use `yield from` to get the result.
         """
         last_message = self.get_last_received_message()
-        if last_message is None:
-            return message.is_signature_valid()
-        return message.creation_timestamp > last_message.creation_timestamp and message.is_signature_valid()
+        if last_message is not None and message.creation_timestamp <= last_message.creation_timestamp:
+            return False
+        return (yield from message.check_signature_steps())
 
-    def on_packet(self, packet: badge.radio.Packet, is_foreground: bool) -> None:
+    def on_packet(self, packet: badge.radio.Packet, is_foreground: bool):
         # NOTE to people looking at this for inspiration:
         # It is very bad behavior for most apps to forcibly
         # launch themselves from the background like this.
@@ -261,8 +275,10 @@ class App(badge.BaseApp):
         # Again, your apps RFC2119-SHOULD-NOT do this.
         self.logger.info(f"Received message packet: {packet}")
         # verify it so we don't launch/update on a spoofed or old message
+        # this is a generator, so the OS keeps running between the steps of the signature check
         message = Message.from_bytes(packet.data)
-        if not self.should_receive_message(message):
+        yield
+        if not (yield from self.should_receive_message(message)):
             self.logger.info(f"Not receiving message: {message}")
             return
         # save the message
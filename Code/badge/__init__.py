@@ -4,9 +4,11 @@ from internal_os.baseapp import BaseApp
 import badge.buzzer as buzzer
 import badge.contacts as contacts
 import badge.display as display
+import badge.events as events
 import badge.input as input
 import badge.notifs as notifs
 import badge.radio as radio
+import badge.tasks as tasks
 import badge.time as time
 import badge.utils as utils
 import badge.uart as uart
\ No newline at end of file
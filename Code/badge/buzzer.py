@@ -1,5 +1,6 @@
+import asyncio
 from internal_os.internalos import InternalOS
-import utime
+import badge.time as badge_time
 
 internal_os = InternalOS.instance()
 
@@ -11,6 +12,7 @@ def tone(frequency: float, length: float) -> None:
     """
     if frequency <= 0 or length < 0:
         raise ValueError("Frequency must be positive and length must be non-negative.")
+    internal_os.apps.check_cancelled()
 
     # Set the buzzer frequency
     internal_os.buzzer.freq(int(frequency))
@@ -19,10 +21,26 @@ def tone(frequency: float, length: float) -> None:
     internal_os.buzzer.duty_u16(32768)  # 50% duty cycle
     
     # Wait for the specified length
-    utime.sleep(length)
-    
-    # Stop the buzzer
-    internal_os.buzzer.duty_u16(0)  # Turn off the buzzer
+    try:
+        badge_time.sleep(length)
+    finally:
+        # Stop the buzzer
+        internal_os.buzzer.duty_u16(0)  # Turn off the buzzer
+
+async def tone_async(frequency: float, length: float) -> None:
+    """
+    Play a tone on the buzzer without blocking, for use in coroutines (see badge.tasks).
+    :param frequency: Frequency of the tone in Hz.
+    :param length: Length of the tone in seconds.
+    """
+    if frequency <= 0 or length < 0:
+        raise ValueError("Frequency must be positive and length must be non-negative.")
+    internal_os.buzzer.freq(int(frequency))
+    internal_os.buzzer.duty_u16(32768)  # 50% duty cycle
+    try:
+        await asyncio.sleep(length)
+    finally:
+        internal_os.buzzer.duty_u16(0)
 
 def no_tone() -> None:
     """
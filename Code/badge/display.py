@@ -19,6 +19,7 @@ def _is_display_allowed() -> bool:
     """
     Check if the display is allowed to be used.
     """
+    internal_os.apps.check_cancelled()
     return internal_os.apps.get_current_app_repr() == internal_os.apps.selected_fg_app
 
 def sleep():
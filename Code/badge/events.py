@@ -0,0 +1,54 @@
+"""
+Take packets, button changes and OS notifications in your app's loop(), instead of having
+on_packet called on another core while loop() runs.
+
+Set `queue_events = True` on your app class to use this. The OS queues the events for you
+while your app is in the foreground; take them from loop(), e.g.
+    packet = badge.events.get_packet()
+    while packet is not None:
+        ...
+        packet = badge.events.get_packet()
+Background instances of your app still get packets through on_packet.
+
+Button changes are read with badge.input.get_event() (or wait_event()), whether or not queue_events is set;
+get_button_change() here is the same queue without the timestamps.
+"""
+try:
+    from typing import Optional, Tuple
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+from internal_os.internalos import InternalOS
+import badge.input as badge_input
+from internal_os.hardware.radio import Packet
+from internal_os.apps import NOTIFY_CLOSING, NOTIFY_PACKETS_DROPPED
+
+internal_os = InternalOS.instance()
+
+CLOSING = NOTIFY_CLOSING  # your app is being stopped: return from loop()
+PACKETS_DROPPED = NOTIFY_PACKETS_DROPPED  # packets for your app arrived faster than you took them, some were dropped
+
+def get_packet() -> Optional[Packet]:
+    """
+    Take the oldest packet received for your app.
+    :return: The packet, or None if there is none.
+    """
+    return internal_os.apps.next_fg_event(internal_os.apps.fg_packets)
+
+def get_button_change() -> Optional[Tuple[int, bool]]:
+    """
+    Take the oldest button change: badge.input.get_event() without the time it happened.
+    :return: (button, pressed), with button one of badge.input.Buttons, or None if no button changed.
+    """
+    event = badge_input.get_event()
+    if event is None:
+        return None
+    return event[0], event[1]
+
+def get_notification() -> Optional[int]:
+    """
+    Take the oldest notification from the OS.
+    :return: One of the constants in this module (CLOSING, PACKETS_DROPPED), or None if there is none.
+    """
+    return internal_os.apps.next_fg_event(internal_os.apps.fg_notifications)
@@ -1,10 +1,11 @@
 try:
-    from typing import List, TypeAlias
+    from typing import List, Optional, Tuple, TypeAlias
 except ImportError:
     # we're on an MCU, typing is not available
     pass
 
 import logging
+import utime
 logger = logging.getLogger("Buttons")
 
 from internal_os.internalos import InternalOS
@@ -41,6 +42,42 @@ def get_button(button: Button) -> bool:
     :param button: The button to check.
     :return: True if the button is pressed, False otherwise.
     """
+    internal_os.apps.check_cancelled()
     if button == 0:
         logger.warning("Button 0 is the home button. Your application cannot access it. If you want to detect yourself being closed, implement the on_close function.")
-    return internal_os.buttons.is_pressed(button)
\ No newline at end of file
+    return internal_os.buttons.is_pressed(button)
+
+def get_event() -> Optional[Tuple[Button, bool, int]]:
+    """
+    Take the oldest button change, instead of polling get_button() and comparing with the last state.
+    Changes are queued from the first call on (or from the launch for apps with queue_events set), debounced,
+    and with the time they happened, so presses shorter than a loop() aren't missed.
+    Up to 32 changes are kept; further ones are dropped until the app takes some.
+    :return: (button, pressed, ticks_ms), or None if no button changed. pressed is False when the button was released.
+    """
+    buttons = internal_os.buttons
+    if not buttons.queue_events:
+        buttons.queue_events = True
+    event = internal_os.apps.next_fg_event(buttons.events)
+    if event is not None:
+        buttons.record_taken(event)
+    return event
+
+def wait_event(timeout: Optional[float] = None) -> Optional[Tuple[Button, bool, int]]:
+    """
+    Wait for a button change, see get_event().
+    :param timeout: The longest time to wait, in seconds. None waits until a button changes.
+    :return: (button, pressed, ticks_ms), or None if the timeout passed or the app is being stopped.
+    """
+    deadline = utime.ticks_add(utime.ticks_ms(), int(timeout * 1000)) if timeout is not None else None
+    while True:
+        event = get_event()
+        if event is not None or not internal_os.apps.fg_app_running:
+            return event
+        if deadline is not None:
+            remaining = utime.ticks_diff(deadline, utime.ticks_ms())
+            if remaining <= 0:
+                return None
+            utime.sleep_ms(min(remaining, 5))
+        else:
+            utime.sleep_ms(5)
@@ -4,17 +4,29 @@ from internal_os.hardware.radio import Packet
 
 internal_os = InternalOS.instance()
 
-def send_packet(dest: int, data: bytes) -> None:
+def send_packet(dest: int, data: bytes, reliable: bool = False, on_result=None) -> None:
     """
     Sends a packet over the radio.
     Send a packet. To avoid flooding the radio bandwidth, this method can only send packets at a rate of 1 every 1.5 seconds. Any additional packets are added to a queue.
 
+    :param reliable: Have the destination badge acknowledge the packet, and send it again (up to 3 times) if it doesn't. Only for unicast packets, and the payload can be at most 248 bytes.
+    :param on_result: For reliable packets: a function called with True once the packet is acknowledged, or False if it never was. It runs on the OS core, so keep it short.
     """
 
+    internal_os.apps.check_cancelled()
     selected_app = internal_os.apps.get_current_app_repr()
     if selected_app is None:
         raise AttributeError("no app is currently selected; cannot retrieve app_number.")
     app_number = selected_app.app_number
     if any([p.app_number == app_number for p in internal_os.radio._transmit_queue]):
         raise RuntimeError(f"App {selected_app.display_name} already has a packet in the transmit queue. Please wait until it is sent before sending another packet. (See get_send_queue_size())")
-    internal_os.radio.add_to_tx_queue(dest, app_number, data)
\ No newline at end of file
+    internal_os.radio.add_to_tx_queue(dest, app_number, data, reliable, on_result)
+
+def stats() -> dict:
+    """
+    Get statistics about the radio, e.g. to tell weak links from strong ones.
+    Includes packet counts and rates, CRC failures, an RSSI histogram per sending badge, the airtime
+    this badge has used and how long packets waited in the queues.
+    Received packets also carry their own link quality: see Packet.rssi, Packet.snr and Packet.rx_time.
+    """
+    return internal_os.radio.stats()
@@ -0,0 +1,37 @@
+"""
+Run coroutines for your app on the OS's event loop.
+
+Use this for small pieces of work that mostly wait, like blinking the LED or playing a melody,
+without holding up your app's loop(). Await badge.tasks.sleep() (not time.sleep()) in them,
+so the other tasks on the event loop get to run in between.
+"""
+import asyncio
+from internal_os.internalos import InternalOS
+
+internal_os = InternalOS.instance()
+
+sleep = asyncio.sleep
+sleep_ms = asyncio.sleep_ms
+
+def start(coro) -> None:
+    """
+    Run a coroutine on the event loop.
+    It's cancelled automatically when your app closes, and exceptions it raises are logged instead of crashing the badge.
+    An app can run up to 4 tasks at once.
+    :param coro: The coroutine to run, e.g. `self.blink()` for an `async def blink(self)`.
+    :raise RuntimeError: If your app already runs the maximum number of tasks.
+    """
+    app_repr = internal_os.apps.get_current_app_repr()
+    if app_repr is None:
+        coro.close()
+        raise RuntimeError("badge.tasks.start() can only be called by an app.")
+    internal_os.apps.start_app_task(app_repr, coro)
+
+def running() -> int:
+    """
+    :return: How many tasks your app is running right now.
+    """
+    app_repr = internal_os.apps.get_current_app_repr()
+    if app_repr is None:
+        return 0
+    return internal_os.apps.tasks.running(app_repr.app_path)
@@ -9,6 +9,20 @@ def monotonic():
     """
     return utime.ticks_ms() / 1000.0
 
+def sleep(seconds: float) -> None:
+    """
+    Sleep for the given number of seconds.
+    Prefer this over utime.sleep() in apps: it wakes up early when the app is being stopped.
+    """
+    internal_os = InternalOS.instance()
+    deadline = utime.ticks_add(utime.ticks_ms(), int(seconds * 1000))
+    while True:
+        internal_os.apps.check_cancelled()
+        remaining = utime.ticks_diff(deadline, utime.ticks_ms())
+        if remaining <= 0:
+            return
+        utime.sleep_ms(min(remaining, 50))
+
 def get_epoch_time():
     """
     Returns the current time in seconds since the epoch. NOTE: THIS IS NOT THE UNIX EPOCH!
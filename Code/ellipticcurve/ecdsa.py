@@ -44,3 +44,27 @@ class Ecdsa:
         if v.isAtInfinity():
             return False
         return v.x % curve.N == r
+
+    @classmethod
+    def verifySteps(cls, byteMessage, signature, publicKey, hashfunc=sha256):
+        """
+        Same as verify(), as a generator that yields regularly, so a slow verification can be
+        interleaved with other work. Use `yield from` to get the result.
+        """
+        byteMessage = hashfunc(byteMessage).digest()
+        numberMessage = numberFromByteString(byteMessage)
+        curve = publicKey.curve
+        r = signature.r
+        s = signature.s
+        if not 1 <= r <= curve.N - 1:
+            return False
+        if not 1 <= s <= curve.N - 1:
+            return False
+        inv = Math.inv(s, curve.N)
+        yield
+        u1 = yield from Math.multiplySteps(curve.G, n=(numberMessage * inv) % curve.N, N=curve.N, A=curve.A, P=curve.P)
+        u2 = yield from Math.multiplySteps(publicKey.point, n=(r * inv) % curve.N, N=curve.N, A=curve.A, P=curve.P)
+        v = Math.add(u1, u2, A=curve.A, P=curve.P)
+        if v.isAtInfinity():
+            return False
+        return v.x % curve.N == r
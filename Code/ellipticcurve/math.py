@@ -23,6 +23,42 @@ class Math:
             cls._jacobianMultiply(cls._toJacobian(p), n, N, A, P), P
         )
 
+    @classmethod
+    def multiplySteps(cls, p, n, N, A, P, bitsPerStep=4):
+        """
+        Same as multiply(), as a generator that yields after every `bitsPerStep` bits of the scalar,
+        so the multiplication can be interleaved with other work. Use `yield from` to get the result.
+
+        :param p: First Point to mutiply
+        :param n: Scalar to mutiply
+        :param N: Order of the elliptic curve
+        :param P: Prime number in the module of the equation Y^2 = X^3 + A*X + B (mod p)
+        :param A: Coefficient of the first-order term of the equation Y^2 = X^3 + A*X + B (mod p)
+        :param bitsPerStep: How many bits of the scalar to process between yields
+        :return: Point that represents the sum of First and Second Point
+        """
+        p = cls._toJacobian(p)
+        if p.y == 0 or n == 0:
+            return cls._fromJacobian(Point(0, 0, 1), P)
+
+        if n < 0 or n >= N:
+            n = n % N
+
+        result = Point(0, 0, 1)
+        addend = p
+        bits = 0
+
+        while n:
+            if n & 1:
+                result = cls._jacobianAdd(result, addend, A, P)
+            addend = cls._jacobianDouble(addend, A, P)
+            n >>= 1
+            bits += 1
+            if bits % bitsPerStep == 0:
+                yield
+
+        return cls._fromJacobian(result, P)
+
     @classmethod
     def add(cls, p, q, A, P):
         """
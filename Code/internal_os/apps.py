@@ -4,12 +4,17 @@ except ImportError:
     # we're on an MCU, typing is not available
     pass
 import asyncio
+import gc
 import sys
 from internal_os.baseapp import BaseApp
 from internal_os.hardware.display import BadgeDisplay
 from internal_os.hardware.buttons import BadgeButtons
 from io import StringIO
 from internal_os.hardware.radio import Packet
+from internal_os.launchstats import LaunchStats, LaunchTimer
+from internal_os.looppacer import LoopPacer
+from internal_os.apptasks import AppTasks
+from internal_os.spsc import SPSCQueue
 import logging
 import os
 import json
@@ -30,6 +35,9 @@ class AppRepr:
     permissions: List[str]
     radio_settings: Dict
     app_number: int
+    memory_budget: int = 0  # bytes of heap the app expects to need, 0 if it didn't declare any
+    loop_rate: float = 0  # loop() calls per second, 0 for as fast as possible (see LoopPacer)
+    loop_mode: str = "poll"  # "event" to call loop() only on input, packets and at loop_rate
 
     @classmethod
     def from_json(cls, path: str, json_str: str) -> 'AppRepr':
@@ -47,12 +55,43 @@ class AppRepr:
         app_repr.suppress_notifs = json_data.get("suppressNotifs", False)
         app_repr.permissions = json_data.get("permissions", [])
         app_repr.radio_settings = json_data.get("radioSettings", {})
+        app_repr.memory_budget = json_data.get("memoryBudget", 0)
+        app_repr.loop_rate = json_data.get("loopRate", 0)
+        app_repr.loop_mode = json_data.get("loopMode", "poll")
         try:
             app_repr.app_number = int(json_data.get("appNumber", ""))
         except ValueError:
             raise ValueError(f"Invalid appNumber in manifest for {app_repr.display_name}. It must be an integer.")
         return app_repr
 
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'AppRepr':
+        """
+        Create an AppRepr instance from the output of to_dict().
+        """
+        app_repr = cls()
+        for key, value in data.items():
+            setattr(app_repr, key, value)
+        return app_repr
+
+    def to_dict(self) -> Dict:
+        """
+        The app's attributes, for storing in the app index.
+        """
+        return {
+            'app_path': self.app_path,
+            'display_name': self.display_name,
+            'logo_path': self.logo_path,
+            'full_screen': self.full_screen,
+            'suppress_notifs': self.suppress_notifs,
+            'permissions': self.permissions,
+            'radio_settings': self.radio_settings,
+            'app_number': self.app_number,
+            'memory_budget': self.memory_budget,
+            'loop_rate': self.loop_rate,
+            'loop_mode': self.loop_mode,
+        }
+
     def __eq__(self, value: object) -> bool:
         if not isinstance(value, AppRepr):
             return NotImplemented
@@ -66,11 +105,26 @@ class TimeoutError(Exception):
     def __init__(self, message: str):
         super().__init__(message)
 
-async def acquire_lock(lock: _thread.LockType, timeout: Optional[float] = None):
+class AppCancelled(BaseException):
+    """
+    Raised in the app thread, at calls into the badge API, when the app didn't stop in time by itself.
+    It derives from BaseException so `except Exception` in apps doesn't swallow it.
+    """
+    pass
+
+class MemoryBudgetError(Exception):
+    """
+    Raised in the app thread to stop an app that went over its memory budget while the heap is running out.
+    """
+    def __init__(self, message: str):
+        super().__init__(message)
+
+async def acquire_lock(lock: _thread.LockType, timeout: Optional[float] = None, poll_interval: float = 0.1):
     """
     Acquire a lock asynchronously with an optional timeout.
     :param lock: The lock to acquire.
     :param timeout: Optional timeout in seconds.
+    :param poll_interval: Time in seconds between attempts.
     :return: True if the lock was acquired, False if timed out.
     """
     aquired = False
@@ -83,13 +137,22 @@ async def acquire_lock(lock: _thread.LockType, timeout: Optional[float] = None):
                 elapsed = utime.ticks_diff(utime.ticks_ms(), start_time)
                 if elapsed >= timeout * 1000:
                     raise TimeoutError(f"Failed to acquire lock within {timeout} seconds.")
-            await asyncio.sleep(0.1)  # Yield control to the event loop
+            await asyncio.sleep(poll_interval)  # Yield control to the event loop
+
+def _in_app_thread() -> bool:
+    # thread ident 2 = core 1 = foregrounded app
+    # we can only rely on this because of the RP2040's implementation of get_ident():
+    # https://github.com/micropython/micropython/blob/master/ports/rp2/mpthreadport.c#L123
+    return _thread.get_ident() == 2
 
-def load_app(launch_logger: logging.Logger, app_repr: AppRepr) -> None:
+def load_app(launch_logger: logging.Logger, app_repr: AppRepr, timer: Optional[LaunchTimer] = None) -> None:
     """
     import an app and make sure it's well-formed.
+    :param timer: Marks the 'import' and 'init' stages of a foreground launch, if given.
     """
     applib = __import__(app_repr.app_path + '.main', globals(), locals(), ['App'])
+    if timer:
+        timer.mark('import')
     launch_logger.debug(f"Imported app module: {app_repr.app_path}.main")
     # check that the app has an App class, and that that class descends from BaseApp
     if not hasattr(applib, 'App'):
@@ -100,15 +163,20 @@ def load_app(launch_logger: logging.Logger, app_repr: AppRepr) -> None:
     app_logger = logging.getLogger(app_repr.display_name)
     app_logger.setLevel(logging.DEBUG)
     app = app_class()
+    if timer:
+        timer.mark('init')
     app.logger = app_logger
     return app
 
-def app_thread(app_repr: AppRepr, manager: 'AppManager') -> None:
+def app_thread(app_repr: AppRepr, manager: 'AppManager', timer: Optional[LaunchTimer] = None) -> None:
     """
     The thread that runs the app. It should run synchronously.
     :param app_repr: The AppRepr instance representing the app to run.
     :param manager: The AppManager instance managing the app.
+    :param timer: Times the launch; it's added to manager.launch_stats once on_open returns.
     """
+    if timer:
+        timer.mark('thread')
     # set up logging
     launch_logger = logging.getLogger("AppLaunch-" + app_repr.display_name)
     launch_logger.setLevel(logging.DEBUG)
@@ -116,14 +184,52 @@ def app_thread(app_repr: AppRepr, manager: 'AppManager') -> None:
     # Acquire the lock before running the app
     manager.fg_app_lock.acquire(1) # 1 means block until we get it
     launch_logger.debug(f"Acquired app lock")
+    if timer:
+        timer.mark('lock')
+    app = None
     try:
-        app = load_app(launch_logger, app_repr)
+        mem_before = gc.mem_alloc()
+        app = manager._load_app(launch_logger, app_repr, timer)
         manager.selected_app_instance = app
+        # events left over from the previous app that took them
+        if manager.buttons is not None:
+            manager.buttons.events.clear()
+            manager.buttons.queue_events = app.queue_events  # otherwise from the app's first badge.input.get_event() on
+        if app.queue_events:
+            manager.fg_packets.clear()
+            manager.fg_notifications.clear()
+            manager.fg_queue_events = True
         app.on_open()  # pyright: ignore[reportAttributeAccessIssue] # on_open is defined in BaseApp which is confirmed in load_app
+        if timer:
+            timer.mark('open')
+            manager.launch_stats.record(timer)
+            launch_logger.info(f"App {app_repr.display_name} launched in {sum(timer.durations()) // 1000} ms.")
+        launch_bytes = gc.mem_alloc() - mem_before
+        manager._app_memory(app_repr.app_path)['launch_bytes'] = launch_bytes
+        launch_logger.info(f"Launching {app_repr.display_name} took {launch_bytes} bytes of heap.")
+        manager._sample_app_memory(app_repr, launch_bytes, True)
+        next_sample = utime.ticks_add(utime.ticks_ms(), MEMORY_SAMPLE_INTERVAL_MS)
+        pacer = LoopPacer(app_repr.loop_rate, app_repr.loop_mode == "event")
+        manager.fg_pacer = pacer
+        keep_running = lambda: manager.fg_app_running
         while manager.fg_app_running:
+            if manager.fg_woke_from_lpm:
+                manager.fg_woke_from_lpm = False
+                app.on_wake_from_lpm()
+            pacer.frame_start()
             app.loop() # pyright: ignore[reportAttributeAccessIssue] # loop is defined in BaseApp which is confirmed in load_app
+            pacer.frame_end()
+            if utime.ticks_diff(utime.ticks_ms(), next_sample) >= 0:
+                # gc.mem_alloc() walks the heap's allocation table, so don't call it on every loop
+                next_sample = utime.ticks_add(utime.ticks_ms(), MEMORY_SAMPLE_INTERVAL_MS)
+                manager._sample_app_memory(app_repr, gc.mem_alloc() - mem_before, True)
+            pacer.wait(keep_running)
+        manager._run_before_close(app, app_repr, launch_logger)
         launch_logger.info(f"App {app_repr.display_name} has finished running.")
 
+    except AppCancelled as e:
+        launch_logger.warning(f"App {app_repr.display_name} was cancelled: {e}")
+
     except Exception as e:
         launch_logger.exception(e, f"Error in {app_repr.display_name}:")
         # Display the error on the badge
@@ -143,8 +249,78 @@ def app_thread(app_repr: AppRepr, manager: 'AppManager') -> None:
         except Exception as display_error:
             launch_logger.exception(display_error, f"Failed to display error on badge: {display_error}")
     finally:
+        if manager.fg_pacer is not None:
+            manager._loop_stats[app_repr.app_path] = manager.fg_pacer.stats()
+            manager.fg_pacer = None
+        # drop the app before the next app gets the lock. The modules only it uses are unloaded on core 0
+        # (see unload_exited_apps()): deleting them from sys.modules here could race with imports there.
+        manager.fg_queue_events = False
+        if manager.buttons is not None:
+            manager.buttons.queue_events = False
+        manager.selected_app_instance = None
+        app = None
+        if not manager._is_app_alive(app_repr.app_path):
+            manager.tasks.cancel_app(app_repr.app_path, False)
+        manager._exited_apps.append(app_repr.app_path)
         # Release the lock when done
         manager.fg_app_lock.release()
+        if manager.unload_job is not None:
+            manager.unload_job.trigger()
+
+# modules that stay loaded even if an app happened to import them first
+PINNED_MODULES = ('badge', 'internal_os', 'asyncio', 'logging', 'micropython')
+
+def _is_pinned(module_name: str) -> bool:
+    for pinned in PINNED_MODULES:
+        if module_name == pinned or module_name.startswith(pinned + '.'):
+            return True
+    return False
+
+BG_POOL_SIZE = 2  # background app instances kept alive between packets
+BG_POOL_MIN_FREE = 24 * 1024  # bytes of free heap below which warm instances are evicted before loading another app
+APP_INDEX_FILE = "/app_index.json"  # the registered apps and their manifests' stats, so booting doesn't parse every manifest
+APP_RESCAN_FLAG = "/rescan_apps"  # created by the webflasher after changing apps: ignore the index on the next boot
+MEMORY_SAMPLE_INTERVAL_MS = 250  # how often the heap use of the foreground app is sampled
+MEMORY_LOW_FREE = 16 * 1024  # bytes of free heap below which apps over their memory budget are stopped
+BEFORE_CLOSE_BUDGET_MS = 200  # before_close() calls into the badge API fail after this
+STOP_GRACE_MS = 1000  # time an app gets to return from loop() and run before_close() when asked to stop
+STOP_CANCEL_MS = 4000  # further time after badge API calls start raising AppCancelled, before the badge is reset
+STOP_RESETS_FILE = "/stop_resets.json"  # resets caused by apps that couldn't be stopped, kept across the reset
+
+FG_PACKET_QUEUE_SIZE = 8  # packets waiting for a foreground app that takes its events in loop()
+FG_NOTIFICATION_QUEUE_SIZE = 8  # OS notifications waiting for it
+NOTIFY_CLOSING = 1  # the app is being stopped: return from loop()
+NOTIFY_PACKETS_DROPPED = 2  # the packet queue was full, packets for the app were dropped
+
+HOME_BUTTON_POLL_MS = 1000  # the home button is also checked this often, in case its interrupt was missed
+
+HANDLER_QUEUE_SIZE = 4  # generator packet handlers in progress before received packets have to wait
+HANDLER_STEP_BUDGET_MS = 50  # longest a packet handler should keep the OS event loop busy at once
+HANDLER_TIME_BUDGET_MS = 15000  # longest a generator packet handler may take in total
+
+def _file_stat(path: str) -> Optional[List[int]]:
+    """
+    The size and modification time of a file or directory, or None if it doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat[6], stat[8]]
+
+class _Handler:
+    """
+    A generator packet handler in progress.
+    """
+    def __init__(self, app_repr: AppRepr, app: BaseApp, gen, in_foreground: bool, logger: logging.Logger) -> None:
+        self.app_repr = app_repr
+        self.app = app
+        self.gen = gen
+        self.in_foreground = in_foreground
+        self.logger = logger
+        self.queued_at = utime.ticks_ms()
+        self.steps = 0
+        self.run_ms = 0  # time spent in the steps, as opposed to waiting for a turn
 
 class AppManager:
     """
@@ -156,27 +332,72 @@ class AppManager:
         self.logger.setLevel(logging.DEBUG)
 
         self.buttons = buttons
+        if buttons is not None:
+            # button changes wake event-driven apps up
+            buttons.on_change = self._on_buttons_changed
+            buttons.queue_mask = 0xFFFE  # button 0 is the home button, it belongs to the OS
         self.display = display
 
         self.selected_fg_app: Optional[AppRepr] = None  # The currently selected app, if any
         self.selected_app_instance: Optional[BaseApp] = None  # The currently selected app class, if any
         self.fg_app_running: bool = False  # Whether an app should currently be running
         self.fg_app_lock: _thread.LockType = _thread.allocate_lock()
+        self.fg_pacer: Optional[LoopPacer] = None  # paces the foreground app's loop(), set by the app thread
+        self.fg_app_cancelled: bool = False  # set when the app didn't stop in time: badge API calls raise AppCancelled
+        self.fg_woke_from_lpm: bool = False  # set when the badge leaves low power mode: the app thread calls on_wake_from_lpm()
+        self._before_close_deadline: Optional[int] = None  # ticks_ms after which before_close() gets cancelled
+        self._stop_stats: Dict[str, Dict] = self._load_stop_resets()
+        self.tasks = AppTasks()  # coroutines started by apps through badge.tasks
+        # events for a foreground app with BaseApp.queue_events set, produced on core 0 and taken by the app thread
+        self.fg_queue_events: bool = False  # set by the app thread while such an app is running
+        self.fg_packets = SPSCQueue(FG_PACKET_QUEUE_SIZE)
+        self.fg_notifications = SPSCQueue(FG_NOTIFICATION_QUEUE_SIZE)  # NOTIFY_*
+        self._loop_stats: Dict[str, Dict] = {}  # app path -> LoopPacer.stats() when the app last exited
         self.bg_app_repr: Optional[AppRepr] = None  # The background app, if any
 
         self.backgrounded_apps: List[AppRepr] = []  # Apps that are running in the background
 
         self.registered_apps: List[AppRepr] = []
+        # indexes into registered_apps, kept up to date by _register_app() and _unregister_app()
+        self._apps_by_path: Dict[str, AppRepr] = {}
+        self._apps_by_number: Dict[int, AppRepr] = {}  # the app that receives packets for each app number
+        self._bg_launch_loggers: Dict[str, logging.Logger] = {}
+
+        # warm background app instances, so repeated packets for an app skip the import and construction
+        self._bg_instances: Dict[str, BaseApp] = {}  # app path -> instance
+        self._bg_instance_order: List[str] = []  # least recently used first
+        self.bg_pool_hits = 0
+        self.bg_pool_misses = 0
+        self.bg_pool_evictions = 0
+
+        # generator packet handlers, run by packet_worker()
+        self._handlers: List[_Handler] = []
+        self._handler_queued = asyncio.Event()  # wakes packet_worker()
+        self.handlers_completed = 0
+        self.handler_overruns = 0  # handler calls or steps that took longer than HANDLER_STEP_BUDGET_MS
+        self.handlers_stopped = 0  # handlers that went over HANDLER_TIME_BUDGET_MS
+
+        self._app_index: Dict[str, Dict] = self._load_app_index()  # app path -> {'stat': manifest size and mtime, 'app': AppRepr.to_dict()}
+        self._rescan_requested = False
+        self._launch_requested: Optional[AppRepr] = None
+        self.launch_stats = LaunchStats()
+        # scheduler jobs (see internal_os/scheduler.py), set up by InternalOS
+        self.rescan_job = None  # triggered by request_rescan()
+        self.launch_job = None  # triggered by request_launch()
+        self.unload_job = None  # triggered by the app thread when it exits
+        self.home_button_job = None  # triggered when the home button changes
+
+        # modules each app brought into sys.modules, unloaded once nothing of the app is running anymore
+        self._app_modules: Dict[str, set] = {}
+        self._exited_apps: List[str] = []  # foreground apps whose modules are still to be unloaded, see unload_exited_apps()
+        self._app_memory_stats: Dict[str, Dict[str, int]] = {}  # app path -> heap cost of the last launch and exit
         self.scan_for_apps()
     
     def get_current_app_repr(self) -> AppRepr | None:
         """
         Get the AppRepr of the app that calls this, taking into account whether it's foreground or background.
         """
-        if _thread.get_ident() == 2:
-            # thread ident 2 = core 1 = foregrounded app
-            # we can only rely on this because of the RP2040's implementation of get_ident():
-            # https://github.com/micropython/micropython/blob/master/ports/rp2/mpthreadport.c#L123
+        if _in_app_thread():
             return self.selected_fg_app
         else:
             # we're running on core 0, so it's a background app
@@ -185,150 +406,771 @@ class AppManager:
     def scan_for_apps(self) -> None:
         """
         Scan for apps in the system and register new ones.
+        Apps whose directory, manifest and logo have the same size and modification time as in the app index are
+        registered from the index, without opening any of their files.
         """
         self.logger.info("Scanning for apps...")
         app_dirs = ['/apps/' + d[0] for d in os.ilistdir('/apps') if d[1] == 0x4000]  # 0x4000 is the directory type
-        known_apps = {app.app_path: app for app in self.registered_apps}
+        index_changed = False
         for app_dir in app_dirs:
-            if app_dir not in known_apps:
-                manifest_path = app_dir + '/manifest.json'
-                self.logger.debug(f"Checking for manifest in {manifest_path}")
-                try:
-                    with open(manifest_path, 'r') as f:
-                        json_data = f.read()
-                        app_repr = AppRepr.from_json(app_dir, json_data)
-                        self.registered_apps.append(app_repr)
-                        self.logger.info(f"Registered app: {app_repr.display_name} from {app_dir}")
-                        if app_repr.display_name.strip() == "":
-                            self.logger.warning(f"App in {app_dir} has no display name. Please fix the manifest.")
-                        # check if app logo path exists
-                        try:
-                            with open(app_repr.logo_path, 'rb') as logo_file:
-                                pass
-                        except OSError as e:
-                            self.logger.warning(f"App {app_repr.display_name} in {app_dir} has a logo path that does not exist: {app_repr.logo_path}. Please fix the manifest. Error: {e}")
-                            app_repr.logo_path = "/missingtex.pbm"
-
-                        # TODO: add addl checks for things like paths existing, etc.
-                except OSError as e:
-                    self.logger.error(f"Failed to read manifest for app in {app_dir}. Skipping. Error: {e}")
-                # except json.JSONDecodeError as e:
-                #     self.logger.error(f"Invalid JSON in manifest for app in {app_dir}. Skipping. Error: {e}")
-                except Exception as e:
-                    self.logger.error(f"Unexpected error while registering app in {app_dir}. Skipping. Error: {e}")
-
-        for known_app_dir in known_apps.keys():
-            if known_app_dir not in app_dirs:
+            manifest_path = app_dir + '/manifest.json'
+            stat = _file_stat(manifest_path)
+            dir_stat = _file_stat(app_dir)
+            entry = self._app_index.get(app_dir)
+            if (entry is not None and entry['stat'] == stat and entry.get('dir_stat') == dir_stat
+                    and 'logo' in entry and entry.get('logo_stat') == _file_stat(entry['logo'])):
+                if app_dir not in self._apps_by_path:
+                    self._register_app(AppRepr.from_dict(entry['app']))
+                continue
+
+            # new app, or its manifest, directory or logo changed
+            index_changed = True
+            self._app_index.pop(app_dir, None)
+            if app_dir in self._apps_by_path:
+                self._unregister_app(self._apps_by_path[app_dir])
+                self.logger.info(f"Manifest, directory or logo of {app_dir} changed. Registering it again.")
+            self.logger.debug(f"Checking for manifest in {manifest_path}")
+            try:
+                with open(manifest_path, 'r') as f:
+                    json_data = f.read()
+                    app_repr = AppRepr.from_json(app_dir, json_data)
+                    self._register_app(app_repr)
+                    self.logger.info(f"Registered app: {app_repr.display_name} from {app_dir}")
+                    if app_repr.display_name.strip() == "":
+                        self.logger.warning(f"App in {app_dir} has no display name. Please fix the manifest.")
+                    # check if app logo path exists
+                    logo_path = app_repr.logo_path
+                    try:
+                        with open(app_repr.logo_path, 'rb') as logo_file:
+                            pass
+                    except OSError as e:
+                        self.logger.warning(f"App {app_repr.display_name} in {app_dir} has a logo path that does not exist: {app_repr.logo_path}. Please fix the manifest. Error: {e}")
+                        app_repr.logo_path = "/missingtex.pbm"
+
+                    # TODO: add addl checks for things like paths existing, etc.
+                    # the logo's stat is None while it's missing, so the app is checked again once it's uploaded
+                    self._app_index[app_dir] = {'stat': stat, 'dir_stat': dir_stat, 'logo': logo_path,
+                                                'logo_stat': _file_stat(logo_path), 'app': app_repr.to_dict()}
+            except OSError as e:
+                self.logger.error(f"Failed to read manifest for app in {app_dir}. Skipping. Error: {e}")
+            # except json.JSONDecodeError as e:
+            #     self.logger.error(f"Invalid JSON in manifest for app in {app_dir}. Skipping. Error: {e}")
+            except Exception as e:
+                self.logger.error(f"Unexpected error while registering app in {app_dir}. Skipping. Error: {e}")
+
+        app_dir_set = set(app_dirs)
+        for known_app_dir in list(self._apps_by_path.keys()):
+            if known_app_dir not in app_dir_set:
                 # App has been removed
-                self.registered_apps.remove(known_apps[known_app_dir])
+                self._unregister_app(self._apps_by_path[known_app_dir])
                 self.logger.info(f"Removed app: {known_app_dir}")
+        for indexed_app_dir in list(self._app_index.keys()):
+            if indexed_app_dir not in app_dir_set:
+                del self._app_index[indexed_app_dir]
+                index_changed = True
+
+        if index_changed:
+            self._save_app_index()
+
+    def _load_app_index(self) -> Dict[str, Dict]:
+        """
+        Read the app index written by an earlier scan, unless the webflasher asked for a full rescan.
+        """
+        try:
+            os.remove(APP_RESCAN_FLAG)
+            self.logger.info("Apps were changed by the webflasher. Ignoring the app index.")
+            return {}
+        except OSError:
+            pass  # no rescan requested
+        try:
+            with open(APP_INDEX_FILE, 'r') as f:
+                return json.load(f)
+        except OSError:
+            self.logger.info(f"No app index in {APP_INDEX_FILE}. Scanning all apps.")
+        except ValueError as e:
+            self.logger.error(f"Invalid app index in {APP_INDEX_FILE}. Scanning all apps. Error: {e}")
+        return {}
+
+    def _save_app_index(self) -> None:
+        """
+        Write the app index, replacing the old one only once the new one is complete.
+        """
+        try:
+            with open(APP_INDEX_FILE + '.tmp', 'w') as f:
+                json.dump(self._app_index, f)
+            os.rename(APP_INDEX_FILE + '.tmp', APP_INDEX_FILE)
+        except OSError as e:
+            self.logger.error(f"Failed to write the app index to {APP_INDEX_FILE}: {e}")
+
+    def request_rescan(self) -> None:
+        """
+        Ask for the apps to be scanned again, e.g. after files in /apps were changed. Safe to call from any context.
+        """
+        self._rescan_requested = True
+        if self.rescan_job is not None:
+            self.rescan_job.trigger()
+
+    def _register_app(self, app_repr: AppRepr) -> None:
+        """
+        Add an app to the registry and its indexes.
+        If another app already uses the same app number, packets keep going to the app that was registered first.
+        """
+        self.registered_apps.append(app_repr)
+        self._apps_by_path[app_repr.app_path] = app_repr
+        owner = self._apps_by_number.get(app_repr.app_number)
+        if owner is None:
+            self._apps_by_number[app_repr.app_number] = app_repr
+        else:
+            self.logger.error(f"App {app_repr.display_name} in {app_repr.app_path} uses app number {app_repr.app_number}, which already belongs to {owner.display_name} in {owner.app_path}. Packets for this number will only go to {owner.display_name}. Please pick a different appNumber in the manifest.")
+
+    def _unregister_app(self, app_repr: AppRepr) -> None:
+        """
+        Remove an app from the registry and its indexes.
+        """
+        self.registered_apps.remove(app_repr)
+        del self._apps_by_path[app_repr.app_path]
+        self._bg_launch_loggers.pop(app_repr.app_path, None)
+        self._evict_bg_instance(app_repr.app_path)
+        if self._apps_by_number.get(app_repr.app_number) is app_repr:
+            del self._apps_by_number[app_repr.app_number]
+            # hand the app number to an app that was shadowed by this one, if any
+            for other in self.registered_apps:
+                if other.app_number == app_repr.app_number:
+                    self._apps_by_number[other.app_number] = other
+                    break
     
-    async def scan_forever(self, interval: float = 5.0) -> None:
+    def rescan_if_requested(self) -> None:
         """
-        Continuously scan for apps at a specified interval.
-        :param interval: Time in seconds between scans.
+        Scheduler job, triggered by request_rescan(): scan for apps.
         """
-        while True:
+        if self._rescan_requested:
+            self._rescan_requested = False
             self.scan_for_apps()
-            await asyncio.sleep(interval)
-    
+
+    def request_launch(self, app_repr: AppRepr) -> None:
+        """
+        Have the event loop launch an app. Safe to call from any context, e.g. from the foreground app's thread,
+        which can't create tasks on core 0's event loop itself.
+        """
+        self._launch_requested = app_repr
+        if self.launch_job is not None:
+            self.launch_job.trigger()
+
+    def launch_if_requested(self):
+        """
+        Scheduler job, triggered by request_launch(): launch the requested app.
+        :return: The coroutine that launches it, if one was requested.
+        """
+        app_repr = self._launch_requested
+        if app_repr is None:
+            return None
+        self._launch_requested = None
+        return self.launch_app(app_repr)
+
     async def launch_app(self, app_repr: AppRepr) -> None:
         """
         Launch the specified app.
         :param app_repr: The AppRepr instance representing the app to launch.
         """
+        timer = LaunchTimer(app_repr.app_path)
         if self.fg_app_running:
             # we need to stop the currently running app first
-            self.fg_app_running = False
-            self.logger.info(f"Stopping currently running app: {self.selected_fg_app.display_name if self.selected_fg_app else 'None'}")
-            # The app should see that it's supposed to stop because app_running is set to False.
-            # we'll know when that happens because it will release the app_lock.
-            try:
-                await acquire_lock(self.fg_app_lock, timeout=5.0)
-            except TimeoutError as e:
-                self.logger.critical(f"Failed to stop the currently running app within timeout: {e}")
-                self.logger.critical(f"Soft-resetting the badge in order to recover.")
-                self.logger.critical(f"This is caused by a bug in {self.selected_fg_app.display_name if self.selected_fg_app else 'the currently running app'} (usually an infinite loop).")
-                self.logger.critical(f"Please report this bug to the app's developers.")
-                machine.soft_reset()  # Reset the badge to recover from the stuck app
+            if not await self._stop_fg_app():
                 return
-            # once we have it, we can release it - the app thread should have stopped itself
-            self.fg_app_lock.release()
         
-        # Now we can start the new app
+        # Now we can start the new app, once the old one's modules are gone: no app thread is running now
+        self._unload_exited_apps()
+        timer.mark('stop')
         self.selected_fg_app = app_repr
         self.logger.info(f"Creating app thread for: {app_repr.display_name} from {app_repr.app_path}")
+        self.fg_app_cancelled = False
         self.fg_app_running = True
         # mem_info(True)
         _thread.stack_size(8192)  # Set a larger stack size for the app thread
-        _thread.start_new_thread(app_thread, (app_repr, self))
+        _thread.start_new_thread(app_thread, (app_repr, self, timer))
     
+    async def _stop_fg_app(self) -> bool:
+        """
+        Stop the foreground app in stages:
+        1. Clear fg_app_running. The app thread finishes the current loop(), runs before_close() and exits.
+        2. After STOP_GRACE_MS, set fg_app_cancelled: the app's next call into the badge API raises AppCancelled.
+        3. After another STOP_CANCEL_MS, the app is stuck somewhere it never calls the API: reset the badge.
+        :return: Whether the app stopped (otherwise the badge is resetting).
+        """
+        app_repr = self.selected_fg_app
+        name = app_repr.display_name if app_repr else 'None'
+        stats = self._stop_stats_for(app_repr.app_path if app_repr else 'None')
+        self.logger.info(f"Stopping currently running app: {name}")
+        started = utime.ticks_ms()
+        # The app should see that it's supposed to stop because app_running is set to False.
+        # we'll know when that happens because it will release the app_lock.
+        self.fg_app_running = False
+        if self.fg_queue_events:
+            self.fg_notifications.put(NOTIFY_CLOSING)
+        self.wake_fg_app()
+        stopped = await self._wait_for_app_thread(STOP_GRACE_MS)
+        if not stopped:
+            stats['cancelled'] += 1
+            self.logger.warning(f"App {name} didn't stop within {STOP_GRACE_MS} ms. Cancelling it at its next badge API call.")
+            self.fg_app_cancelled = True
+            self.wake_fg_app()
+            stopped = await self._wait_for_app_thread(STOP_CANCEL_MS)
+        if not stopped:
+            self.logger.critical(f"Failed to stop the currently running app within {STOP_GRACE_MS + STOP_CANCEL_MS} ms.")
+            self.logger.critical(f"Soft-resetting the badge in order to recover.")
+            self.logger.critical(f"This is caused by a bug in {name} (usually an infinite loop).")
+            self.logger.critical(f"Please report this bug to the app's developers.")
+            stats['resets'] += 1
+            self._save_stop_resets()
+            machine.soft_reset()  # Reset the badge to recover from the stuck app
+            return False
+        # once we have it, we can release it - the app thread has stopped itself
+        self.fg_app_lock.release()
+        if app_repr and not self._is_app_alive(app_repr.app_path):
+            # the app thread could only ask its tasks to stop at their next step, we can cancel them right away
+            self.tasks.cancel_app(app_repr.app_path, True)
+
+        elapsed = utime.ticks_diff(utime.ticks_ms(), started)
+        stats['stops'] += 1
+        stats['last_ms'] = elapsed
+        stats['max_ms'] = max(stats['max_ms'], elapsed)
+        stats['total_ms'] += elapsed
+        self.logger.info(f"Stopped {name} in {elapsed} ms.")
+        return True
+
+    async def _wait_for_app_thread(self, timeout_ms: int) -> bool:
+        """
+        Wait for the app thread to give up the app lock.
+        :return: Whether it did (the lock is then held by the caller).
+        """
+        try:
+            await acquire_lock(self.fg_app_lock, timeout=timeout_ms / 1000, poll_interval=0.02)
+            return True
+        except TimeoutError:
+            return False
+
+    def _run_before_close(self, app: BaseApp, app_repr: AppRepr, launch_logger: logging.Logger) -> None:
+        """
+        Run the app's before_close() in the app thread. Its badge API calls raise AppCancelled once BEFORE_CLOSE_BUDGET_MS are up.
+        """
+        started = utime.ticks_ms()
+        self._before_close_deadline = utime.ticks_add(started, BEFORE_CLOSE_BUDGET_MS)
+        try:
+            app.before_close()
+        except AppCancelled:
+            launch_logger.warning(f"before_close of {app_repr.display_name} was cut off after {BEFORE_CLOSE_BUDGET_MS} ms.")
+        except Exception as e:
+            launch_logger.exception(e, f"Error in before_close of {app_repr.display_name}:")
+        finally:
+            self._before_close_deadline = None
+        elapsed = utime.ticks_diff(utime.ticks_ms(), started)
+        if elapsed > BEFORE_CLOSE_BUDGET_MS:
+            self._stop_stats_for(app_repr.app_path)['before_close_overruns'] += 1
+            launch_logger.warning(f"before_close of {app_repr.display_name} took {elapsed} ms (budget {BEFORE_CLOSE_BUDGET_MS} ms).")
+
+    def check_cancelled(self) -> None:
+        """
+        Called by the badge API: stop the foreground app here if it's being cancelled.
+        :raise AppCancelled: If the caller is the app thread and the app has to stop now.
+        """
+        if not _in_app_thread():
+            return
+        if self.fg_app_cancelled:
+            raise AppCancelled("it didn't stop in time")
+        deadline = self._before_close_deadline
+        if deadline is not None and utime.ticks_diff(utime.ticks_ms(), deadline) > 0:
+            raise AppCancelled(f"before_close took longer than {BEFORE_CLOSE_BUDGET_MS} ms")
+
+    def _stop_stats_for(self, app_path: str) -> Dict:
+        stats = self._stop_stats.get(app_path)
+        if stats is None:
+            stats = {'stops': 0, 'last_ms': 0, 'max_ms': 0, 'total_ms': 0, 'cancelled': 0, 'resets': 0, 'before_close_overruns': 0}
+            self._stop_stats[app_path] = stats
+        return stats
+
+    def _load_stop_resets(self) -> Dict[str, Dict]:
+        """
+        The reset counts saved before earlier resets, so they show up in stop_stats().
+        """
+        stop_stats = {}
+        try:
+            with open(STOP_RESETS_FILE, 'r') as f:
+                for app_path, resets in json.load(f).items():
+                    stop_stats[app_path] = {'stops': 0, 'last_ms': 0, 'max_ms': 0, 'total_ms': 0, 'cancelled': 0, 'resets': resets, 'before_close_overruns': 0}
+        except (OSError, ValueError):
+            pass  # no resets yet
+        return stop_stats
+
+    def _save_stop_resets(self) -> None:
+        try:
+            with open(STOP_RESETS_FILE, 'w') as f:
+                json.dump({app_path: stats['resets'] for app_path, stats in self._stop_stats.items() if stats['resets']}, f)
+        except OSError as e:
+            self.logger.error(f"Failed to save reset counts to {STOP_RESETS_FILE}: {e}")
+
+    def stop_stats(self) -> Dict[str, Dict]:
+        """
+        Per app: how long stopping it took (last, max and average in ms), how often it had to be cancelled,
+        how often the badge had to be reset because of it (across resets), and how often before_close went over budget.
+        """
+        result = {}
+        for app_path, stats in self._stop_stats.items():
+            entry = dict(stats)
+            entry['avg_ms'] = stats['total_ms'] // stats['stops'] if stats['stops'] else 0
+            del entry['total_ms']
+            result[app_path] = entry
+        return result
+
     def get_app_by_path(self, app_path: str) -> Optional[AppRepr]:
         """
         Get an app by its path.
         :param app_path: The path of the app to find.
         :return: The AppRepr instance if found, None otherwise.
         """
-        for app in self.registered_apps:
-            if app.app_path == app_path:
-                return app
-        return None
+        return self._apps_by_path.get(app_path)
+
+    def get_app_by_number(self, app_number: int) -> Optional[AppRepr]:
+        """
+        Get the app that receives packets for an app number.
+        :param app_number: The app number from the app's manifest.
+        :return: The AppRepr instance if found, None otherwise.
+        """
+        return self._apps_by_number.get(app_number)
     
+    def wake_fg_app(self) -> None:
+        """
+        Have the foreground app's loop() run right away instead of at its next scheduled time. Safe to call from ISRs.
+        """
+        pacer = self.fg_pacer
+        if pacer is not None:
+            pacer.wake()
+
+    def notify_wake_from_lpm(self) -> None:
+        """
+        Have the app thread call the foreground app's on_wake_from_lpm() before its next loop().
+        """
+        self.fg_woke_from_lpm = True
+        self.wake_fg_app()
+
+    def can_sleep(self) -> bool:
+        """
+        Whether the apps let the badge go to low power mode: no packet handlers or app tasks are running,
+        and the foreground app doesn't set prevent_lpm.
+        """
+        app = self.selected_app_instance
+        return not self._handlers and not self.tasks.any_running() and not (app is not None and app.prevent_lpm)
+
+    def _on_buttons_changed(self, changed: int) -> None:
+        """
+        Called from the scheduled I2C read of the buttons (micropython.schedule), not the ISR, with a bitmask
+        of the buttons that changed. Doesn't allocate. The read has already queued the changes for the foreground
+        app, if it takes them.
+        """
+        if changed & 1 and self.home_button_job is not None:
+            self.home_button_job.trigger()
+        self.wake_fg_app()
+
+    def next_fg_event(self, queue: SPSCQueue):
+        """
+        Take the next event from one of the foreground app's queues (see badge.events).
+        :raise RuntimeError: If not called by the foreground app's thread, the queues' only consumer.
+        """
+        if not _in_app_thread():
+            raise RuntimeError("Events can only be taken by the foreground app, from its loop().")
+        self.check_cancelled()
+        return queue.get()
+
+    def queue_stats(self) -> Dict[str, Dict]:
+        """
+        Fill levels and overflow counts of the foreground app's event queues, and the button event latency.
+        """
+        return {
+            'enabled': self.fg_queue_events,
+            'packets': self.fg_packets.stats(),
+            'buttons': self.buttons.stats() if self.buttons is not None else None,
+            'notifications': self.fg_notifications.stats(),
+        }
+
+    def start_app_task(self, app_repr: AppRepr, coro) -> None:
+        """
+        Run a coroutine for an app on the OS's event loop (see badge.tasks.start).
+        """
+        self.tasks.start(app_repr.app_path, logging.getLogger(app_repr.display_name), coro, not _in_app_thread())
+
+    def loop_stats(self) -> Dict[str, Dict]:
+        """
+        Loop rate and CPU use of the foreground app (live) and of the other apps (when they last ran), by app path.
+        """
+        stats = dict(self._loop_stats)
+        pacer = self.fg_pacer
+        if pacer is not None and self.selected_fg_app:
+            stats[self.selected_fg_app.app_path] = pacer.stats()
+        return stats
+
+    def can_dispatch(self) -> bool:
+        """
+        Whether there's room for another packet handler. While there isn't, received packets wait in the radio's queue.
+        """
+        return len(self._handlers) < HANDLER_QUEUE_SIZE
+
     def dispatch_packet(self, packet: Packet) -> None:
         """
         Dispatch a packet to an app, waking it if necessary.
+        If the app's on_packet is a generator, the packet_worker task runs it one step at a time.
         """
         self.logger.debug(f"Dispatching packet to app: {packet.app_number}")
-        if self.selected_fg_app and self.selected_fg_app.app_number == packet.app_number:
+        # the instance is None while the app is starting or exiting; the packet goes to a background instance then
+        if self.selected_fg_app and self.selected_app_instance is not None and self.selected_fg_app.app_number == packet.app_number:
             self.logger.debug(f"Packet for currently running app {self.selected_fg_app.display_name}.")
-            self.bg_app_repr = self.selected_fg_app
-            try:
-                self.selected_app_instance.on_packet(packet, True)
-            except Exception as e:
-                self.logger.exception(e, f"Error while handling packet in {self.selected_fg_app.display_name}:")
-                # TODO: display error on badge?
-            finally:
-                self.bg_app_repr = None
-                self.logger.debug(f"Packet handled for app {self.selected_fg_app.display_name}.")
+            if self.fg_queue_events:
+                if not self.fg_packets.put(packet):
+                    self.logger.warning(f"Packet queue of {self.selected_fg_app.display_name} is full, dropping packet: {packet}")
+                    self.fg_notifications.put(NOTIFY_PACKETS_DROPPED)
+            else:
+                self._run_handler(self.selected_fg_app, self.selected_app_instance, packet, True, self.logger)
+            self.wake_fg_app()
         else:
             # we need to load the app and run it in the background
             self.logger.debug(f"Packet for app {packet.app_number} not currently running. Loading it.")
-            self.bg_app_repr = None
-            for app in self.registered_apps:
-                if app.app_number == packet.app_number:
-                    self.bg_app_repr = app
-                    self.logger.debug(f"Found app {self.bg_app_repr.display_name} for number {packet.app_number}.")
-                    break
-            if self.bg_app_repr is None:
+            app_repr = self._apps_by_number.get(packet.app_number)
+            if app_repr is None:
                 self.logger.error(f"App with app_number {packet.app_number} not found. Cannot dispatch packet: {packet}")
                 return
 
-            bg_launch_logger = logging.getLogger("BackgroundAppLaunch-" + self.bg_app_repr.display_name)
-            bg_launch_logger.setLevel(logging.DEBUG)
-            bg_launch_logger.info(f"Launching app {self.bg_app_repr.display_name} in background for packet handling.")
+            bg_launch_logger = self._bg_launch_logger(app_repr)
             try:
-                app = load_app(bg_launch_logger, self.bg_app_repr)
-                app.on_packet(packet, False)  # Handle the packet
-                bg_launch_logger.info(f"App {self.bg_app_repr.display_name} handled packet successfully.")
+                app = self._get_bg_instance(bg_launch_logger, app_repr)
             except Exception as e:
-                bg_launch_logger.exception(e, f"Error while handling packet in background app {self.bg_app_repr.display_name}:")
-            finally:
-                self.bg_app_repr = None
+                bg_launch_logger.exception(e, f"Error while loading background app {app_repr.display_name}:")
+                return
+            self._run_handler(app_repr, app, packet, False, bg_launch_logger)
 
-    async def home_button_watcher(self) -> None:
+    def _run_handler(self, app_repr: AppRepr, app: BaseApp, packet: Packet, in_foreground: bool, logger: logging.Logger) -> None:
         """
-        Watch for the home button press and handle it.
-        This will stop the currently running app and return to the home screen.
+        Call an app's on_packet. A plain handler runs to completion here; a generator is queued for packet_worker.
+        """
+        self.bg_app_repr = app_repr
+        start = utime.ticks_ms()
+        mem_before = gc.mem_alloc()
+        try:
+            handler = app.on_packet(packet, in_foreground)
+        except Exception as e:
+            logger.exception(e, f"Error while handling packet in {app_repr.display_name}:")
+            if not in_foreground:
+                # don't reuse an instance that may be in a broken state
+                self._evict_bg_instance(app_repr.app_path)
+            return
+        finally:
+            self.bg_app_repr = None
+        if not self._check_packet_memory(app_repr, gc.mem_alloc() - mem_before, in_foreground):
+            if hasattr(handler, 'close'):
+                handler.close()
+            return
+        elapsed = utime.ticks_diff(utime.ticks_ms(), start)
+        if elapsed > HANDLER_STEP_BUDGET_MS:
+            self.handler_overruns += 1
+            logger.warning(f"on_packet of {app_repr.display_name} blocked the OS for {elapsed} ms. Make it a generator that yields between chunks of work.")
+
+        if hasattr(handler, 'send'):
+            self._handlers.append(_Handler(app_repr, app, handler, in_foreground, logger))
+            self._handler_queued.set()
+        else:
+            logger.debug(f"App {app_repr.display_name} handled packet successfully.")
+
+    async def packet_worker(self) -> None:
+        """
+        Run the queued generator packet handlers, one step at a time and taking turns, yielding to the other OS tasks after every step.
+        Steps that take longer than HANDLER_STEP_BUDGET_MS are logged; handlers that take longer than HANDLER_TIME_BUDGET_MS in total are stopped.
         """
         while True:
-            await asyncio.sleep(0.1)
-            if self.buttons.is_pressed(0) and self.fg_app_running:  # Assuming button 0 is the home button
-                self.logger.info("Home button pressed. Running before close function, then stopping current app and launching home-screen.")
-                if self.fg_app_running and self.selected_app_instance:
-                    self.selected_app_instance.before_close()
-                home_app = self.get_app_by_path('/apps/home-screen')
-                if not home_app:
-                    self.logger.error("Home app not found. Cannot return to home screen.")
-                    continue
-                await self.launch_app(home_app)
+            if not self._handlers:
+                await self._handler_queued.wait()
+                self._handler_queued.clear()
+                continue
+            handler = self._handlers.pop(0)
+            if self._step_handler(handler):
+                self._handlers.append(handler)
+            await asyncio.sleep(0)
+
+    def _step_handler(self, handler: '_Handler') -> bool:
+        """
+        Run one step of a generator packet handler.
+        :return: Whether the handler has more steps to run.
+        """
+        app_repr = handler.app_repr
+        self.bg_app_repr = app_repr
+        start = utime.ticks_ms()
+        mem_before = gc.mem_alloc()
+        try:
+            next(handler.gen)
+            done = False
+        except StopIteration:
+            done = True
+        except Exception as e:
+            handler.logger.exception(e, f"Error while handling packet in {app_repr.display_name}:")
+            if not handler.in_foreground:
+                self._evict_bg_instance(app_repr.app_path)
+            return False
+        finally:
+            self.bg_app_repr = None
+        if not self._check_packet_memory(app_repr, gc.mem_alloc() - mem_before, handler.in_foreground):
+            handler.gen.close()
+            return False
+        elapsed = utime.ticks_diff(utime.ticks_ms(), start)
+        handler.steps += 1
+        handler.run_ms += elapsed
+        if elapsed > HANDLER_STEP_BUDGET_MS:
+            self.handler_overruns += 1
+            handler.logger.warning(f"Step {handler.steps} of the packet handler of {app_repr.display_name} took {elapsed} ms (budget {HANDLER_STEP_BUDGET_MS} ms).")
+
+        if done:
+            self.handlers_completed += 1
+            if handler.in_foreground:
+                self.wake_fg_app()
+            if app_repr.app_path in self._app_modules and not self._is_app_alive(app_repr.app_path):
+                # its instance was evicted while the handler ran
+                self._unload_app_modules(app_repr.app_path)
+            handler.logger.debug(f"App {app_repr.display_name} handled packet in {handler.steps} steps, {handler.run_ms} ms of work over {utime.ticks_diff(utime.ticks_ms(), handler.queued_at)} ms.")
+            return False
+        if utime.ticks_diff(utime.ticks_ms(), handler.queued_at) > HANDLER_TIME_BUDGET_MS:
+            self.handlers_stopped += 1
+            handler.logger.error(f"Packet handler of {app_repr.display_name} ran for more than {HANDLER_TIME_BUDGET_MS} ms. Stopping it.")
+            handler.gen.close()
+            return False
+        return True
+
+    def handler_stats(self) -> Dict:
+        """
+        Statistics about packet handlers.
+        """
+        return {
+            'queued': len(self._handlers),
+            'completed': self.handlers_completed,
+            'overruns': self.handler_overruns,
+            'stopped': self.handlers_stopped,
+        }
+
+    def _get_bg_instance(self, launch_logger: logging.Logger, app_repr: AppRepr) -> BaseApp:
+        """
+        Get a live instance of an app to handle packets in the background, loading it if it isn't warm yet.
+        """
+        app_path = app_repr.app_path
+        app = self._bg_instances.get(app_path)
+        if app is not None:
+            self.bg_pool_hits += 1
+            self._bg_instance_order.remove(app_path)
+            self._bg_instance_order.append(app_path)
+            return app
+
+        self.bg_pool_misses += 1
+        # make room first: the pool is full, or the heap is too low to load another app next to the warm ones
+        while self._bg_instance_order and (len(self._bg_instance_order) >= BG_POOL_SIZE or gc.mem_free() < BG_POOL_MIN_FREE):
+            self._evict_bg_instance(self._bg_instance_order[0])
+        launch_logger.info(f"Launching app {app_repr.display_name} in background for packet handling.")
+        mem_before = gc.mem_alloc()
+        app = self._load_app(launch_logger, app_repr)
+        self._app_memory(app_path)['bg_launch_bytes'] = gc.mem_alloc() - mem_before
+        self._bg_instances[app_path] = app
+        self._bg_instance_order.append(app_path)
+        return app
+
+    def _evict_bg_instance(self, app_path: str) -> None:
+        """
+        Drop a warm background instance, giving it a chance to clean up first.
+        """
+        app = self._bg_instances.pop(app_path, None)
+        if app is None:
+            return
+        self._bg_instance_order.remove(app_path)
+        self.bg_pool_evictions += 1
+        try:
+            app.on_evict()
+        except Exception as e:
+            self.logger.exception(e, f"Error in on_evict of {app_path}:")
+        del app
+        if not self._is_app_alive(app_path):
+            self.tasks.cancel_app(app_path, True)
+        self._unload_app_modules(app_path)
+
+    def _load_app(self, launch_logger: logging.Logger, app_repr: AppRepr, timer: Optional[LaunchTimer] = None) -> BaseApp:
+        """
+        load_app(), remembering which modules the app brought into sys.modules.
+        """
+        before = set(sys.modules)
+        try:
+            return load_app(launch_logger, app_repr, timer)
+        finally:
+            # also when loading fails: a half-imported app leaves modules behind too
+            modules = self._app_modules.setdefault(app_repr.app_path, set())
+            for name in list(sys.modules):
+                if name not in before and not _is_pinned(name):
+                    modules.add(name)
+
+    def _is_app_alive(self, app_path: str) -> bool:
+        """
+        Whether an instance of the app is in use: in the foreground, in the warm pool or handling a packet.
+        """
+        if app_path in self._bg_instances:
+            return True
+        if self.selected_app_instance is not None and self.selected_fg_app and self.selected_fg_app.app_path == app_path:
+            return True
+        for handler in self._handlers:
+            if handler.app_repr.app_path == app_path:
+                return True
+        return False
+
+    def _unload_app_modules(self, app_path: str) -> None:
+        """
+        Once nothing of an app is running anymore, remove the modules it brought in from sys.modules
+        (except ones another loaded app brought in too) and collect the garbage.
+        Modules that another app imported after this one loaded them stay referenced by that app until it's done.
+        """
+        if self._is_app_alive(app_path):
+            return
+        modules = self._app_modules.pop(app_path, None)
+        mem_before = gc.mem_alloc()
+        unloaded = 0
+        if modules:
+            shared = set()
+            for other in list(self._app_modules.values()):
+                shared.update(other)
+            for name in modules:
+                if name not in shared and name in sys.modules:
+                    del sys.modules[name]
+                    unloaded += 1
+        gc.collect()
+        freed = mem_before - gc.mem_alloc()
+        stats = self._app_memory(app_path)
+        stats['exit_freed_bytes'] = freed
+        stats['modules_unloaded'] = unloaded
+        self.logger.info(f"Unloaded {unloaded} modules of {app_path}, freeing {freed} bytes.")
+
+    def unload_exited_apps(self) -> None:
+        """
+        Scheduler job, triggered by the app thread when it exits: unload the modules of the foreground apps that exited.
+        Only runs while no app thread holds fg_app_lock, so that sys.modules doesn't change while core 1 imports.
+        Otherwise the next launch_app() unloads them before it starts the new app thread.
+        """
+        if not self._exited_apps or not self.fg_app_lock.acquire(0):
+            return
+        try:
+            self._unload_exited_apps()
+        finally:
+            self.fg_app_lock.release()
+
+    def _unload_exited_apps(self) -> None:
+        while self._exited_apps:
+            self._unload_app_modules(self._exited_apps.pop(0))
+
+    def _app_memory(self, app_path: str) -> Dict[str, int]:
+        stats = self._app_memory_stats.get(app_path)
+        if stats is None:
+            stats = {}
+            self._app_memory_stats[app_path] = stats
+        return stats
+
+    def _sample_app_memory(self, app_repr: AppRepr, used: int, in_foreground: bool) -> None:
+        """
+        Record how much heap an app uses and enforce its memory budget.
+        Going over the budget is logged; if the heap is also running out, the app is stopped.
+        The figure is heap-global, not per app: gc.mem_alloc() can't tell whose objects it counts, so it includes
+        what core 0 (the OS, the radio, background apps) allocated meanwhile, and garbage that wasn't collected yet.
+        Before a sample over the budget counts, the garbage is collected and the heap measured again.
+        :param used: Bytes allocated since the app started loading (foreground) or during a packet handler (background).
+        :raise MemoryBudgetError: If the foreground app has to stop.
+        """
+        budget = app_repr.memory_budget
+        if budget > 0 and used > budget:
+            base = gc.mem_alloc() - used
+            gc.collect()
+            used = max(0, gc.mem_alloc() - base)
+        stats = self._app_memory(app_repr.app_path)
+        stats['current_bytes'] = used
+        if used > stats.get('peak_bytes', 0):
+            stats['peak_bytes'] = used
+        if in_foreground:
+            # moving average of the samples: what the app needs while it runs, as opposed to short peaks
+            steady = stats.get('steady_bytes')
+            stats['steady_bytes'] = used if steady is None else steady + (used - steady) // 8
+
+        over = budget > 0 and used > budget
+        if over and not stats.get('over_budget'):
+            stats['budget_overruns'] = stats.get('budget_overruns', 0) + 1
+            self.logger.warning(f"App {app_repr.display_name} uses {used} bytes of heap, more than its memory budget of {budget} bytes.")
+        stats['over_budget'] = over
+        if over and in_foreground and gc.mem_free() < MEMORY_LOW_FREE:
+            stats['stopped'] = stats.get('stopped', 0) + 1
+            raise MemoryBudgetError(f"Stopped: uses {used} bytes, over its budget of {budget} bytes, and the heap is almost full.")
+
+    def _check_packet_memory(self, app_repr: AppRepr, allocated: int, in_foreground: bool) -> bool:
+        """
+        Account the heap a packet handler (or one of its steps) allocated to its app.
+        :return: False if a background handler went over the app's budget while the heap is running out and was stopped.
+        """
+        stats = self._app_memory(app_repr.app_path)
+        if allocated > stats.get('packet_peak_bytes', 0):
+            stats['packet_peak_bytes'] = allocated
+        if in_foreground:
+            return True  # the app thread's samples include it
+        self._sample_app_memory(app_repr, stats.get('bg_launch_bytes', 0) + allocated, False)
+        if stats['over_budget'] and gc.mem_free() < MEMORY_LOW_FREE:
+            stats['stopped'] = stats.get('stopped', 0) + 1
+            self.logger.error(f"Stopping the packet handler of {app_repr.display_name}: it's over its memory budget and the heap is almost full.")
+            self._evict_bg_instance(app_repr.app_path)
+            return False
+        return True
+
+    def memory_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Heap use per app, in bytes: what the last foreground launch (including on_open) and background launch took,
+        the current, peak and steady-state use, the biggest allocation of a packet handler, budget overruns,
+        and what unloading the app freed the last time it exited.
+        """
+        return self._app_memory_stats
+
+    def app_memory_report(self, app_repr: AppRepr) -> Dict[str, int]:
+        """
+        The memory figures of one app together with its budget, for diagnostics screens.
+        """
+        stats = dict(self._app_memory_stats.get(app_repr.app_path, {}))
+        stats['budget_bytes'] = app_repr.memory_budget
+        return stats
+
+    def bg_pool_stats(self) -> Dict:
+        """
+        Statistics about the warm background app instances.
+        """
+        return {
+            'size': len(self._bg_instance_order),
+            'apps': list(self._bg_instance_order),
+            'hits': self.bg_pool_hits,
+            'misses': self.bg_pool_misses,
+            'evictions': self.bg_pool_evictions,
+        }
+
+    def _bg_launch_logger(self, app_repr: AppRepr) -> logging.Logger:
+        """
+        The logger for launching an app in the background, created once per app.
+        """
+        bg_launch_logger = self._bg_launch_loggers.get(app_repr.app_path)
+        if bg_launch_logger is None:
+            bg_launch_logger = logging.getLogger("BackgroundAppLaunch-" + app_repr.display_name)
+            bg_launch_logger.setLevel(logging.DEBUG)
+            self._bg_launch_loggers[app_repr.app_path] = bg_launch_logger
+        return bg_launch_logger
+
+    def check_home_button(self):
+        """
+        Scheduler job, triggered by the button interrupt and polled as a fallback: handle a home button press.
+        This will stop the currently running app and return to the home screen.
+        :return: The coroutine that launches the home screen, if the button is pressed.
+        """
+        if self.buttons.is_pressed(0) and self.fg_app_running:  # Assuming button 0 is the home button
+            self.logger.info("Home button pressed. Stopping current app and launching home-screen.")
+            home_app = self.get_app_by_path('/apps/home-screen')
+            if not home_app:
+                self.logger.error("Home app not found. Cannot return to home screen.")
+                return None
+            return self.launch_app(home_app)
+        return None
 
@@ -0,0 +1,173 @@
+""" Coroutines that apps run on the OS's event loop (core 0), see badge.tasks """
+import asyncio
+import logging
+import utime
+
+try:
+    from typing import Dict, List
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+MAX_TASKS_PER_APP = 4  # coroutines one app may have running at once
+SLOW_STEP_US = 50_000  # steps (code between two awaits) longer than this are logged
+
+class _AppTaskStats:
+    def __init__(self) -> None:
+        self.tasks: List = []  # the asyncio tasks currently running
+        self.started = 0
+        self.failed = 0  # ended with an exception
+        self.cancelled = 0  # cancelled because the app closed
+        self.busy_us = 0  # event loop time spent in the app's coroutines
+        self.steps = 0
+        self.slow_steps = 0
+        self.closing = False  # the app closed: end its coroutines at their next step
+
+class AppTasks:
+    """
+    Runs app-owned coroutines on core 0, isolated from the OS's own tasks.
+
+    Each coroutine is wrapped in a proxy generator that steps it (MicroPython's asyncio drives coroutines as
+    generators, so the proxy passes its yields through unchanged). The proxy times every step and charges it
+    to the app, contains exceptions (logged, never reaching the event loop) and ends the coroutine once the
+    app has closed. Coroutines started from the app thread on core 1 are handed over to core 0 through a
+    list that a scheduler job empties, since asyncio isn't thread-safe.
+    """
+    def __init__(self) -> None:
+        self.logger = logging.getLogger("AppTasks")
+        self.logger.setLevel(logging.DEBUG)
+        self._apps: Dict[str, _AppTaskStats] = {}
+        self._pending: List = []  # (app_path, logger, coro) started on core 1, waiting to be created on core 0
+        self.pending_job = None  # scheduler job that runs start_pending(), set up by InternalOS
+
+    def _stats(self, app_path: str) -> _AppTaskStats:
+        stats = self._apps.get(app_path)
+        if stats is None:
+            stats = _AppTaskStats()
+            self._apps[app_path] = stats
+        return stats
+
+    def start(self, app_path: str, logger: logging.Logger, coro, on_core_0: bool) -> None:
+        """
+        Start a coroutine for an app.
+        :param on_core_0: Whether the caller runs on the event loop's core (otherwise it's handed over).
+        :raise RuntimeError: If the app already runs MAX_TASKS_PER_APP coroutines.
+        """
+        stats = self._stats(app_path)
+        running = len(stats.tasks) + sum(1 for pending in self._pending if pending[0] == app_path)
+        if running >= MAX_TASKS_PER_APP:
+            coro.close()
+            raise RuntimeError(f"App {app_path} already runs {running} tasks, the maximum is {MAX_TASKS_PER_APP}.")
+        stats.closing = False
+        if on_core_0:
+            self._create(app_path, logger, coro)
+        else:
+            self._pending.append((app_path, logger, coro))
+            if self.pending_job is not None:
+                self.pending_job.trigger()
+
+    def _create(self, app_path: str, logger: logging.Logger, coro) -> None:
+        stats = self._stats(app_path)
+        stats.started += 1
+        task = asyncio.create_task(self._run(stats, logger, coro))
+        stats.tasks.append(task)
+
+    def start_pending(self) -> None:
+        """
+        Scheduler job, triggered by start() on core 1: create the tasks that apps started from core 1.
+        """
+        while self._pending:
+            app_path, logger, coro = self._pending.pop(0)
+            if self._stats(app_path).closing:
+                coro.close()
+            else:
+                self._create(app_path, logger, coro)
+
+    def _run(self, stats: _AppTaskStats, logger: logging.Logger, coro):
+        """
+        The proxy generator: steps `coro`, timing each step and containing its exceptions.
+        """
+        task = asyncio.current_task()
+        thrown = None
+        try:
+            while True:
+                if stats.closing:
+                    stats.cancelled += 1
+                    coro.close()
+                    return
+                start = utime.ticks_us()
+                try:
+                    if thrown is None:
+                        yielded = coro.send(None)
+                    else:
+                        yielded = coro.throw(thrown)
+                except StopIteration:
+                    return
+                except asyncio.CancelledError:
+                    stats.cancelled += 1
+                    return
+                except Exception as e:
+                    stats.failed += 1
+                    logger.exception(e, "Error in app task:")
+                    return
+                finally:
+                    elapsed = utime.ticks_diff(utime.ticks_us(), start)
+                    stats.busy_us += elapsed
+                    stats.steps += 1
+                    if elapsed > SLOW_STEP_US:
+                        stats.slow_steps += 1
+                        logger.warning(f"App task blocked the event loop for {elapsed // 1000} ms between awaits.")
+                try:
+                    yield yielded
+                    thrown = None
+                except GeneratorExit:
+                    coro.close()
+                    raise
+                except BaseException as e:
+                    # cancellation (or another exception the event loop throws in): pass it on to the coroutine
+                    thrown = e
+        finally:
+            if task in stats.tasks:
+                stats.tasks.remove(task)
+
+    def cancel_app(self, app_path: str, on_core_0: bool) -> None:
+        """
+        End all coroutines of an app, e.g. because it closed.
+        From core 0 they're cancelled right away; otherwise they end at their next step.
+        """
+        stats = self._apps.get(app_path)
+        if stats is None:
+            return
+        stats.closing = True
+        if on_core_0:
+            for task in list(stats.tasks):
+                task.cancel()
+
+    def running(self, app_path: str) -> int:
+        stats = self._apps.get(app_path)
+        return len(stats.tasks) if stats else 0
+
+    def any_running(self) -> bool:
+        """
+        Whether any app has a coroutine running or waiting to be started.
+        """
+        if self._pending:
+            return True
+        for stats in self._apps.values():
+            if stats.tasks:
+                return True
+        return False
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Per app: running, started, failed and cancelled tasks, and the event loop time they used.
+        """
+        return {app_path: {
+            'running': len(stats.tasks),
+            'started': stats.started,
+            'failed': stats.failed,
+            'cancelled': stats.cancelled,
+            'busy_ms': stats.busy_us // 1000,
+            'steps': stats.steps,
+            'slow_steps': stats.slow_steps,
+        } for app_path, stats in self._apps.items()}
@@ -6,6 +6,8 @@ class BaseApp:
     An abstract class that applications must inherit from.
     """
     logger: logging.Logger # set up by the app launcher
+    queue_events: bool = False # set to True to take packets and button changes from badge.events in loop() instead of on_packet
+    prevent_lpm: bool = False # set to True to keep the badge out of low power mode (which pauses loop()) while the app is in the foreground
     def on_open(self) -> None:
         """
         Run once when the app is launched.
@@ -23,6 +25,8 @@ class BaseApp:
     def on_wake_from_lpm(self) -> None:
         """
         Called when the app is woken from low power mode.
+        After a while without input, with the display asleep and the radio idle, the badge sleeps and loop() is paused.
+        A button press or a received packet wakes it up; then this runs in the app thread, before the next loop().
         This method should be overridden by the app if needed.
         """
         pass
@@ -30,7 +34,17 @@ class BaseApp:
     def before_close(self) -> None:
         """
         Called before the app is closed. Should e.g. save state to the FS if needed.
-        Has an enforced 200ms limit.
+        Runs in the app thread after the last loop(). Has an enforced 200ms limit: after that, calls into the badge API raise AppCancelled.
+        This method should be overridden by the app if needed.
+        """
+        pass
+
+    def on_evict(self) -> None:
+        """
+        Called before a background instance of the app is thrown away.
+        To handle packets for apps that aren't in the foreground, the OS keeps a few app instances
+        alive between packets, and drops the least recently used one when it needs the room.
+        Should e.g. save state to the FS if needed.
         This method should be overridden by the app if needed.
         """
         pass
@@ -41,5 +55,9 @@ class BaseApp:
         This method should be overridden by the app if it needs to handle packets.
         NOTE: THIS FUNCTION DOES NOT RUN ON THE SAME THREAD AS THE APP'S MAIN LOOP.
         Treat this like an interrupt handler: be quick and be mindful of concurrency.
+        It runs on the OS's event loop, so while it runs, buttons, the display and the radio wait.
+        For slow work (like verifying a signature), make it a generator: `yield` every few milliseconds,
+        and the OS runs the rest of it in steps, taking care of other things in between.
+        Apps that set queue_events get packets for their foreground instance from badge.events.get_packet() in loop() instead.
         """
         raise NotImplementedError(f"The app {self.__class__.__name__} (running in the {'foreground' if in_foreground else 'background'}) received a packet: {packet}, but does not implement on_packet.")
\ No newline at end of file
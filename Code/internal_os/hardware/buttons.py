@@ -1,7 +1,10 @@
-from machine import I2C, Pin
+from machine import I2C, Pin, Timer
+import micropython
+import utime
+from internal_os.spsc import SPSCQueue
 
 try:
-    from typing import List
+    from typing import Dict, Tuple
 except ImportError:
     # we're on an MCU, typing is not available
     pass
@@ -16,13 +19,26 @@ POL_INVERSION_PORT_1: int = 0x05
 CONFIG_PORT_0: int = 0x06
 CONFIG_PORT_1: int = 0x07
 
+DEBOUNCE_MS = 20  # after a button changes, further changes of it within this time are contact bounce
+EVENT_QUEUE_SIZE = 32
+
 class BadgeButtons:
     """
     The class that manages the buttons on the badge.
+
+    The PCA9555 pulls its INT pin low when a button changes. The pin's (hard) interrupt handler only notes the
+    time and schedules a read with micropython.schedule(); the I2C read and everything after it run in the
+    scheduled callback, outside of interrupt context. The states are kept as a 16-bit mask (bit i set while
+    button i is pressed), so reading them doesn't allocate.
+
+    A change is taken right away, and changes of the same button in the next DEBOUNCE_MS are ignored as bounce;
+    a one-shot timer reads the buttons again once that window is over, so a change that ended during the bounce
+    isn't lost. While queue_events is set, each change is also queued as (button, pressed, ticks_ms) in
+    `events`, for the foreground app.
     """
     interrupt_pin: Pin
     i2c: I2C
-    button_states: List[bool]
+    states: int
 
     def __init__(self) -> None:
         # initialize rp2040 peripherals
@@ -34,26 +50,91 @@ class BadgeButtons:
         self.i2c.writeto_mem(ADDRESS, CONFIG_PORT_1, bytearray([0xff])) # set the top 8 pins as inputs
 
         # initialize internal state
-        self.button_states = [False] * 16  # 16 buttons, all initially not pressed
+        self.states = 0  # bit i is set while button i is pressed
+        self._raw = bytearray(2)  # read buffer for the input ports
+        self.on_change = None  # called (from the scheduled read) with a bitmask of the buttons that changed, e.g. to wake the app thread
+        self.last_change = utime.ticks_ms()  # when a button last changed, for the low power mode's inactivity timeout
+        self._changed_at = [0] * 16  # ticks_ms of each button's last change
+        self.bounces = 0  # reads with changes that were ignored as bounce
+        self._debounce_timer = Timer()
+        self._irq_at = 0  # ticks_ms of the last interrupt, the time of the changes it reports
+        self._read_scheduled = False
+        self._read_cb = self._read  # bound once, so the ISR doesn't allocate it
+        self.interrupts = 0
+        self.reads = 0
+        self.schedule_failures = 0  # micropython.schedule()'s queue was full
+
+        # events for the foreground app: produced by the scheduled read, taken by the app thread
+        self.events = SPSCQueue(EVENT_QUEUE_SIZE)  # (button, pressed, ticks_ms)
+        self.queue_events = False  # set by the app manager while the foreground app takes events
+        self.queue_mask = 0xFFFF  # buttons whose changes are queued
+        self.events_taken = 0
+        self.latency_total_ms = 0  # from the interrupt to the app taking the event
+        self.latency_max_ms = 0
 
-        # set up the interrupt handler
-        self.interrupt_pin.irq(trigger=Pin.IRQ_FALLING, handler=self._update_button_states)
+        # set up the interrupt handler, and pick up buttons that are already held
+        self.interrupt_pin.irq(trigger=Pin.IRQ_FALLING, handler=self._on_interrupt, hard=True)
+        self._on_interrupt(None)
 
-    def _read_raw_inputs(self) -> bytes:
+    def _on_interrupt(self, _: object) -> None:
         """
-        Read the raw state of the input pins from the PCA9555.
+        ISR: schedule a read of the buttons. Doesn't allocate.
         """
-        return self.i2c.readfrom_mem(ADDRESS, INPUT_PORT_0, 2)
-    
-    def _update_button_states(self, _: object) -> None:
+        self._irq_at = utime.ticks_ms()
+        self.interrupts += 1
+        if self._read_scheduled:
+            return
+        self._read_scheduled = True
+        try:
+            micropython.schedule(self._read_cb, None)
+        except RuntimeError:
+            # the queue is full: the debounce timer or the next interrupt reads them
+            self._read_scheduled = False
+            self.schedule_failures += 1
+
+    def _read(self, timer: object) -> None:
+        """
+        Scheduled by the ISR (and run by the debounce timer): read the PCA9555 and update the states.
+        """
+        self._read_scheduled = False  # an interrupt from now on needs another read
+        now = self._irq_at if timer is None else utime.ticks_ms()
+        self.reads += 1
+        raw = self._raw
+        self.i2c.readfrom_mem_into(ADDRESS, INPUT_PORT_0, raw)
+        pressed = ~(raw[0] | (raw[1] << 8)) & 0xFFFF  # active low
+        diff = pressed ^ self.states
+        if not diff:
+            return
+        changed = 0
+        bounced = False
+        i = 0
+        while diff >> i:
+            bit = 1 << i
+            if diff & bit:
+                if 0 <= utime.ticks_diff(now, self._changed_at[i]) < DEBOUNCE_MS:
+                    bounced = True
+                else:
+                    self._changed_at[i] = now
+                    changed |= bit
+                    if self.queue_events and self.queue_mask & bit:
+                        self.events.put((i, bool(pressed & bit), now))
+            i += 1
+        if bounced:
+            self.bounces += 1
+            # look again once the bounce is over
+            self._debounce_timer.init(mode=Timer.ONE_SHOT, period=DEBOUNCE_MS, callback=self._read_cb, hard=False)
+        if changed:
+            self.states ^= changed
+            self.last_change = now
+            if self.on_change is not None:
+                self.on_change(changed)
+
+    def refresh(self) -> None:
         """
-        ISR: Update the button states based on the raw input data.
+        Read the buttons again, e.g. after lightsleep, in case an interrupt was missed.
         """
-        raw_data = self._read_raw_inputs()
-        for i in range(16):
-            # Check if the button is pressed (active low)
-            self.button_states[i] = not (raw_data[i // 8] & (1 << (i % 8)))
-    
+        self._on_interrupt(None)
+
     def is_pressed(self, button_index: int) -> bool:
         """
         Check if a specific button is pressed.
@@ -61,13 +142,39 @@ class BadgeButtons:
         :return: True if the button is pressed, False otherwise.
         """
         if 0 <= button_index < 16:
-            return self.button_states[button_index]
+            return bool(self.states & (1 << button_index))
         else:
             raise ValueError("Button index must be between 0 and 15.")
-    
-    def get_all_states(self) -> List[bool]:
+
+    def get_all_states(self) -> int:
         """
         Get the states of all buttons.
-        :return: A list of boolean values representing the state of each button (True for pressed, False for not pressed).
+        :return: A bitmask: bit i is set while button i is pressed.
+        """
+        return self.states
+
+    def record_taken(self, event: Tuple[int, bool, int]) -> None:
+        """
+        Account the latency of an event the app took from `events`. Only call this from the consumer.
+        """
+        latency = utime.ticks_diff(utime.ticks_ms(), event[2])
+        self.events_taken += 1
+        self.latency_total_ms += latency
+        if latency > self.latency_max_ms:
+            self.latency_max_ms = latency
+
+    def stats(self) -> Dict:
+        """
+        Interrupts and reads, the event queue's counters (overflows are dropped events), bounces, and the latency from the interrupt to the app.
         """
-        return self.button_states.copy()
+        return {
+            'interrupts': self.interrupts,
+            'reads': self.reads,
+            'schedule_failures': self.schedule_failures,
+            'queue_events': self.queue_events,
+            'events': self.events.stats(),
+            'bounces': self.bounces,
+            'taken': self.events_taken,
+            'avg_latency_ms': self.latency_total_ms // self.events_taken if self.events_taken else 0,
+            'max_latency_ms': self.latency_max_ms,
+        }
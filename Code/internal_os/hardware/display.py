@@ -1,10 +1,13 @@
-from machine import Pin, SPI
+from machine import Pin
 from internal_os.hardware.einkdriver import EPD
+from internal_os.hardware.spibus import SPIBus, DISPLAY_BAUDRATE
 import logging
 import utime
-import asyncio
 import _thread 
 
+IDLE_TIMEOUT_MS = 5000  # the display sleeps after this long without activity
+IDLE_CHECK_MS = 1000  # how often check_idle() looks while the display is asleep (it's woken from the app thread)
+
 class LockWrapper:
     """
     Allows use of a _thread lock as a context manager.
@@ -49,13 +52,13 @@ class BadgeDisplay:
     TODO: add partial refresh support
     TODO: if app is not in fullscreen mode, give it a smaller framebuffer and blit it over the main framebuffer
     """
-    def __init__(self):
+    def __init__(self, spi_bus: SPIBus):
         IS_REAL_BADGE = True  # Set to False for testing on a breadboarded version
         self.logger = logging.getLogger("BadgeDisplay")
         self.logger.setLevel(logging.INFO)
         self.logger.info(f"Initializing BadgeDisplay ({'Real Badge' if IS_REAL_BADGE else 'Breadboarded Badge'})")
         # initialize rp2040 peripherals
-        self.spi = SPI(0, baudrate=1_000_000, polarity=0, phase=0, sck=Pin(18), mosi=Pin(19), miso=Pin(20))
+        self.spi = spi_bus.device("display", DISPLAY_BAUDRATE)  # SPI0, shared with the radio
         self.cs = Pin(24 if IS_REAL_BADGE else 13, Pin.OUT)
         self.dc = Pin(25 if IS_REAL_BADGE else 12, Pin.OUT)
         self.rst = Pin(26, Pin.OUT)
@@ -69,17 +72,23 @@ class BadgeDisplay:
         self.is_asleep = True
         self.display_lock = _thread.allocate_lock()
     
-    async def idle_when_inactive(self):
-        while True:
-            current_time = utime.ticks_ms()
-            if utime.ticks_diff(current_time, self.last_action) > 5000 and not self.is_asleep:
-                try:
-                    self.logger.info(f"No activity detected, putting display to sleep")
-                    self.sleep_disp()
-                    self.logger.debug(f"Display is now asleep (self.is_asleep={self.is_asleep}) from thread {_thread.get_ident()}")
-                except NotImplementedError as e:
-                    self.logger.error(f"Display sleep not implemented: {e}")
-            await asyncio.sleep(0.5)
+    def check_idle(self) -> int:
+        """
+        Scheduler job: put the display to sleep after 5 seconds without activity.
+        :return: ms until it should run again.
+        """
+        if self.is_asleep:
+            return IDLE_CHECK_MS
+        remaining = IDLE_TIMEOUT_MS - utime.ticks_diff(utime.ticks_ms(), self.last_action)
+        if remaining > 0:
+            return remaining
+        try:
+            self.logger.info(f"No activity detected, putting display to sleep")
+            self.sleep_disp()
+            self.logger.debug(f"Display is now asleep (self.is_asleep={self.is_asleep}) from thread {_thread.get_ident()}")
+        except NotImplementedError as e:
+            self.logger.error(f"Display sleep not implemented: {e}")
+        return IDLE_CHECK_MS
     
     def reset_idle_timer(self):
         """Reset the idle timer to prevent the display from sleeping for another 5 seconds"""
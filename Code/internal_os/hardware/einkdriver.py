@@ -7,6 +7,7 @@ Handles low-level comms with the display
 
 import framebuf
 import utime
+from internal_os.hardware.spibus import CHUNK_SIZE
 
 # Display resolution
 EPD_WIDTH  = 200
@@ -86,7 +87,7 @@ class EPD:
         Initialize E-Paper display
         
         Args:
-            spi: SPI bus instance
+            spi: The display's device on the shared SPI bus (see spibus.py)
             cs: Chip select pin
             dc: Data/Command pin
             rst: Reset pin
@@ -95,6 +96,7 @@ class EPD:
             height: Display height (default 200)
         """
         self.spi = spi
+        self._byte = bytearray(1)  # for send_command() and send_data(), so they don't allocate
         self.cs = cs
         self.dc = dc
         self.rst = rst
@@ -118,17 +120,34 @@ class EPD:
     
     def send_command(self, command):
         """Send command to display"""
-        self.dc.value(0)
-        self.cs.value(0)
-        self.spi.write(bytearray([command]))
-        self.cs.value(1)
+        self._byte[0] = command
+        with self.spi:
+            self.dc.value(0)
+            self.cs.value(0)
+            self.spi.write(self._byte)
+            self.cs.value(1)
 
     def send_data(self, data):
         """Send data to display"""
-        self.dc.value(1)
-        self.cs.value(0)
-        self.spi.write(bytearray([data]))
-        self.cs.value(1)
+        self._byte[0] = data
+        with self.spi:
+            self.dc.value(1)
+            self.cs.value(0)
+            self.spi.write(self._byte)
+            self.cs.value(1)
+
+    def send_buffer(self, buffer):
+        """
+        Send a block of data to display, in chunks of CHUNK_SIZE bytes.
+        The bus is released between chunks, so the radio doesn't have to wait for a whole frame.
+        """
+        data = memoryview(buffer)
+        for start in range(0, len(data), CHUNK_SIZE):
+            with self.spi:
+                self.dc.value(1)
+                self.cs.value(0)
+                self.spi.write(data[start:start + CHUNK_SIZE])
+                self.cs.value(1)
     
     def reset(self):
         """Reset the display"""
@@ -245,9 +264,9 @@ class EPD:
         h = self.height
         
         self.send_command(WRITE_RAM)
-        for j in range(h):
-            for i in range(w):
-                self.send_data(0xFF)  # White
+        white = memoryview(b'\xff' * CHUNK_SIZE)
+        for start in range(0, w * h, CHUNK_SIZE):
+            self.send_buffer(white[:min(CHUNK_SIZE, w * h - start)])
         
         # Display refresh
         self.display_frame()
@@ -270,9 +289,7 @@ class EPD:
         h = self.height
         
         self.send_command(WRITE_RAM)  # Write to RAM area 0x24
-        for j in range(h):
-            for i in range(w):
-                self.send_data(buffer[i + j * w])
+        self.send_buffer(memoryview(buffer)[:w * h])
         
         
         # Display refresh
@@ -297,9 +314,7 @@ class EPD:
         h = self.height
         
         self.send_command(WRITE_RAM)  # Write to RAM area 0x24
-        for j in range(h):
-            for i in range(w):
-                self.send_data(buffer[i + j * w])
+        self.send_buffer(memoryview(buffer)[:w * h])
         
         # Display refresh with full update
         self.display_frame()
@@ -345,12 +360,10 @@ class EPD:
         
         # Send data for the specified region
         self.send_command(WRITE_RAM)
+        rows = memoryview(buffer)
         for j in range(y, y_end + 1):
-            for i in range(x // 8, (x_end // 8) + 1):
-                # Get the data from the buffer
-                # Adjust index based on full buffer width
-                index = i + j * buffer_width
-                self.send_data(buffer[index])
+            # one row of the region, indexed by the full buffer width
+            self.send_buffer(rows[x // 8 + j * buffer_width:(x_end // 8) + 1 + j * buffer_width])
         
         # Partial display refresh
         self.display_partial_frame()
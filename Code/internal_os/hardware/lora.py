@@ -0,0 +1,94 @@
+""" LoRa link parameters shared by the radio driver setup and the host-side tools """
+
+# these are the settings every badge uses in BadgeRadio.__init__.
+# badges can only talk to each other if all of them agree, so change them here and nowhere else.
+FREQUENCY_MHZ = 923
+BANDWIDTH_KHZ = 500.0
+SPREADING_FACTOR = 7
+CODING_RATE = 8  # 4/8
+SYNC_WORD = 0x12
+TX_POWER_DBM = 22
+PREAMBLE_LENGTH = 8
+CRC_ON = True
+EXPLICIT_HEADER = True
+
+MAX_FRAME_LENGTH = 255  # SX126X_MAX_PACKET_LENGTH
+
+
+def symbol_time_us(sf: int = SPREADING_FACTOR, bw_khz: float = BANDWIDTH_KHZ) -> int:
+    """
+    Duration of a single LoRa symbol in microseconds.
+    """
+    return int(((10 * 1000) << sf) / (10 * bw_khz))
+
+
+def time_on_air_us(length: int, preamble_length: int = PREAMBLE_LENGTH, sf: int = SPREADING_FACTOR,
+                   bw_khz: float = BANDWIDTH_KHZ, cr: int = CODING_RATE, crc: bool = CRC_ON,
+                   explicit_header: bool = EXPLICIT_HEADER) -> int:
+    """
+    Time on air of a LoRa frame in microseconds.
+    This is the same calculation as SX126X.getTimeOnAir(), but it doesn't need a radio, so it can be
+    used for bookkeeping and by the host-side simulator.
+    :param length: Length of the frame (headers included) in bytes.
+    :param cr: Coding rate denominator (5-8), as passed to SX1262.begin().
+    """
+    symbol_us = symbol_time_us(sf, bw_khz)
+    sf_coeff1_x4 = 17
+    sf_coeff2 = 8
+    if sf == 5 or sf == 6:
+        sf_coeff1_x4 = 25
+        sf_coeff2 = 0
+    sf_divisor = 4 * sf
+    if symbol_us >= 16000:
+        # low data rate optimization
+        sf_divisor = 4 * (sf - 2)
+    header_bits = 20 if explicit_header else 0
+    crc_bits = 16 if crc else 0
+
+    bit_count = 8 * length + crc_bits - 4 * sf + sf_coeff2 + header_bits
+    if bit_count < 0:
+        bit_count = 0
+    coded_symbols = (bit_count + sf_divisor - 1) // sf_divisor
+
+    symbols_x4 = (preamble_length + 8) * 4 + sf_coeff1_x4 + coded_symbols * cr * 4
+    return (symbol_us * symbols_x4) // 4
+
+
+# receive duty cycling (wake-on-radio): an idle receiver only listens for a few symbols at a time,
+# so senders stretch the preamble of broadcasts to make sure it overlaps one of those listen windows.
+LONG_PREAMBLE_LENGTH = 128
+DUTY_CYCLE_MIN_SYMBOLS = 8
+
+# SX1262 supply current in mA (datasheet, DC-DC regulator)
+RX_CURRENT_MA = 4.6
+TX_CURRENT_MA = 118.0  # +22 dBm
+SLEEP_CURRENT_MA = 0.0012  # warm start, RTC running (needed to time the duty cycle)
+
+
+def rx_duty_cycle_us(sender_preamble_length: int, min_symbols: int = DUTY_CYCLE_MIN_SYMBOLS, tcxo_delay_us: int = 0):
+    """
+    Listen and sleep periods chosen by SX126X.startReceiveDutyCycleAuto() for a given sender preamble.
+    :return: A (listen_us, sleep_us) tuple, or None if the preamble is too short and the radio stays in continuous RX.
+    """
+    if 2 * min_symbols > sender_preamble_length:
+        return None
+    symbol_us = symbol_time_us()
+    sleep_us = symbol_us * (sender_preamble_length - 2 * min_symbols)
+    if sleep_us < tcxo_delay_us + 1016:
+        return None
+    listen_us = int(max((symbol_us * (sender_preamble_length + 1) - (sleep_us - 1000)) / 2, symbol_us * (min_symbols + 1)))
+    return listen_us, sleep_us
+
+
+def average_rx_current_ma(sender_preamble_length: int = 0, min_symbols: int = DUTY_CYCLE_MIN_SYMBOLS) -> float:
+    """
+    Estimated average current while waiting for packets.
+    :param sender_preamble_length: Preamble length the duty cycle is tuned for, or 0 for continuous RX.
+    """
+    periods = rx_duty_cycle_us(sender_preamble_length, min_symbols) if sender_preamble_length else None
+    if periods is None:
+        return RX_CURRENT_MA
+    listen_us, sleep_us = periods
+    # the 1 ms wake-up transition at the end of each sleep period is spent at (roughly) RX current
+    awake_us = listen_us + 1000
+    return (RX_CURRENT_MA * awake_us + SLEEP_CURRENT_MA * (sleep_us - 1000)) / (listen_us + sleep_us)
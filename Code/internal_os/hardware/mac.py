@@ -0,0 +1,68 @@
+""" Channel access: listen-before-talk with randomized exponential backoff """
+import random
+
+try:
+    from time import ticks_add, ticks_diff
+except ImportError:
+    # host-side simulator: plain integer milliseconds, no wraparound
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_diff(end, start):
+        return end - start
+
+class ListenBeforeTalk:
+    """
+    Backoff state for CAD-based listen-before-talk.
+
+    Before each transmission the radio runs channel activity detection. If the channel is busy, the
+    badge waits a random time between 0 and a window that doubles with every busy result (full
+    jitter), so badges that were waiting for the same transmission to end don't all start at once.
+    After `max_attempts` busy results in a row the packet is sent anyway, so a noisy channel can
+    delay traffic but never block it.
+
+    Times are passed in as milliseconds (ticks_ms on the badge), so the same logic runs in the
+    host-side simulator.
+    """
+    def __init__(self, base_ms: int = 64, max_ms: int = 2048, max_attempts: int = 6) -> None:
+        self.enabled = True
+        self.base_ms = base_ms
+        self.max_ms = max_ms
+        self.max_attempts = max_attempts
+
+        self.attempts = 0
+        self._not_before = None
+
+        self.busy_count = 0  # CAD found the channel busy
+        self.backoff_count = 0  # transmissions postponed
+        self.forced_count = 0  # sent despite a busy channel after max_attempts
+
+    def wait_ms(self, now_ms: int) -> int:
+        """
+        :return: How long (ms) until the current backoff expires, 0 if we may transmit.
+        """
+        if self._not_before is None:
+            return 0
+        return max(0, ticks_diff(self._not_before, now_ms))
+
+    def on_busy(self, now_ms: int) -> bool:
+        """
+        Record a busy channel.
+        :return: True if the transmission should be postponed, False if we've waited long enough and should send anyway.
+        """
+        self.busy_count += 1
+        if self.attempts >= self.max_attempts:
+            self.forced_count += 1
+            return False
+        window = min(self.max_ms, self.base_ms << self.attempts)
+        self.attempts += 1
+        self.backoff_count += 1
+        self._not_before = ticks_add(now_ms, random.randint(0, window))
+        return True
+
+    def on_sent(self) -> None:
+        """
+        Record a transmission, resetting the backoff.
+        """
+        self.attempts = 0
+        self._not_before = None
@@ -0,0 +1,130 @@
+""" Controlled flooding of broadcast packets across badges """
+import random
+
+try:
+    from typing import Dict, List, Optional
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+try:
+    from time import ticks_add, ticks_diff
+except ImportError:
+    # host-side simulator: plain integer milliseconds, no wraparound
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_diff(end, start):
+        return end - start
+
+MAX_HOPS = 7  # the hop count is stored in 3 bits of the header
+
+class FloodRelay:
+    """
+    Decides which flooded broadcasts this badge should rebroadcast, and when.
+
+    Every badge that hears a flooded packet for the first time schedules a rebroadcast at a random
+    point in the second half of the relay interval. While it waits, it counts the copies of the same
+    packet it hears, the first one included. If it has heard the original plus `redundancy`
+    rebroadcasts (a count above `redundancy`) before the timer fires, the neighbourhood is already
+    covered and the rebroadcast is suppressed (Trickle-style counter suppression). This keeps the number of transmissions per packet roughly proportional to the
+    area covered instead of to the number of badges.
+
+    Times are passed in as milliseconds (ticks_ms on the badge), so the same logic runs in the
+    host-side simulator.
+    """
+    def __init__(self, hop_limit: int = 4, redundancy: int = 2, interval_ms: int = 4000, cache_size: int = 64) -> None:
+        if not 0 <= hop_limit <= MAX_HOPS:
+            raise ValueError(f"hop_limit must be between 0 and {MAX_HOPS}")
+        if redundancy < 1:
+            raise ValueError("redundancy must be at least 1")
+        self.enabled = False  # when False, packets are still deduplicated but never relayed
+        self.hop_limit = hop_limit
+        self.redundancy = redundancy
+        self.interval_ms = interval_ms
+
+        # key -> number of copies heard. Keys are (source << 16) | message_id.
+        self._heard: Dict[int, int] = {}
+        # ring of recently seen keys, used to evict old entries from _heard
+        self._order: List[Optional[int]] = [None] * cache_size
+        self._order_pos = 0
+        # key -> [fire time in ms, packet to relay]
+        self._pending: Dict[int, list] = {}
+        self._next_message_id = random.getrandbits(16)
+
+        self.relayed = 0
+        self.suppressed = 0
+        self.duplicates = 0
+
+    def _remember(self, key: int) -> None:
+        old = self._order[self._order_pos]
+        if old is not None:
+            self._heard.pop(old, None)
+            self._pending.pop(old, None)
+        self._order[self._order_pos] = key
+        self._order_pos = (self._order_pos + 1) % len(self._order)
+        self._heard[key] = 1
+
+    def originate(self, source: int) -> int:
+        """
+        Allocate a message ID for a broadcast that this badge is sending.
+        The message is marked as seen, so echoes from relays are not delivered back to us.
+        :return: The 16-bit message ID to put in the header.
+        """
+        message_id = self._next_message_id
+        self._next_message_id = (message_id + 1) & 0xFFFF
+        self._remember((source << 16) | message_id)
+        return message_id
+
+    def on_receive(self, source: int, message_id: int, hops: int, packet: object, now_ms: int) -> bool:
+        """
+        Record a received flooded packet.
+        :param packet: Opaque object handed back by next_due() when it's time to relay.
+        :return: True if this is the first copy (and should be delivered to apps), False for duplicates.
+        """
+        key = (source << 16) | message_id
+        count = self._heard.get(key)
+        if count is not None:
+            self._heard[key] = count + 1
+            self.duplicates += 1
+            return False
+        self._remember(key)
+        if self.enabled and hops < self.hop_limit:
+            half = self.interval_ms // 2
+            self._pending[key] = [ticks_add(now_ms, half + random.randint(0, half)), packet]
+        return True
+
+    def next_deadline(self) -> Optional[int]:
+        """
+        :return: The time (ms) at which the earliest pending relay fires, or None if nothing is pending.
+        """
+        deadline = None
+        for fire_at, _ in self._pending.values():
+            if deadline is None or ticks_diff(fire_at, deadline) < 0:
+                deadline = fire_at
+        return deadline
+
+    def next_due(self, now_ms: int) -> Optional[object]:
+        """
+        Pop the next packet whose relay timer has expired and that hasn't been suppressed.
+        Suppressed packets are dropped along the way.
+        :return: The packet passed to on_receive(), or None if nothing needs relaying right now.
+        """
+        while True:
+            due_key = None
+            for key, entry in self._pending.items():
+                if ticks_diff(now_ms, entry[0]) >= 0:
+                    due_key = key
+                    break
+            if due_key is None:
+                return None
+            packet = self._pending.pop(due_key)[1]
+            if self._heard.get(due_key, 0) > self.redundancy:
+                # we have heard the original plus `redundancy` rebroadcasts, so the area is covered
+                self.suppressed += 1
+                continue
+            self.relayed += 1
+            return packet
+
+    def pending_count(self) -> int:
+        return len(self._pending)
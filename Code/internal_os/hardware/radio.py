@@ -1,22 +1,53 @@
 """ Abstraction of the radio driver """
-import asyncio
 from machine import I2C, Pin, unique_id
 import time
 
 try:
-    from typing import List
+    from typing import Dict, List
 except ImportError:
     # we're on an MCU, typing is not available
     pass
 
 from sx1262 import SX1262
+from _sx126x import ERR_CRC_MISMATCH
+from internal_os.hardware import lora
+from internal_os.hardware.spibus import RADIO_BAUDRATE
+from internal_os.hardware.mesh import FloodRelay
+from internal_os.hardware.mac import ListenBeforeTalk
+from internal_os.hardware.radiostats import RadioStats
+from internal_os.hardware.reliable import ReliableLink
 import logging
+import tracing
 
-sx = SX1262(
-    spi_bus=0,
-    clk=18, mosi=19, miso=20,
-    cs=21, irq=17, rst=23, gpio=22
-)
+_TRACE = const(0)  # set to 1 to compile in tracing.event() calls, see tracing.py
+
+BROADCAST_ADDR = 0xFFFF
+
+# bytes 4-5 of the header hold the app number in the low 12 bits and link-layer flags in the top 4.
+APP_NUMBER_MASK = 0x0FFF
+FLAG_MESH = 0x8000  # flooded broadcast: bytes 2-3 hold the message ID, bits 12-14 the hop count
+HOPS_SHIFT = 12
+HOPS_MASK = 0x7
+FLAG_AGGREGATE = 0x4000  # the payload holds several sub-packets for the same destination
+FLAG_RELIABLE = 0x2000  # the payload starts with a sequence number, the receiver acknowledges it
+FLAG_ACK = 0x1000  # the payload starts with an ACK block
+# FLAG_AGGREGATE, FLAG_RELIABLE and FLAG_ACK only exist on frames without FLAG_MESH, where bits 12-14 are the hop count
+LINK_APP_NUMBER = APP_NUMBER_MASK  # frames that carry nothing for the apps (standalone ACKs)
+
+HEADER_LENGTH = 6
+# aggregated frames: each sub-packet is [app field (2 bytes), payload length (1 byte), payload]
+SUBPACKET_HEADER_LENGTH = 3
+
+# receive modes
+RX_CONTINUOUS = "continuous"
+RX_DUTY_CYCLE = "duty_cycle"
+ACTIVE_HOLD_MS = 10_000  # stay in continuous RX this long after the last exchange
+# a badge heard sending this recently is still in continuous RX, so frames to it can use the short preamble.
+# Less than ACTIVE_HOLD_MS to allow for the time the frame waits in the transmit queue.
+AWAKE_PEER_MS = ACTIVE_HOLD_MS - 3000
+MAX_AWAKE_PEERS = 16
+SERVICE_INTERVAL_MS = 100  # service() runs this often while packets are queued or waiting for ACKs
+IDLE_SERVICE_INTERVAL_MS = 1000  # and this often otherwise (incoming and queued packets trigger it right away)
 
 class Packet:
     """
@@ -29,10 +60,22 @@ class Packet:
             raise TypeError("app_number must be an integer")
         if not isinstance(data, bytes):
             raise TypeError("data must be bytes")
+        if not 0 <= app_number < LINK_APP_NUMBER:
+            raise ValueError(f"app_number must be between 0 and {LINK_APP_NUMBER - 1}")
         self.source = int.from_bytes(unique_id()[-2:], 'big')  # source address from unique ID
         self.dest = dest
         self.app_number = app_number
         self.data = data
+        self.message_id = None  # set for flooded broadcasts
+        self.hops = 0  # how many times a flooded broadcast has been relayed
+        # link quality, set on received packets
+        self.rssi = None  # dBm
+        self.snr = None  # dB
+        self.crc_ok = True  # frames that fail the CRC are counted in the radio stats and never reach apps
+        self.rx_time = None  # ticks_ms when the packet was received
+        self.queued_at = time.ticks_ms()  # when the packet entered its current queue
+        self.seq = None  # sequence number of reliable packets
+        self.parts = None  # for aggregated frames built by BadgeRadio: the packets packed into `data`
 
     def __repr__(self):
         return f"Packet(source={self.source:x}, dest={self.dest:x}, app_number={self.app_number}, data={self.data})"
@@ -46,81 +89,421 @@ class Packet:
             'dest': self.dest,
             'app_number': self.app_number,
             'data': self.data,
+            'rssi': self.rssi,
+            'snr': self.snr,
+            'crc_ok': self.crc_ok,
+            'rx_time': self.rx_time,
         }
 
+def _subpacket_length(pkt: Packet) -> int:
+    """
+    Space a packet takes up in an aggregated frame.
+    """
+    return SUBPACKET_HEADER_LENGTH + len(pkt.data) + (0 if pkt.seq is None else 1)
+
 class BadgeRadio:
     
-    def __init__(self, internal_os) -> None:
+    def __init__(self, internal_os, sx: SX1262 = None) -> None:
+        """
+        :param sx: The radio driver. Defaults to the badge's SX1262; the host-side simulator passes in a virtual one.
+        """
         self.internal_os = internal_os
+        if sx is None:
+            sx = SX1262(
+                spi_bus=0,
+                clk=18, mosi=19, miso=20,
+                cs=21, irq=17, rst=23, gpio=22,
+                spi=internal_os.spi_bus.device("radio", RADIO_BAUDRATE, urgent=True)  # SPI0, shared with the display
+            )
+        self.sx = sx
         self.logger = logging.getLogger("BadgeRadio")
         self.logger.setLevel(logging.DEBUG)
 
+        self.address = int.from_bytes(unique_id()[-2:], 'big')
+
         self._receive_queue = []  # rx queue
         self._transmit_queue = [] # tx queue
 
         self.last_tx_time = time.ticks_ms()
 
-        sx.begin(
-            freq=923, bw=500.0, sf=7, cr=8, syncWord=0x12,
-            power=22, currentLimit=140.0, preambleLength=8, # max power!
-            implicit=False, implicitLen=0xFF,
-            crcOn=True, txIq=False, rxIq=False,
+        # controlled flooding of broadcasts. Off by default: while it's off, flooded broadcasts from
+        # other badges are still understood (and deduplicated), but this badge doesn't rebroadcast them.
+        self.relay = FloodRelay()
+
+        # listen before talk: check the channel with CAD before each transmission, back off if it's busy
+        self.lbt = ListenBeforeTalk()
+
+        self._stats = RadioStats(time.ticks_ms())
+        self.service_job = None  # scheduler job that runs run_service(), set up by InternalOS
+
+        # power management: while the badge is idle, listen in short bursts instead of continuously.
+        # frames are sent with a long preamble so that duty-cycled receivers still catch them, unless they go
+        # to a badge that has just sent something itself and so listens continuously.
+        self.power_saving = True
+        self.long_preambles = True
+        self._heard_at: Dict[int, int] = {}  # source -> ticks_ms of the last frame it sent itself
+
+        # send queued packets for the same destination together in one frame
+        self.aggregation = True
+
+        # acknowledgements and retransmissions for packets sent with reliable=True
+        self.reliable = ReliableLink()
+        self.rx_mode = RX_CONTINUOUS
+        self._last_activity = time.ticks_ms()
+        self._rx_mode_since = time.ticks_ms()
+        self._rx_mode_time_ms = {RX_CONTINUOUS: 0, RX_DUTY_CYCLE: 0}
+
+        self.sx.begin(
+            freq=lora.FREQUENCY_MHZ, bw=lora.BANDWIDTH_KHZ, sf=lora.SPREADING_FACTOR, cr=lora.CODING_RATE, syncWord=lora.SYNC_WORD,
+            power=lora.TX_POWER_DBM, currentLimit=140.0, preambleLength=lora.PREAMBLE_LENGTH, # max power!
+            implicit=not lora.EXPLICIT_HEADER, implicitLen=0xFF,
+            crcOn=lora.CRC_ON, txIq=False, rxIq=False,
             tcxoVoltage=0, useRegulatorLDO=False, # crystal, dcdc regulator
             blocking=False # used with a callback
         )
-        sx.setBlockingCallback(False, self._lora_callback)
+        self.sx.setBlockingCallback(False, self._lora_callback)
 
     def _lora_callback(self, events):
         if events & SX1262.RX_DONE:
-            msg, status = sx.recv()
-            self._handle_packet(msg)
+            rx_time = time.ticks_ms()
+            rssi, snr = self.sx.getLinkQuality()
+            msg, status = self.sx.recv()
+            if status == ERR_CRC_MISMATCH:
+                # mostly collisions
+                self._stats.crc_errors += 1
+                if _TRACE:
+                    tracing.event(tracing.RX_CRC_ERROR)
+                return
+            if _TRACE:
+                tracing.event(tracing.RX_DONE, len(msg))
+            self._handle_packet(msg, rssi, snr, rx_time)
+
+    def set_relay_mode(self, enabled: bool) -> None:
+        """
+        Turn relaying of flooded broadcasts on or off.
+        While it's on, broadcasts sent by this badge are flooded as well.
+        """
+        self.relay.enabled = enabled
+        self.logger.info(f"Broadcast relay mode {'enabled' if enabled else 'disabled'}")
+
+    def _is_idle(self) -> bool:
+        """
+        The badge is idle when nobody is looking at it and the radio has nothing going on.
+        """
+        return (self.internal_os.display.is_asleep
+                and not self._transmit_queue and not self._receive_queue
+                and self.relay.pending_count() == 0
+                and self.reliable.in_flight() == 0
+                and time.ticks_diff(time.ticks_ms(), self._last_activity) > ACTIVE_HOLD_MS)
 
-    def _send_msg(self, dest: bytes, target_app: bytes, message: bytes):
+    def update_rx_mode(self) -> None:
         """
-        Sends a message over LoRa.
-        Takes in app ID, and optional message type. If ommited, it's an announcement.
+        Switch between continuous and duty-cycled RX depending on whether the badge is idle.
+        """
+        mode = RX_DUTY_CYCLE if self.power_saving and self._is_idle() else RX_CONTINUOUS
+        if mode == self.rx_mode:
+            return
+        self._account_rx_mode_time()
+        self.rx_mode = mode
+        if mode == RX_DUTY_CYCLE:
+            self.sx.setReceiveDutyCycle(lora.LONG_PREAMBLE_LENGTH, lora.DUTY_CYCLE_MIN_SYMBOLS)
+        else:
+            self.sx.setReceiveDutyCycle(0)
+        if _TRACE:
+            tracing.event(tracing.RX_MODE_DUTY_CYCLE if mode == RX_DUTY_CYCLE else tracing.RX_MODE_CONTINUOUS)
+
+    def _account_rx_mode_time(self) -> None:
+        now = time.ticks_ms()
+        self._rx_mode_time_ms[self.rx_mode] += time.ticks_diff(now, self._rx_mode_since)
+        self._rx_mode_since = now
+
+    def power_estimate(self) -> dict:
+        """
+        Estimated average radio current while receiving, in mA.
+        Gives the estimate for each receive mode, and the average weighted by the time spent in each mode so far.
+        """
+        self._account_rx_mode_time()
+        continuous_ma = lora.average_rx_current_ma(0)
+        duty_cycle_ma = lora.average_rx_current_ma(lora.LONG_PREAMBLE_LENGTH, lora.DUTY_CYCLE_MIN_SYMBOLS)
+        continuous_ms = self._rx_mode_time_ms[RX_CONTINUOUS]
+        duty_cycle_ms = self._rx_mode_time_ms[RX_DUTY_CYCLE]
+        total_ms = continuous_ms + duty_cycle_ms
+        return {
+            'rx_mode': self.rx_mode,
+            'continuous_ma': continuous_ma,
+            'duty_cycle_ma': duty_cycle_ma,
+            'continuous_s': continuous_ms / 1000,
+            'duty_cycle_s': duty_cycle_ms / 1000,
+            'average_ma': (continuous_ma * continuous_ms + duty_cycle_ma * duty_cycle_ms) / total_ms if total_ms else continuous_ma,
+        }
+
+    def _send_msg(self, pkt: Packet):
+        """
+        Sends a packet over LoRa.
         """
         
         """ bytes 0-1: source addr
-        bytes 2-3: dest addr
-        bytes 4-5: packet type
-        bytes 6-254: app-specific payload """
-        
-        src_bytes = unique_id()[-2:]
+        bytes 2-3: dest addr (message ID for flooded broadcasts)
+        bytes 4-5: link flags (bits 12-15) + app number (bits 0-11)
+        bytes 6-254: app-specific payload, preceded by
+            - the ACK block [count (1 byte), sequence numbers] if FLAG_ACK is set
+            - the sequence number (1 byte) if FLAG_RELIABLE is set
+        Aggregated frames carry sub-packets instead of the payload, see _aggregate(). """
+
+        if pkt.message_id is not None:
+            self._send_frame(pkt.source, pkt.message_id, FLAG_MESH | (pkt.hops << HOPS_SHIFT) | pkt.app_number,
+                             pkt.data, self._preamble_length(pkt), pkt.queued_at)
+            return
+
+        if pkt.parts:
+            app_field = FLAG_AGGREGATE
+            body = pkt.data
+        elif pkt.seq is not None:
+            app_field = FLAG_RELIABLE | pkt.app_number
+            body = bytes([pkt.seq]) + pkt.data
+        else:
+            app_field = pkt.app_number
+            body = pkt.data
+        if pkt.dest != BROADCAST_ADDR:
+            # piggyback the ACKs we owe the destination, if there's room
+            room = lora.MAX_FRAME_LENGTH - HEADER_LENGTH - len(body) - 1
+            acks = self.reliable.take_acks(pkt.dest, limit=room) if room > 0 else []
+            if acks:
+                app_field |= FLAG_ACK
+                body = bytes([len(acks)]) + bytes(acks) + body
+        self._send_frame(pkt.source, pkt.dest, app_field, body, self._preamble_length(pkt), pkt.queued_at)
+
+        now = time.ticks_ms()
+        for part in pkt.parts or (pkt,):
+            if part.seq is not None:
+                self.reliable.on_sent(part.dest, part.seq, now)
+
+    def _send_ack(self, dest: int) -> None:
+        """
+        Send a standalone ACK frame for the ACKs that couldn't be piggybacked in time.
+        """
+        acks = self.reliable.take_acks(dest, piggyback=False)
+        if not acks:
+            return
+        self._stats.ack_airtime_us += self._send_frame(self.address, dest, FLAG_ACK | LINK_APP_NUMBER,
+                                                       bytes([len(acks)]) + bytes(acks), self._preamble_length_to(dest), time.ticks_ms())
+
+    def _send_frame(self, source: int, dest_field: int, app_field: int, body: bytes, preamble_length: int, queued_at: int) -> int:
+        """
+        Put a frame on the air.
+        :return: Its time on air in microseconds.
+        """
+        msg_bytes = bytearray(HEADER_LENGTH + len(body))
+        msg_bytes[0:2] = source.to_bytes(2, 'big')
+        msg_bytes[2:4] = dest_field.to_bytes(2, 'big')
+        msg_bytes[4:6] = app_field.to_bytes(2, 'big')
+        msg_bytes[6:] = body
 
-        msg_bytes = bytearray(6 + len(message))
-        msg_bytes[0:2] = src_bytes
-        msg_bytes[2:4] = dest
-        msg_bytes[4:6] = target_app
-        msg_bytes[6:] = message
-        self.logger.debug(f"Sending message: {msg_bytes}")
+        self.sx.send(msg_bytes, preamble_length)
+        now = time.ticks_ms()
+        airtime_us = self._stats.record_tx(len(msg_bytes), preamble_length, time.ticks_diff(now, queued_at), now)
+        if _TRACE:
+            tracing.event(tracing.TX_SENT, len(msg_bytes))
+        return airtime_us
 
-        sx.send(msg_bytes)
+    def _preamble_length(self, pkt: Packet) -> int:
+        return self._preamble_length_to(pkt.dest)
 
-    def _handle_packet(self, packet) -> None:
+    def _preamble_length_to(self, dest: int) -> int:
+        """
+        The long preamble, unless the destination is known to be in continuous RX (see AWAKE_PEER_MS).
+        """
+        if not self.long_preambles:
+            return lora.PREAMBLE_LENGTH
+        if dest != BROADCAST_ADDR:
+            heard_at = self._heard_at.get(dest)
+            if heard_at is not None and time.ticks_diff(time.ticks_ms(), heard_at) < AWAKE_PEER_MS:
+                return lora.PREAMBLE_LENGTH
+        return lora.LONG_PREAMBLE_LENGTH
+
+    def _note_heard(self, src: int, now: int) -> None:
+        if src not in self._heard_at and len(self._heard_at) >= MAX_AWAKE_PEERS:
+            # forget the one heard longest ago
+            oldest = None
+            for peer, heard_at in self._heard_at.items():
+                if oldest is None or time.ticks_diff(heard_at, self._heard_at[oldest]) < 0:
+                    oldest = peer
+            del self._heard_at[oldest]
+        self._heard_at[src] = now
+
+    def _aggregate(self, first: Packet) -> Packet:
+        """
+        Take the packets in the transmit queue that go to the same destination as `first` and pack them
+        into one frame, as long as they fit.
+        Each sub-packet is [app field (2 bytes), length (1 byte), payload], where the app field may have
+        FLAG_RELIABLE set, in which case the payload starts with the sequence number.
+        :return: The aggregated frame, or `first` if there was nothing to add to it.
+        """
+        length = HEADER_LENGTH + _subpacket_length(first)
+        if first.message_id is not None or length > lora.MAX_FRAME_LENGTH:
+            return first
+        batch = [first]
+        i = 0
+        while i < len(self._transmit_queue):
+            other = self._transmit_queue[i]
+            if other.dest == first.dest and other.message_id is None \
+                    and length + _subpacket_length(other) <= lora.MAX_FRAME_LENGTH:
+                batch.append(self._transmit_queue.pop(i))
+                length += _subpacket_length(other)
+            else:
+                i += 1
+        if len(batch) == 1:
+            return first
+
+        data = bytearray(length - HEADER_LENGTH)
+        offset = 0
+        preamble_length = self._preamble_length(first)
+        separate_airtime_us = 0
+        for pkt in batch:
+            payload = pkt.data if pkt.seq is None else bytes([pkt.seq]) + pkt.data
+            app_field = pkt.app_number if pkt.seq is None else FLAG_RELIABLE | pkt.app_number
+            data[offset:offset + 2] = app_field.to_bytes(2, 'big')
+            data[offset + 2] = len(payload)
+            data[offset + 3:offset + 3 + len(payload)] = payload
+            offset += SUBPACKET_HEADER_LENGTH + len(payload)
+            separate_airtime_us += lora.time_on_air_us(HEADER_LENGTH + len(payload), preamble_length)
+        frame = Packet(first.dest, 0, bytes(data))
+        frame.parts = batch
+        frame.queued_at = first.queued_at  # the queue is FIFO, so the first packet is the oldest
+        self._stats.record_aggregate(len(batch), separate_airtime_us - lora.time_on_air_us(length, preamble_length))
+        return frame
+
+    def _split_aggregate(self, src: int, dest: int, payload: bytes):
+        """
+        Unpack the sub-packets of an aggregated frame.
+        :return: A list of packets, or None if the frame is malformed.
+        """
+        packets = []
+        offset = 0
+        while offset < len(payload):
+            if offset + SUBPACKET_HEADER_LENGTH > len(payload):
+                return None
+            app_field = int.from_bytes(payload[offset:offset + 2], 'big')
+            start = offset + SUBPACKET_HEADER_LENGTH
+            end = start + payload[offset + 2]
+            if end > len(payload):
+                return None
+            seq = None
+            if app_field & FLAG_RELIABLE:
+                if start == end:
+                    return None
+                seq = payload[start]
+                start += 1
+            if (app_field & APP_NUMBER_MASK) == LINK_APP_NUMBER:
+                return None  # reserved, Packet() would reject it
+            pkt = Packet(dest, app_field & APP_NUMBER_MASK, payload[start:end])
+            pkt.source = src
+            pkt.seq = seq
+            packets.append(pkt)
+            offset = end
+        return packets
+
+    def _handle_packet(self, packet, rssi: float, snr: float, rx_time: int) -> None:
         """ 
-        Directs to target app API
-        TODO: implement app dispatching in internal_os
+        Parses a received frame and queues it for dispatch to the target app.
         """
-        if not packet or len(packet) < 6:
-            logging.warning("Received malformed packet")
+        if not packet or len(packet) < HEADER_LENGTH:
+            self._malformed(packet)
             return
 
         src = int.from_bytes(packet[0:2], 'big')
         dest = int.from_bytes(packet[2:4], 'big')
-        target_app = int.from_bytes(packet[4:6], 'big')
+        app_field = int.from_bytes(packet[4:6], 'big')
         payload = packet[6:]
+        self._stats.record_rx(src, rssi, rx_time)
 
-        pkt = Packet(dest, target_app, payload)
-        pkt.source = src  # set source from packet
+        if app_field & FLAG_MESH:
+            if (app_field & APP_NUMBER_MASK) == LINK_APP_NUMBER:
+                self._malformed(packet)  # flooded broadcasts always carry an app's packet
+                return
+            message_id = dest
+            hops = (app_field >> HOPS_SHIFT) & HOPS_MASK
+            pkt = Packet(BROADCAST_ADDR, app_field & APP_NUMBER_MASK, payload)
+            pkt.source = src
+            pkt.message_id = message_id
+            pkt.hops = hops
+            if not self.relay.on_receive(src, message_id, hops, pkt, time.ticks_ms()):
+                if _TRACE:
+                    tracing.event(tracing.RX_DUPLICATE, message_id)
+                return  # already seen this one
+            packets = [pkt]
+        else:
+            self._note_heard(src, rx_time)  # unlike flooded broadcasts, src sent this frame itself
+            if dest != self.address and dest != BROADCAST_ADDR:
+                self._stats.not_for_us += 1
+                if _TRACE:
+                    tracing.event(tracing.RX_NOT_FOR_US, dest)
+                return
+            if dest == self.address:
+                self._last_activity = time.ticks_ms()
 
-        if pkt.dest != int.from_bytes(unique_id()[-2:], 'big') and pkt.dest != 0xFFFF:
-            logging.debug(f"Packet not for this badge: {pkt.dest:x} != {int.from_bytes(unique_id()[-2:], 'big'):x} or not broadcast")
-            return
+            if app_field & FLAG_ACK:
+                if not payload or len(payload) < 1 + payload[0]:
+                    self._malformed(packet)
+                    return
+                ack_count = payload[0]
+                if dest == self.address:
+                    now = time.ticks_ms()
+                    for seq in payload[1:1 + ack_count]:
+                        self._report(self.reliable.on_ack(src, seq, now), True)
+                payload = payload[1 + ack_count:]
+
+            if app_field & FLAG_AGGREGATE:
+                packets = self._split_aggregate(src, dest, payload)
+                if packets is None:
+                    self._malformed(packet)
+                    return
+            elif (app_field & APP_NUMBER_MASK) == LINK_APP_NUMBER:
+                return  # standalone ACK, nothing for the apps
+            else:
+                seq = None
+                if app_field & FLAG_RELIABLE:
+                    if not payload:
+                        self._malformed(packet)
+                        return
+                    seq = payload[0]
+                    payload = payload[1:]
+                pkt = Packet(dest, app_field & APP_NUMBER_MASK, payload)
+                pkt.source = src  # set source from packet
+                pkt.seq = seq
+                packets = [pkt]
+
+        for pkt in packets:
+            if pkt.seq is not None and dest == self.address \
+                    and not self.reliable.on_receive(src, pkt.seq, time.ticks_ms()):
+                continue  # a retransmission of something we already have; it's been acknowledged again
+            pkt.rssi = rssi
+            pkt.snr = snr
+            pkt.rx_time = rx_time
+            pkt.queued_at = rx_time
+            self._receive_queue.append(pkt)  # add packet to the rx queue
+        if _TRACE:
+            tracing.event(tracing.RX_QUEUED, src)
 
-        self._receive_queue.append(pkt)  # add packet to the rx queue
+        # dispatching is handled in service()
+        if self.service_job is not None:
+            self.service_job.trigger()
 
-        # dispatching is handled in manage_packets_forever
+    def _malformed(self, packet) -> None:
+        self._stats.malformed += 1
+        if _TRACE:
+            tracing.event(tracing.RX_MALFORMED, len(packet) if packet else 0)
+
+    def _report(self, callback, delivered: bool) -> None:
+        """
+        Tell the sender of a reliable packet whether it arrived.
+        """
+        if callback is None:
+            return
+        try:
+            callback(delivered)
+        except Exception as e:
+            self.logger.error(f"Error in packet delivery callback: {e}")
 
     def get_packets_available(self) -> int:
         """
@@ -150,34 +533,149 @@ class BadgeRadio:
         current_time = time.ticks_ms()
         elapsed_time = time.ticks_diff(current_time, self.last_tx_time)
         ms_per_packet = 1500
-        return max(0, (ms_per_packet - elapsed_time) / 1000.0)
+        return max(0, (ms_per_packet - elapsed_time) / 1000.0, self.lbt.wait_ms(current_time) / 1000.0)
     
-    def add_to_tx_queue(self, dest: int, app_number: int, data: bytes):
+    def add_to_tx_queue(self, dest: int, app_number: int, data: bytes, reliable: bool = False, callback=None):
         """
         Adds a packet to the transmit queue.
+        :param reliable: Retransmit the packet until the destination acknowledges it (unicast only).
+        :param callback: For reliable packets: called with True once the packet is acknowledged, or False when we give up.
         """
         pkt = Packet(dest, app_number, data)
+        if reliable:
+            if dest == BROADCAST_ADDR:
+                raise ValueError("broadcasts can't be sent reliably")
+            if HEADER_LENGTH + 1 + len(data) > lora.MAX_FRAME_LENGTH:
+                raise ValueError(f"reliable packets can carry at most {lora.MAX_FRAME_LENGTH - HEADER_LENGTH - 1} bytes")
+            pkt.seq = self.reliable.track(pkt, callback)
+        elif dest == BROADCAST_ADDR and self.relay.enabled:
+            pkt.message_id = self.relay.originate(pkt.source)
         self._transmit_queue.append(pkt)
-        logging.info(f"Added packet to transmit queue: {pkt}")
-
-    async def manage_packets_forever(self):
-        while True:
-            # manage the transmission rate and dispatch packets
-            if len(self._receive_queue) > 0:
-                packet = self.get_next_packet()
-                if packet:
-                    logging.info(f"Dispatching packet: {packet}")
-                    self.internal_os.apps.dispatch_packet(packet)        
-
-            if len(self._transmit_queue) > 0:
-                # handle sending packets
-                self.logger.debug(f"Transmit queue size: {len(self._transmit_queue)}")
-                if self.get_time_to_next_send() <= 0:
-                    pkt = self._transmit_queue.pop(0)
-                    self.logger.debug(f"Sending packet: {pkt}")
-                    self._send_msg(pkt.dest.to_bytes(2, 'big'), pkt.app_number.to_bytes(2, 'big'), pkt.data)
-                    self.logger.info(f"Sent packet: {pkt}")
-                    self.last_tx_time = time.ticks_ms()
-                    logging.info(f"Sent packet: {pkt}")
-
-            await asyncio.sleep(0.1)
\ No newline at end of file
+        if _TRACE:
+            tracing.event(tracing.TX_QUEUED, dest)
+        if self.service_job is not None:
+            self.service_job.trigger()
+
+    def stats(self) -> dict:
+        """
+        Radio statistics: traffic counters and rates, CRC failures, per-source RSSI histograms,
+        TX airtime, queue latencies, listen-before-talk, relay, reliable delivery and power figures.
+        """
+        stats = self._stats.snapshot(time.ticks_ms())
+        stats['rx_queue_size'] = len(self._receive_queue)
+        stats['tx_queue_size'] = len(self._transmit_queue)
+        stats['lbt'] = {
+            'busy': self.lbt.busy_count,
+            'backoffs': self.lbt.backoff_count,
+            'forced': self.lbt.forced_count,
+        }
+        stats['relay'] = {
+            'enabled': self.relay.enabled,
+            'relayed': self.relay.relayed,
+            'suppressed': self.relay.suppressed,
+            'duplicates': self.relay.duplicates,
+        }
+        stats['reliable'] = {
+            'sent': self.reliable.sent,
+            'delivered': self.reliable.delivered,
+            'failed': self.reliable.failed,
+            'in_flight': self.reliable.in_flight(),
+            'retransmissions': self.reliable.retransmissions,
+            'duplicates': self.reliable.duplicates,
+            'acks_sent': self.reliable.acks_sent,
+            'acks_piggybacked': self.reliable.acks_piggybacked,
+        }
+        stats['power'] = self.power_estimate()
+        return stats
+
+    def _has_tx_work(self) -> bool:
+        """
+        Whether there's a queued packet or a relay that's due.
+        """
+        if self._transmit_queue:
+            return True
+        deadline = self.relay.next_deadline()
+        return deadline is not None and time.ticks_diff(time.ticks_ms(), deadline) >= 0
+
+    def _transmit_next(self) -> None:
+        """
+        Send the next packet: relays that are due go first, then the transmit queue.
+        """
+        # relay delays are already randomized, and waiting longer would only let
+        # them be suppressed by someone else's rebroadcast
+        pkt = self.relay.next_due(time.ticks_ms())
+        if pkt:
+            pkt.hops += 1
+            pkt.queued_at = pkt.rx_time  # relays are queued from the moment they were received
+            if _TRACE:
+                tracing.event(tracing.TX_RELAY, pkt.message_id)
+        elif self._transmit_queue:
+            pkt = self._transmit_queue.pop(0)
+            if self.aggregation:
+                pkt = self._aggregate(pkt)
+            if _TRACE:
+                tracing.event(tracing.TX_SEND, pkt.dest)
+        else:
+            return  # the relay that was due got suppressed
+        # sending counts as activity: listen continuously for the reply
+        self._last_activity = time.ticks_ms()
+        self.update_rx_mode()
+        self._send_msg(pkt)
+        self.lbt.on_sent()
+        self.last_tx_time = time.ticks_ms()
+
+    def service(self) -> None:
+        """
+        One pass of the radio loop: dispatch a received packet, send the next one if it's time, update the receive mode.
+        """
+        # manage the transmission rate and dispatch packets
+        # received packets wait in the queue while the apps are still busy with earlier ones
+        if len(self._receive_queue) > 0 and self.internal_os.apps.can_dispatch():
+            packet = self.get_next_packet()
+            if packet:
+                if _TRACE:
+                    tracing.event(tracing.DISPATCH, packet.app_number)
+                self._stats.record_dispatch(time.ticks_diff(time.ticks_ms(), packet.queued_at))
+                self.internal_os.apps.dispatch_packet(packet)
+
+        # reliable packets whose ACK didn't come in time go to the front of the queue
+        retransmit, failed = self.reliable.expired(time.ticks_ms())
+        for pkt in retransmit:
+            pkt.queued_at = time.ticks_ms()
+            self._transmit_queue.insert(0, pkt)
+        for callback in failed:
+            self._report(callback, False)
+
+        sent = False
+        if self.get_time_to_next_send() <= 0 and self._has_tx_work():
+            if self.lbt.enabled and self.sx.isChannelBusy() and self.lbt.on_busy(time.ticks_ms()):
+                if _TRACE:
+                    tracing.event(tracing.CHANNEL_BUSY, self.lbt.wait_ms(time.ticks_ms()))
+            else:
+                self._transmit_next()
+                sent = True
+
+        # ACKs that couldn't be piggybacked go out on their own. They're only a few bytes, so they
+        # don't wait for the pacing slot, but they do wait for a free channel and for our own frame to finish.
+        if not sent:
+            ack_dest = self.reliable.ack_due(time.ticks_ms())
+            if ack_dest is not None and not (self.lbt.enabled and self.sx.isChannelBusy()):
+                self._send_ack(ack_dest)
+
+        self.update_rx_mode()
+
+    def run_service(self) -> int:
+        """
+        Scheduler job: service(), then tell when to run it next.
+        It's also triggered when a packet comes in or is queued for sending.
+        :return: ms until the next run: short while there's work in progress, long when the radio is idle.
+        """
+        self.service()
+        return SERVICE_INTERVAL_MS if self.has_pending_work() else IDLE_SERVICE_INTERVAL_MS
+
+    def has_pending_work(self) -> bool:
+        """
+        Whether packets are queued either way, relays are pending, or reliable packets wait for or owe an ACK.
+        """
+        return bool(self._transmit_queue or self._receive_queue
+                    or self.relay.pending_count() or self.reliable.in_flight() or self.reliable.acks_pending())
\ No newline at end of file
@@ -0,0 +1,138 @@
+""" Rolling radio statistics """
+from internal_os.hardware import lora
+
+try:
+    from typing import Dict, List
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+RATE_WINDOW_S = 10  # packets per second are averaged over this many seconds
+RSSI_BUCKET_EDGES = (-120, -110, -100, -90, -80, -70, -60, -50)  # dBm; histograms have one more bucket than edges
+MAX_TRACKED_SOURCES = 32
+
+class RadioStats:
+    """
+    Counters and rolling statistics kept by BadgeRadio.
+    All methods are cheap enough to call from the radio callback.
+    """
+    def __init__(self, now_ms: int) -> None:
+        self.rx_packets = 0
+        self.tx_packets = 0
+        self.crc_errors = 0
+        self.malformed = 0
+        self.not_for_us = 0
+        self.tx_airtime_us = 0
+        self.ack_airtime_us = 0  # part of tx_airtime_us spent on standalone ACK frames
+
+        # frame aggregation
+        self.aggregated_frames = 0
+        self.aggregated_packets = 0
+        self.aggregation_saved_us = 0  # airtime the packets would have needed as separate frames, minus what they used
+
+        # one bucket per second, used as a ring
+        self._rx_per_second: List[int] = [0] * RATE_WINDOW_S
+        self._tx_per_second: List[int] = [0] * RATE_WINDOW_S
+        self._second = now_ms // 1000
+
+        # source address -> RSSI histogram
+        self.rssi_histograms: Dict[int, List[int]] = {}
+        self._source_order: List[int] = []
+
+        # time spent in the queues, in ms
+        self.tx_queue_latency_avg = 0.0
+        self.tx_queue_latency_max = 0
+        self.rx_queue_latency_avg = 0.0
+        self.rx_queue_latency_max = 0
+
+    def _advance(self, now_ms: int) -> int:
+        """
+        Move the rate window forward to the current second, clearing the seconds that passed without packets.
+        :return: The ring index for the current second.
+        """
+        second = now_ms // 1000
+        elapsed = second - self._second
+        if elapsed < 0:
+            # ticks_ms wrapped around
+            elapsed = RATE_WINDOW_S
+        if elapsed > 0:
+            for i in range(min(elapsed, RATE_WINDOW_S)):
+                index = (self._second + 1 + i) % RATE_WINDOW_S
+                self._rx_per_second[index] = 0
+                self._tx_per_second[index] = 0
+            self._second = second
+        return second % RATE_WINDOW_S
+
+    def record_rx(self, source: int, rssi: float, now_ms: int) -> None:
+        self.rx_packets += 1
+        self._rx_per_second[self._advance(now_ms)] += 1
+
+        histogram = self.rssi_histograms.get(source)
+        if histogram is None:
+            if len(self._source_order) >= MAX_TRACKED_SOURCES:
+                del self.rssi_histograms[self._source_order.pop(0)]
+            histogram = [0] * (len(RSSI_BUCKET_EDGES) + 1)
+            self.rssi_histograms[source] = histogram
+            self._source_order.append(source)
+        bucket = 0
+        for edge in RSSI_BUCKET_EDGES:
+            if rssi < edge:
+                break
+            bucket += 1
+        histogram[bucket] += 1
+
+    def record_tx(self, length: int, preamble_length: int, queued_ms: int, now_ms: int) -> int:
+        """
+        :param queued_ms: How long the packet waited in the transmit queue.
+        :return: The frame's time on air in microseconds.
+        """
+        self.tx_packets += 1
+        self._tx_per_second[self._advance(now_ms)] += 1
+        airtime_us = lora.time_on_air_us(length, preamble_length)
+        self.tx_airtime_us += airtime_us
+        self.tx_queue_latency_avg += (queued_ms - self.tx_queue_latency_avg) / 8
+        self.tx_queue_latency_max = max(self.tx_queue_latency_max, queued_ms)
+        return airtime_us
+
+    def record_aggregate(self, packets: int, saved_us: int) -> None:
+        """
+        :param packets: Number of packets sent together in one frame.
+        :param saved_us: Airtime saved compared to sending them separately.
+        """
+        self.aggregated_frames += 1
+        self.aggregated_packets += packets
+        self.aggregation_saved_us += saved_us
+
+    def record_dispatch(self, queued_ms: int) -> None:
+        """
+        :param queued_ms: How long the packet waited in the receive queue before it was dispatched.
+        """
+        self.rx_queue_latency_avg += (queued_ms - self.rx_queue_latency_avg) / 8
+        self.rx_queue_latency_max = max(self.rx_queue_latency_max, queued_ms)
+
+    def snapshot(self, now_ms: int) -> dict:
+        """
+        A copy of the statistics as plain Python types (e.g. for JSON).
+        """
+        self._advance(now_ms)
+        return {
+            'rx_packets': self.rx_packets,
+            'tx_packets': self.tx_packets,
+            'rx_per_second': sum(self._rx_per_second) / RATE_WINDOW_S,
+            'tx_per_second': sum(self._tx_per_second) / RATE_WINDOW_S,
+            'crc_errors': self.crc_errors,
+            'malformed': self.malformed,
+            'not_for_us': self.not_for_us,
+            'tx_airtime_ms': self.tx_airtime_us // 1000,
+            'ack_airtime_ms': self.ack_airtime_us // 1000,
+            'aggregation': {
+                'frames': self.aggregated_frames,
+                'packets': self.aggregated_packets,
+                'slots_saved': self.aggregated_packets - self.aggregated_frames,  # transmit slots (1.5 s pacing each)
+                'airtime_saved_ms': self.aggregation_saved_us // 1000,
+            },
+            'tx_queue_latency_ms': {'avg': int(self.tx_queue_latency_avg), 'max': self.tx_queue_latency_max},
+            'rx_queue_latency_ms': {'avg': int(self.rx_queue_latency_avg), 'max': self.rx_queue_latency_max},
+            'rssi_bucket_edges': list(RSSI_BUCKET_EDGES),
+            'rssi_histograms': {f"{source:04x}": list(histogram) for source, histogram in self.rssi_histograms.items()},
+        }
@@ -0,0 +1,229 @@
+""" Reliable unicast: sequence numbers, ACKs and retransmission with adaptive timeouts """
+import random
+
+try:
+    from time import ticks_add, ticks_diff
+except ImportError:
+    # host-side simulator: plain integer milliseconds, no wraparound
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_diff(end, start):
+        return end - start
+
+MAX_ACKS_PER_FRAME = 8  # sequence numbers acknowledged in one ACK block
+
+
+class _Peer:
+    def __init__(self, initial_rto_ms: int) -> None:
+        # random, so that after a reboot the receiver most likely doesn't take our first packets for duplicates
+        self.next_seq = random.getrandbits(8)
+        # round trip time estimate (Jacobson/Karels), in ms
+        self.srtt = None
+        self.rttvar = 0
+        self.rto = initial_rto_ms
+        self.received = []  # recently received sequence numbers, for duplicate filtering
+        self.last_received = None  # when the last reliable packet from this badge came in
+        self.acks = []  # sequence numbers we still have to acknowledge
+        self.ack_deadline = None  # when to give up waiting for a packet to piggyback the ACKs on
+
+
+class _Pending:
+    def __init__(self, pkt, callback) -> None:
+        self.pkt = pkt
+        self.callback = callback
+        self.attempts = 0
+        self.sent_at = None
+        self.deadline = None  # set once the packet has actually been sent
+
+
+class ReliableLink:
+    """
+    Bookkeeping for reliable unicast packets.
+
+    Each reliable packet gets an 8-bit sequence number per destination. The receiver acknowledges it,
+    preferably by piggybacking the ACK on a packet it sends to the same badge anyway; if it has nothing to
+    send within `ack_delay_ms`, it sends a small standalone ACK frame. ACKs for several packets share
+    one frame. The sender retransmits after a timeout estimated from the measured round trip time
+    (srtt + 4 * rttvar, as in TCP), doubling it on every retry, and reports the result through the
+    packet's callback. Retransmitted packets aren't used to measure the round trip time (Karn's rule).
+
+    Times are passed in as milliseconds (ticks_ms on the badge), so the same logic runs in the
+    host-side simulator.
+
+    A sender that reboots starts over with a new, random sequence number, while its peers still remember the
+    last ones they got from it. So a receiver forgets them after `dedupe_timeout_ms` without a reliable packet
+    from that badge. Retransmissions of one packet are never further apart than `max_rto_ms`, so by then no
+    duplicate can be on its way anymore.
+    """
+    def __init__(self, initial_rto_ms: int = 3000, min_rto_ms: int = 500, max_rto_ms: int = 30000,
+                 max_attempts: int = 4, ack_delay_ms: int = 300, dedupe_window: int = 32, max_peers: int = 32,
+                 dedupe_timeout_ms: int = None) -> None:
+        self.initial_rto_ms = initial_rto_ms
+        self.min_rto_ms = min_rto_ms
+        self.max_rto_ms = max_rto_ms
+        self.max_attempts = max_attempts
+        self.ack_delay_ms = ack_delay_ms
+        self.dedupe_window = dedupe_window
+        self.dedupe_timeout_ms = dedupe_timeout_ms if dedupe_timeout_ms is not None else max_rto_ms + 1000
+        self.max_peers = max_peers
+
+        self._peers = {}
+        self._peer_order = []
+        self._pending = {}  # (dest, seq) -> _Pending
+
+        self.sent = 0  # reliable packets queued
+        self.retransmissions = 0
+        self.delivered = 0
+        self.failed = 0
+        self.duplicates = 0  # received again, e.g. because our ACK got lost
+        self.acks_sent = 0  # standalone ACK frames
+        self.acks_piggybacked = 0  # frames that carried ACKs along with data
+
+    def _peer(self, address: int) -> _Peer:
+        peer = self._peers.get(address)
+        if peer is None:
+            if len(self._peer_order) >= self.max_peers:
+                del self._peers[self._peer_order.pop(0)]
+            peer = _Peer(self.initial_rto_ms)
+            self._peers[address] = peer
+            self._peer_order.append(address)
+        return peer
+
+    # sending side
+
+    def track(self, pkt, callback=None) -> int:
+        """
+        Assign a sequence number to a packet that's about to be queued and start tracking it.
+        :param callback: Called with True when the packet is acknowledged, False when we give up.
+        :return: The sequence number.
+        """
+        peer = self._peer(pkt.dest)
+        seq = peer.next_seq
+        peer.next_seq = (seq + 1) & 0xFF
+        self._pending[(pkt.dest, seq)] = _Pending(pkt, callback)
+        self.sent += 1
+        return seq
+
+    def on_sent(self, dest: int, seq: int, now_ms: int) -> None:
+        """
+        Start the retransmission timer for a packet that just went out.
+        """
+        pending = self._pending.get((dest, seq))
+        if pending is None:
+            return
+        pending.attempts += 1
+        if pending.attempts == 1:
+            pending.sent_at = now_ms
+        else:
+            self.retransmissions += 1
+        rto = min(self.max_rto_ms, self._peer(dest).rto << (pending.attempts - 1))
+        pending.deadline = ticks_add(now_ms, rto)
+
+    def on_ack(self, source: int, seq: int, now_ms: int):
+        """
+        Handle an acknowledgement.
+        :return: The callback of the acknowledged packet (None if it has none or the ACK is stale).
+        """
+        pending = self._pending.pop((source, seq), None)
+        if pending is None:
+            return None
+        self.delivered += 1
+        if pending.attempts == 1:
+            self._sample_rtt(self._peer(source), ticks_diff(now_ms, pending.sent_at))
+        return pending.callback
+
+    def _sample_rtt(self, peer: _Peer, rtt_ms: int) -> None:
+        if peer.srtt is None:
+            peer.srtt = rtt_ms
+            peer.rttvar = rtt_ms // 2
+        else:
+            peer.rttvar += (abs(peer.srtt - rtt_ms) - peer.rttvar) // 4
+            peer.srtt += (rtt_ms - peer.srtt) // 8
+        peer.rto = max(self.min_rto_ms, min(self.max_rto_ms, peer.srtt + 4 * peer.rttvar))
+
+    def expired(self, now_ms: int):
+        """
+        Find packets whose retransmission timer ran out.
+        :return: A (retransmit, failed) tuple: packets to send again, and callbacks of packets we gave up on.
+        """
+        retransmit = []
+        failed = []
+        for key, pending in list(self._pending.items()):
+            if pending.deadline is None or ticks_diff(now_ms, pending.deadline) < 0:
+                continue
+            if pending.attempts >= self.max_attempts:
+                del self._pending[key]
+                self.failed += 1
+                failed.append(pending.callback)
+            else:
+                pending.deadline = None  # until it's been sent again
+                retransmit.append(pending.pkt)
+        return retransmit, failed
+
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    # receiving side
+
+    def on_receive(self, source: int, seq: int, now_ms: int) -> bool:
+        """
+        Record a reliable packet from `source` and schedule its ACK.
+        :return: True if it's new, False if it's a duplicate (it's acknowledged again anyway).
+        """
+        peer = self._peer(source)
+        if seq not in peer.acks:
+            peer.acks.append(seq)
+        if peer.ack_deadline is None:
+            peer.ack_deadline = ticks_add(now_ms, self.ack_delay_ms)
+        if peer.last_received is not None and ticks_diff(now_ms, peer.last_received) > self.dedupe_timeout_ms:
+            peer.received = []  # too old to have duplicates coming; the sender may have rebooted since
+        peer.last_received = now_ms
+        if seq in peer.received:
+            self.duplicates += 1
+            return False
+        peer.received.append(seq)
+        if len(peer.received) > self.dedupe_window:
+            peer.received.pop(0)
+        return True
+
+    def take_acks(self, dest: int, piggyback: bool = True, limit: int = MAX_ACKS_PER_FRAME) -> list:
+        """
+        Take the ACKs owed to `dest`, to send them in a frame that's going there.
+        :param piggyback: Whether the frame also carries data (for the statistics).
+        :param limit: How many fit in the frame.
+        """
+        peer = self._peers.get(dest)
+        if peer is None or not peer.acks:
+            return []
+        count = min(MAX_ACKS_PER_FRAME, limit)
+        acks = peer.acks[:count]
+        del peer.acks[:count]
+        if not peer.acks:
+            peer.ack_deadline = None
+        if piggyback:
+            self.acks_piggybacked += 1
+        else:
+            self.acks_sent += 1
+        return acks
+
+    def acks_pending(self) -> bool:
+        """
+        :return: Whether any received packet still has to be acknowledged.
+        """
+        for peer in self._peers.values():
+            if peer.ack_deadline is not None:
+                return True
+        return False
+
+    def ack_due(self, now_ms: int):
+        """
+        :return: The address of a badge whose ACKs can't wait any longer for a packet to ride on, or None.
+        """
+        for address, peer in self._peers.items():
+            if peer.ack_deadline is not None and ticks_diff(now_ms, peer.ack_deadline) >= 0:
+                return address
+        return None
+
+    def rto_ms(self, dest: int) -> int:
+        return self._peer(dest).rto
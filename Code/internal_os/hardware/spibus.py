@@ -0,0 +1,223 @@
+""" The SPI0 bus shared by the e-ink display and the radio """
+from machine import Pin, SPI
+import _thread
+import utime
+
+try:
+    from typing import Dict, List
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+SPI_ID = 0
+SCK_PIN = 18
+MOSI_PIN = 19
+MISO_PIN = 20
+DISPLAY_BAUDRATE = 1_000_000
+RADIO_BAUDRATE = 2_000_000
+CHUNK_SIZE = 256  # bytes per transaction of bulk writes, about 2 ms of bus time at 1 MHz
+
+def _core() -> int:
+    # thread ident 2 = core 1 = the app thread, see apps._in_app_thread()
+    return 1 if _thread.get_ident() == 2 else 0
+
+class SPIDevice:
+    """
+    One device on the shared bus. Wrap everything from asserting its CS to releasing it in a transaction:
+    ```python
+    with device:
+        cs.value(0)
+        device.write(data)
+        cs.value(1)
+    ```
+    Inside a transaction, write(), read(), readinto() and write_readinto() work like machine.SPI's.
+    """
+    def __init__(self, bus: 'SPIBus', name: str, baudrate: int, urgent: bool) -> None:
+        self.bus = bus
+        self.name = name
+        self.baudrate = baudrate
+        self.urgent = urgent  # other devices let it go first, see SPIBus
+        self.waiting = False  # set while an urgent device waits for the bus
+
+        self.transactions = 0
+        self.bytes = 0
+        self.contended = 0  # transactions that had to wait for the bus
+        self.wait_us = 0
+        self.max_wait_us = 0
+        self.hold_us = 0
+        self.max_hold_us = 0
+
+    def begin(self) -> None:
+        """
+        Start a transaction: wait for the bus and switch it to this device's baudrate.
+        Transactions nest within a core.
+        """
+        self.bus._acquire(self)
+
+    def end(self) -> None:
+        """
+        End a transaction.
+        """
+        self.bus._release(self)
+
+    def __enter__(self) -> 'SPIDevice':
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.end()
+
+    def call_when_free(self, func, arg) -> None:
+        """
+        Call func(arg) now, or once the transaction this core is in the middle of is done, whichever device it's for.
+        For interrupt handlers that talk to the device: an interrupt can run in the middle of a transaction
+        of the code it interrupted, and the bus can't be handed to it then. Only the last deferred call is kept.
+        """
+        self.bus.call_when_free(func, arg)
+
+    def write(self, buf) -> None:
+        self.bytes += len(buf)
+        self.bus.spi.write(buf)
+
+    def read(self, nbytes: int, write: int = 0) -> bytes:
+        self.bytes += nbytes
+        return self.bus.spi.read(nbytes, write)
+
+    def readinto(self, buf, write: int = 0) -> None:
+        self.bytes += len(buf)
+        self.bus.spi.readinto(buf, write)
+
+    def write_readinto(self, write_buf, read_buf) -> None:
+        self.bytes += len(write_buf)
+        self.bus.spi.write_readinto(write_buf, read_buf)
+
+    def stats(self) -> Dict:
+        return {
+            'baudrate': self.baudrate,
+            'urgent': self.urgent,
+            'transactions': self.transactions,
+            'bytes': self.bytes,
+            'contended': self.contended,
+            'avg_wait_us': self.wait_us // self.contended if self.contended else 0,
+            'max_wait_us': self.max_wait_us,
+            'hold_ms': self.hold_us // 1000,
+            'max_hold_us': self.max_hold_us,
+        }
+
+class SPIBus:
+    """
+    Owns the SPI peripheral that the display and the radio share, and serializes their transactions,
+    which come from both cores (apps draw on core 1, the radio runs on core 0).
+
+    Urgent devices (the radio) go first: while one is waiting, the others don't start new transactions.
+    Bulk writes (a display frame is 5 KB) are split into transactions of CHUNK_SIZE bytes by the drivers,
+    so an urgent device never waits long. The baudrate is switched when a transaction is for another
+    device than the last one.
+    """
+    def __init__(self, spi_id: int = SPI_ID, sck: int = SCK_PIN, mosi: int = MOSI_PIN, miso: int = MISO_PIN) -> None:
+        self.spi = SPI(spi_id, baudrate=DISPLAY_BAUDRATE, polarity=0, phase=0, sck=Pin(sck), mosi=Pin(mosi), miso=Pin(miso))
+        self._baudrate = DISPLAY_BAUDRATE
+        self._lock = _thread.allocate_lock()
+        # transaction nesting per core (one thread runs on each). It's raised before the lock is taken and cleared
+        # only after it's released, so an interrupt handler that runs in between still sees its core as holding the bus.
+        self._depth = [0, 0]
+        self._deferred = [None, None]  # per core: (func, arg) to call once its transaction is done, see call_when_free()
+        self._held_since = 0
+        self.devices: List[SPIDevice] = []
+        self._urgent: List[SPIDevice] = []
+        self.reconfigurations = 0  # baudrate switches
+
+    def device(self, name: str, baudrate: int, urgent: bool = False) -> SPIDevice:
+        """
+        Add a device to the bus.
+        :param baudrate: Its baudrate, set for each of its transactions.
+        :param urgent: Whether its transactions go before those of non-urgent devices.
+        """
+        device = SPIDevice(self, name, baudrate, urgent)
+        self.devices.append(device)
+        if urgent:
+            self._urgent.append(device)
+        return device
+
+    def held_by_caller(self) -> bool:
+        """
+        Whether the calling core is in the middle of a transaction (or about to start or end one).
+        """
+        return self._depth[_core()] > 0
+
+    def call_when_free(self, func, arg) -> None:
+        """
+        See SPIDevice.call_when_free().
+        """
+        core = _core()
+        if self._depth[core] > 0:
+            self._deferred[core] = (func, arg)
+        else:
+            func(arg)
+
+    def _urgent_waiting(self) -> bool:
+        for device in self._urgent:
+            if device.waiting:
+                return True
+        return False
+
+    def _acquire(self, device: SPIDevice) -> None:
+        core = _core()
+        depth = self._depth[core]
+        self._depth[core] = depth + 1
+        if depth > 0:
+            return  # nested: this core already holds the bus
+        start = utime.ticks_us()
+        if not ((device.urgent or not self._urgent_waiting()) and self._lock.acquire(0)):
+            if device.urgent:
+                device.waiting = True
+            while not ((device.urgent or not self._urgent_waiting()) and self._lock.acquire(0)):
+                pass
+            device.waiting = False
+            waited = utime.ticks_diff(utime.ticks_us(), start)
+            device.contended += 1
+            device.wait_us += waited
+            if waited > device.max_wait_us:
+                device.max_wait_us = waited
+        self._held_since = utime.ticks_us()
+        device.transactions += 1
+        if self._baudrate != device.baudrate:
+            self.spi.init(baudrate=device.baudrate)
+            self._baudrate = device.baudrate
+            self.reconfigurations += 1
+
+    def _release(self, device: SPIDevice) -> None:
+        """
+        End a transaction. When the outermost one ends, free the bus and run the call deferred by this core's
+        interrupt handlers, whichever device they were for.
+        """
+        core = _core()
+        depth = self._depth[core] - 1
+        if depth > 0:
+            self._depth[core] = depth
+            return
+        held = utime.ticks_diff(utime.ticks_us(), self._held_since)
+        device.hold_us += held
+        if held > device.max_hold_us:
+            device.max_hold_us = held
+        self._lock.release()
+        self._depth[core] = 0
+        deferred = self._deferred[core]
+        if deferred is not None:
+            self._deferred[core] = None
+            deferred[0](deferred[1])
+
+    def restore(self) -> None:
+        """
+        Set the baudrate again, e.g. after lightsleep switched the clocks it's derived from.
+        """
+        self.spi.init(baudrate=self._baudrate)
+
+    def stats(self) -> Dict:
+        """
+        Contention and wait times per device, and how often the baudrate was switched.
+        """
+        return {
+            'reconfigurations': self.reconfigurations,
+            'devices': {device.name: device.stats() for device in self.devices},
+        }
@@ -16,6 +16,9 @@ class BadgeUART:
         self.uart = UART(1, baudrate=115200, tx=4, rx=5)
         self._uart_connected = False
         self._buffer = b''
+        self._commands = {}  # command -> function returning the reply
+        self._pending_commands = []  # received commands whose replies haven't been sent yet
+        self.command_job = None  # scheduler job that runs run_pending_commands(), set up by InternalOS
 
     def detect_badge(self) -> bool:
         try:
@@ -58,6 +61,15 @@ class BadgeUART:
             return data
         return b''
 
+    def register_command(self, command: bytes, handler) -> None:
+        """
+        Register a command that can be sent over the UART, e.g. by a debugging host.
+        When `command` shows up in the received data, it is removed from the buffer and the bytes
+        returned by `handler()` are sent back. The handler runs from a scheduler job, not from the IRQ handler,
+        so it may allocate as much as it needs.
+        """
+        self._commands[command] = handler
+
     def _on_uart_rx(self, uart):
         """
         IRQ handler that is called when UART data is received.
@@ -74,3 +86,22 @@ class BadgeUART:
                     #self.send(b'ADDR_ACK')
                     # Remove command from buffer to avoid reprocessing
                     self._buffer = self._buffer.replace(b'ADDR', b'')
+
+                for command in self._commands:
+                    if command in self._buffer:
+                        self._buffer = self._buffer.replace(command, b'')
+                        if command not in self._pending_commands:
+                            self._pending_commands.append(command)
+                if self._pending_commands and self.command_job is not None:
+                    self.command_job.trigger()
+
+    def run_pending_commands(self) -> None:
+        """
+        Scheduler job, triggered by the IRQ handler: build and send the replies to the received commands.
+        """
+        while self._pending_commands:
+            command = self._pending_commands.pop(0)
+            try:
+                self.uart.write(self._commands[command]())
+            except Exception as e:
+                self.logger.error(f"Error handling UART command {command}: {e}")
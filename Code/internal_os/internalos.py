@@ -1,18 +1,24 @@
 import _thread
 import asyncio
 import gc
+import json
+import tracing
 
 from machine import RTC, Pin, PWM, unique_id
 
 from internal_os.hardware.uart import BadgeUART
-from internal_os.hardware.display import BadgeDisplay
+from internal_os.hardware.spibus import SPIBus
+from internal_os.hardware.display import BadgeDisplay, IDLE_CHECK_MS
 from internal_os.hardware.buttons import BadgeButtons
-from internal_os.hardware.radio import BadgeRadio
+from internal_os.hardware.radio import BadgeRadio, SERVICE_INTERVAL_MS
 from internal_os.hardware.utils import BadgeUtils
 
 from internal_os.contacts import ContactsManager
 from internal_os.notifs import NotifManager
-from internal_os.apps import AppManager
+from internal_os.apps import AppManager, HOME_BUTTON_POLL_MS
+from internal_os.scheduler import Scheduler
+from internal_os.supervisor import Supervisor, WATCHDOG_FEED_MS
+from internal_os.lpm import LowPowerManager, CHECK_MS as LPM_CHECK_MS
 
 import logging
 
@@ -55,7 +61,8 @@ class InternalOS:
     
         # Step 1:
         # hardware
-        self.display = BadgeDisplay()
+        self.spi_bus = SPIBus()  # SPI0: the display and the radio
+        self.display = BadgeDisplay(self.spi_bus)
         self.radio = BadgeRadio(self)
         self.buttons = BadgeButtons()
         self.rtc = RTC()
@@ -69,13 +76,39 @@ class InternalOS:
         self.notifs = NotifManager()
         self.apps = AppManager(self.buttons, self.display)
 
+        # debugging commands over the badge-to-badge UART
+        self.uart.register_command(b'RADIOSTATS', lambda: json.dumps(self.radio.stats()).encode() + b'\n')
+        self.uart.register_command(b'SPISTATS', lambda: json.dumps(self.spi_bus.stats()).encode() + b'\n')
+        self.uart.register_command(b'TRACESTART', self._start_trace)
+        self.uart.register_command(b'TRACEDUMP', lambda: tracing.dump().encode() + b'\n')
+        self.uart.register_command(b'RESCAN', self._request_rescan)
+        self.uart.register_command(b'APPSTATS', self._app_stats)
+        self.uart.register_command(b'SCHEDSTATS', lambda: json.dumps(self.scheduler.stats()).encode() + b'\n')
+        self.uart.register_command(b'TASKSTATS', lambda: json.dumps(self.supervisor.stats()).encode() + b'\n')
+        self.uart.register_command(b'LPMSTATS', lambda: json.dumps(self.lpm.stats()).encode() + b'\n')
+        self.uart.register_command(b'LAUNCHSTATS', lambda: json.dumps(self.apps.launch_stats.snapshot_all()).encode() + b'\n')
+
 
         # Step 2:
-        asyncio.create_task(self.apps.scan_forever(interval=15)) # TODO: lower this interval in prod?
-        asyncio.create_task(self.apps.home_button_watcher())
-        asyncio.create_task(self.display.idle_when_inactive())
-        asyncio.create_task(self.radio.manage_packets_forever())
-        asyncio.create_task(self.launch_home_screen())
+        # periodic work runs as scheduler jobs; the event sources trigger them instead of having them poll
+        self.scheduler = Scheduler()
+        self.supervisor = Supervisor()
+        self.lpm = LowPowerManager(self)
+        self.apps.rescan_job = self.scheduler.on_trigger(self.apps.rescan_if_requested, "rescan")
+        self.apps.launch_job = self.scheduler.on_trigger(self.apps.launch_if_requested, "launch")
+        self.apps.unload_job = self.scheduler.on_trigger(self.apps.unload_exited_apps, "unload apps")
+        self.uart.command_job = self.scheduler.on_trigger(self.uart.run_pending_commands, "uart commands")
+        self.apps.home_button_job = self.scheduler.every(HOME_BUTTON_POLL_MS, self.apps.check_home_button, "home button")
+        self.apps.tasks.pending_job = self.scheduler.on_trigger(self.apps.tasks.start_pending, "app tasks")
+        self.radio.service_job = self.scheduler.every(SERVICE_INTERVAL_MS, self.radio.run_service, "radio")
+        self.scheduler.every(IDLE_CHECK_MS, self.display.check_idle, "display idle")
+        self.scheduler.after(1000, self.launch_home_screen, "launch home screen")  # give time for the display to initialize
+        self.scheduler.every(WATCHDOG_FEED_MS, self.supervisor.feed_watchdog, "watchdog")
+        self.scheduler.every(LPM_CHECK_MS, self.lpm.check, "low power mode")
+
+        # the OS's own tasks: restarted if they fail, and the watchdog isn't fed while they're down
+        self.supervisor.supervise("scheduler", self.scheduler.run)
+        self.supervisor.supervise("packet worker", self.apps.packet_worker)
 
     def run_forever(self):
         # Step 3:
@@ -85,16 +118,15 @@ class InternalOS:
     async def run_async(self):
         """
         The main async loop for the badge. This runs on the main core.
+        Everything runs in the tasks started by setup(); this only keeps the event loop going.
         """
-        while True:
-            await asyncio.sleep(1)
+        await asyncio.Event().wait()
 
     async def launch_home_screen(self):
         """
         Launches the home screen app.
         This is the app that is shown when the badge is started.
         """
-        await asyncio.sleep(1)  # Give time for the display to initialize
         home_app = self.apps.get_app_by_path('/apps/home-screen')
         if not home_app:
             self.apps.logger.error("Home app not found. Cannot launch home screen.")
@@ -109,4 +141,32 @@ class InternalOS:
         return unique_id().hex()[-4:]
     
     def get_badge_id_int(self) -> int:
-        return int.from_bytes(unique_id()[-2:], 'big')
\ No newline at end of file
+        return int.from_bytes(unique_id()[-2:], 'big')
+
+    def _request_rescan(self) -> bytes:
+        """
+        UART command: scan /apps again, e.g. after apps were uploaded.
+        """
+        self.apps.request_rescan()
+        return b'RESCAN_ACK\n'
+
+    def _app_stats(self) -> bytes:
+        """
+        UART command: the app manager's statistics, as JSON.
+        """
+        return json.dumps({
+            'bg_pool': self.apps.bg_pool_stats(),
+            'handlers': self.apps.handler_stats(),
+            'memory': self.apps.memory_stats(),
+            'loops': self.apps.loop_stats(),
+            'stops': self.apps.stop_stats(),
+            'tasks': self.apps.tasks.stats(),
+            'queues': self.apps.queue_stats(),
+        }).encode() + b'\n'
+
+    def _start_trace(self) -> bytes:
+        """
+        UART command: start recording trace events (only modules built with _TRACE = 1 record any).
+        """
+        tracing.enable()
+        return b'TRACE_ACK\n'
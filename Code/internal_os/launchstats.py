@@ -0,0 +1,115 @@
+""" Timing of app launches, stage by stage """
+import utime
+
+try:
+    from typing import Dict, List, Optional
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+# the stages of a launch, in order. Each one lasts from the end of the previous one (or the start of the launch) to its mark.
+STAGES = (
+    'stop',    # stopping the previous foreground app
+    'thread',  # starting the app thread on core 1
+    'lock',    # acquiring the foreground app lock in the app thread
+    'import',  # importing the app's main module
+    'init',    # App.__init__
+    'open',    # App.on_open
+)
+TOTAL_BUCKET_EDGES_MS = (100, 200, 500, 1000, 2000, 5000)  # histograms have one more bucket than edges
+HISTORY_LENGTH = 8  # launches kept per app for the averages
+MAX_TRACKED_APPS = 16
+
+class LaunchTimer:
+    """
+    ticks_us timestamps of one launch, marked as it goes through the stages.
+    It's created in AppManager.launch_app() and handed to the app thread, so marks come from both cores.
+    """
+    def __init__(self, app_path: str) -> None:
+        self.app_path = app_path
+        self.started = utime.ticks_us()
+        self._marks: Dict[str, int] = {}
+
+    def mark(self, stage: str) -> None:
+        """
+        Record that a stage just ended.
+        """
+        self._marks[stage] = utime.ticks_us()
+
+    def durations(self) -> List[int]:
+        """
+        :return: The time each stage took, in µs, in the order of STAGES. Stages that weren't marked took 0.
+        """
+        result = []
+        previous = self.started
+        for stage in STAGES:
+            mark = self._marks.get(stage)
+            if mark is None:
+                result.append(0)
+            else:
+                result.append(utime.ticks_diff(mark, previous))
+                previous = mark
+        return result
+
+class _AppLaunches:
+    def __init__(self) -> None:
+        self.launches = 0
+        self.history: List[List[int]] = []  # stage durations in µs of the last HISTORY_LENGTH launches, oldest first
+        self.histogram: List[int] = [0] * (len(TOTAL_BUCKET_EDGES_MS) + 1)  # total launch time
+
+class LaunchStats:
+    """
+    Rolling statistics about how long launching each app takes, and where the time goes.
+    """
+    def __init__(self) -> None:
+        self._apps: Dict[str, _AppLaunches] = {}
+        self._app_order: List[str] = []
+
+    def record(self, timer: LaunchTimer) -> None:
+        """
+        Add a finished launch to the statistics.
+        """
+        app = self._apps.get(timer.app_path)
+        if app is None:
+            if len(self._app_order) >= MAX_TRACKED_APPS:
+                del self._apps[self._app_order.pop(0)]
+            app = _AppLaunches()
+            self._apps[timer.app_path] = app
+            self._app_order.append(timer.app_path)
+
+        durations = timer.durations()
+        app.launches += 1
+        app.history.append(durations)
+        if len(app.history) > HISTORY_LENGTH:
+            app.history.pop(0)
+        total_ms = sum(durations) // 1000
+        bucket = 0
+        for edge in TOTAL_BUCKET_EDGES_MS:
+            if total_ms < edge:
+                break
+            bucket += 1
+        app.histogram[bucket] += 1
+
+    def snapshot(self, app_path: str) -> Optional[Dict]:
+        """
+        :return: The launch statistics of one app, with times in ms, or None if it hasn't been launched yet.
+        """
+        app = self._apps.get(app_path)
+        if app is None:
+            return None
+        last = app.history[-1]
+        averages = [sum(launch[i] for launch in app.history) // len(app.history) for i in range(len(STAGES))]
+        return {
+            'launches': app.launches,
+            'last_ms': {stage: last[i] / 1000 for i, stage in enumerate(STAGES)},
+            'avg_ms': {stage: averages[i] / 1000 for i, stage in enumerate(STAGES)},
+            'last_total_ms': sum(last) / 1000,
+            'avg_total_ms': sum(averages) / 1000,
+            'total_histogram': {'edges_ms': TOTAL_BUCKET_EDGES_MS, 'counts': list(app.histogram)},
+        }
+
+    def snapshot_all(self) -> Dict[str, Dict]:
+        """
+        :return: snapshot() of every app that has been launched, by app path.
+        """
+        return {app_path: self.snapshot(app_path) for app_path in self._app_order}
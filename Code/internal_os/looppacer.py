@@ -0,0 +1,106 @@
+""" Pacing of the foreground app's loop() on core 1 """
+import utime
+
+try:
+    from typing import Dict
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+SLEEP_SLICE_MS = 5  # how often a sleeping app thread checks for wake-ups
+EVENT_MODE_DEFAULT_RATE = 1  # Hz: loop() calls of an event-driven app when nothing happens
+STATS_WINDOW_MS = 1000  # loop rate and CPU use are reported over this window
+
+class LoopPacer:
+    """
+    Decides when the app thread calls the foreground app's loop() next.
+
+    Apps choose in their manifest:
+    - nothing: loop() runs back to back, as fast as it can (the way apps always ran);
+    - "loopRate": N: loop() runs at most N times per second;
+    - "loopMode": "event": loop() runs when a button changes or a packet arrives for the app, and otherwise
+      "loopRate" times per second (once per second if not given).
+    Between calls the thread sleeps in short slices, so wake() (from any core, or an ISR) gets the next loop()
+    going within a few milliseconds.
+    """
+    def __init__(self, loop_rate: float = 0, event_mode: bool = False) -> None:
+        if event_mode and not loop_rate:
+            loop_rate = EVENT_MODE_DEFAULT_RATE
+        self.event_mode = event_mode
+        self.interval_us = int(1_000_000 / loop_rate) if loop_rate else 0
+        self._wake = False
+
+        self.started = utime.ticks_ms()
+        self.loops = 0
+        self.wakes = 0  # loop() calls brought forward by wake()
+        self.busy_us = 0  # time spent in loop()
+        self._frame_start = utime.ticks_us()
+
+        # the current stats window
+        self._window_start = self.started
+        self._window_loops = 0
+        self._window_busy_us = 0
+        self.loop_rate = 0.0  # loop() calls per second in the last window
+        self.cpu = 0.0  # share of the last window spent in loop()
+
+    def wake(self) -> None:
+        """
+        Run the next loop() as soon as possible. Safe to call from any context.
+        """
+        self._wake = True
+
+    def frame_start(self) -> None:
+        """
+        Call right before loop().
+        """
+        self._frame_start = utime.ticks_us()
+
+    def frame_end(self) -> None:
+        """
+        Call right after loop().
+        """
+        busy = utime.ticks_diff(utime.ticks_us(), self._frame_start)
+        self.loops += 1
+        self.busy_us += busy
+        self._window_loops += 1
+        self._window_busy_us += busy
+        now = utime.ticks_ms()
+        elapsed = utime.ticks_diff(now, self._window_start)
+        if elapsed >= STATS_WINDOW_MS:
+            self.loop_rate = self._window_loops * 1000 / elapsed
+            self.cpu = self._window_busy_us / (elapsed * 1000)
+            self._window_start = now
+            self._window_loops = 0
+            self._window_busy_us = 0
+
+    def wait(self, keep_running) -> None:
+        """
+        Sleep until the next loop() is due, wake() is called or keep_running() turns False.
+        """
+        if not self.interval_us:
+            return
+        deadline = utime.ticks_add(self._frame_start, self.interval_us)
+        while not self._wake and keep_running():
+            remaining_ms = utime.ticks_diff(deadline, utime.ticks_us()) // 1000
+            if remaining_ms <= 0:
+                break
+            utime.sleep_ms(min(SLEEP_SLICE_MS, remaining_ms))
+        if self._wake:
+            self._wake = False
+            self.wakes += 1
+
+    def stats(self) -> Dict:
+        """
+        Loop rate and CPU use of the app: over the last second and since it started.
+        """
+        elapsed_ms = utime.ticks_diff(utime.ticks_ms(), self.started)
+        return {
+            'mode': 'event' if self.event_mode else ('paced' if self.interval_us else 'free'),
+            'target_rate': round(1_000_000 / self.interval_us, 1) if self.interval_us else None,
+            'loop_rate': round(self.loop_rate, 1),
+            'cpu': round(self.cpu, 3),
+            'loops': self.loops,
+            'wakes': self.wakes,
+            'avg_loop_us': self.busy_us // self.loops if self.loops else 0,
+            'avg_cpu': round(self.busy_us / (elapsed_ms * 1000), 3) if elapsed_ms > 0 else 0.0,
+        }
@@ -0,0 +1,148 @@
+""" Low power mode: lightsleep while nobody is using the badge """
+import logging
+import machine
+import utime
+from machine import Pin
+
+try:
+    from typing import Dict
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+INACTIVITY_MS = 30_000  # default time without button input before the badge may go to low power mode
+CHECK_MS = 1000  # how often the job checks while the badge is in use
+MIN_SLEEP_MS = 50  # shorter sleeps aren't worth switching the clocks for
+MAX_SLEEP_MS = 5000  # stays well below the watchdog timeout (see supervisor.py), which keeps counting in lightsleep
+BUTTON_INT_PIN = 2  # the PCA9555's INT: low while a button change hasn't been read
+RADIO_DIO1_PIN = 17  # the SX1262's DIO1: high while it has an interrupt pending
+
+WAKE_BUTTON = "button"
+WAKE_RADIO = "radio"
+WAKE_TIMER = "timer"
+WAKE_OTHER = "other"
+
+class LowPowerManager:
+    """
+    Puts the RP2040 into lightsleep when nobody has pressed a button for `inactivity_ms`, the display
+    is asleep, the radio has nothing to do and no app work is in progress. Both cores stop; the button
+    interrupt, the radio's DIO1 and a timer for the next scheduler job wake them up. Those pin interrupts
+    are already set up by the button and radio drivers, so there's nothing to arm.
+
+    It runs as a scheduler job, so it sleeps in place of the event loop waiting for the next job. While the
+    badge stays idle, it goes back to sleep right after the jobs that woke it ran. When a button or the radio
+    wakes it, the foreground app's on_wake_from_lpm() is called from the app thread.
+    """
+    def __init__(self, internal_os, inactivity_ms: int = INACTIVITY_MS) -> None:
+        self.logger = logging.getLogger("LowPowerManager")
+        self.logger.setLevel(logging.INFO)
+        self.internal_os = internal_os
+        self.inactivity_ms = inactivity_ms
+        self.enabled = True
+        self.in_lpm = False
+        self._button_int = Pin(BUTTON_INT_PIN)  # without a mode, so the buttons' IRQ setup is left alone
+        self._radio_dio1 = Pin(RADIO_DIO1_PIN)
+        self._freq = machine.freq()
+
+        self._started = utime.ticks_ms()
+        self.entered = 0  # times the badge went into low power mode
+        self.sleeps = 0
+        self.asleep_ms = 0
+        self.max_sleep_ms = 0
+        self.wakes: Dict[str, int] = {WAKE_BUTTON: 0, WAKE_RADIO: 0, WAKE_TIMER: 0, WAKE_OTHER: 0}
+
+    def can_sleep(self) -> bool:
+        """
+        Whether the badge is idle enough for lightsleep.
+        """
+        os = self.internal_os
+        return (self.enabled
+                and utime.ticks_diff(utime.ticks_ms(), os.buttons.last_change) >= self.inactivity_ms
+                and os.display.is_asleep
+                and not os.radio.has_pending_work()
+                and not os.uart.is_connected()  # UART traffic can't wake it up
+                and os.apps.can_sleep())
+
+    def check(self) -> int:
+        """
+        Scheduler job: sleep until the next job is due if the badge is idle.
+        :return: ms until it should run again.
+        """
+        if not self.can_sleep():
+            if self.in_lpm:
+                self._leave()
+            return CHECK_MS
+        sleep_ms = self.internal_os.scheduler.ms_until_next()
+        if sleep_ms is None or sleep_ms > MAX_SLEEP_MS:
+            sleep_ms = MAX_SLEEP_MS
+        if sleep_ms < MIN_SLEEP_MS:
+            return 0  # after the jobs that are due
+        if not self.in_lpm:
+            self.in_lpm = True
+            self.entered += 1
+            self.logger.info(f"No input for {self.inactivity_ms // 1000} s, entering low power mode.")
+        cause = self._sleep(sleep_ms)
+        if cause == WAKE_BUTTON or cause == WAKE_RADIO:
+            self._leave()
+            return CHECK_MS
+        return 0
+
+    def _sleep(self, sleep_ms: int) -> str:
+        """
+        Lightsleep for up to sleep_ms, then restore what the sleep disturbed.
+        :return: What woke the badge up.
+        """
+        self.internal_os.supervisor.feed_watchdog()
+        self._freq = machine.freq()
+        start = utime.ticks_ms()
+        machine.lightsleep(sleep_ms)
+        slept = utime.ticks_diff(utime.ticks_ms(), start)
+        self._restore()
+
+        self.sleeps += 1
+        self.asleep_ms += slept
+        if slept > self.max_sleep_ms:
+            self.max_sleep_ms = slept
+        # the pins still show it: the drivers' interrupt handlers haven't run yet
+        if self._button_int.value() == 0:
+            cause = WAKE_BUTTON
+        elif self._radio_dio1.value() == 1:
+            cause = WAKE_RADIO
+        elif slept >= sleep_ms:
+            cause = WAKE_TIMER
+        else:
+            cause = WAKE_OTHER
+        self.wakes[cause] += 1
+        return cause
+
+    def _restore(self) -> None:
+        """
+        Bring the clocks and the peripherals that depend on them back to how they were before the sleep.
+        """
+        if machine.freq() != self._freq:
+            machine.freq(self._freq)
+        self.internal_os.spi_bus.restore()
+        self.internal_os.buttons.refresh()  # edges that came in while the clocks were switched
+
+    def _leave(self) -> None:
+        self.in_lpm = False
+        self.logger.info("Leaving low power mode.")
+        self.internal_os.apps.notify_wake_from_lpm()
+
+    def stats(self) -> Dict:
+        """
+        How often and how long the badge slept, and what woke it up.
+        """
+        elapsed_ms = utime.ticks_diff(utime.ticks_ms(), self._started)
+        return {
+            'enabled': self.enabled,
+            'in_lpm': self.in_lpm,
+            'inactivity_ms': self.inactivity_ms,
+            'entered': self.entered,
+            'sleeps': self.sleeps,
+            'asleep_s': self.asleep_ms / 1000,
+            'asleep_share': round(self.asleep_ms / elapsed_ms, 3) if elapsed_ms > 0 else 0.0,
+            'avg_sleep_ms': self.asleep_ms // self.sleeps if self.sleeps else 0,
+            'max_sleep_ms': self.max_sleep_ms,
+            'wakes': self.wakes,
+        }
@@ -0,0 +1,238 @@
+""" The OS's periodic and one-shot jobs, run from one task on a timer wheel """
+import asyncio
+import logging
+import utime
+
+try:
+    from typing import Dict, List, Optional
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+TICK_MS = 20  # resolution of the wheel: deadlines are rounded up to it, so jobs due close together run in one wakeup
+WHEEL_SLOTS = 64  # one turn of the wheel is 1.28 s; jobs further out go around more than once
+
+class Job:
+    """
+    A job registered with the Scheduler. Its function may return:
+    - a coroutine: it's run as a task, and the job doesn't run again until the task is done;
+    - an int: for periodic jobs, the delay in ms until the next run, instead of the job's interval;
+    - anything else, which is ignored.
+    """
+    def __init__(self, scheduler: 'Scheduler', name: str, func, interval_ms: int) -> None:
+        self.scheduler = scheduler
+        self.name = name
+        self.func = func
+        self.interval_ms = interval_ms  # 0 for one-shot and triggered-only jobs
+        self.one_shot = False
+        self.triggered = False
+        self.running = False  # the task of the last run hasn't finished yet
+        self.cancelled = False
+        self._slot: Optional[int] = None  # slot of the wheel the job is in, if it's scheduled
+        self._rounds = 0  # turns of the wheel left before it's due
+
+        self.runs = 0
+        self.triggers = 0
+        self.skipped = 0  # runs skipped because the last one was still running
+        self.busy_us = 0
+        self.max_us = 0
+
+    def trigger(self) -> None:
+        """
+        Run the job as soon as possible. Safe to call from ISRs and from the other core.
+        """
+        self.triggered = True
+        self.scheduler._wake()
+
+    def cancel(self) -> None:
+        """
+        Stop running the job. Only call this from the event loop.
+        """
+        self.cancelled = True
+        self.scheduler._unschedule(self)
+
+    def stats(self) -> Dict:
+        return {
+            'interval_ms': self.interval_ms,
+            'runs': self.runs,
+            'triggers': self.triggers,
+            'skipped': self.skipped,
+            'avg_us': self.busy_us // self.runs if self.runs else 0,
+            'max_us': self.max_us,
+        }
+
+class Scheduler:
+    """
+    Runs the OS's jobs from a single task, instead of each one polling in its own coroutine.
+
+    Jobs sit in a hashed timer wheel: WHEEL_SLOTS slots of TICK_MS each. The task sleeps until the first
+    slot with a due job, so all jobs that fall into the same slot share one wakeup, and there are no wakeups
+    at all while nothing is due. Event sources (the radio and button interrupts, the app thread) trigger
+    jobs to run right away instead of being polled.
+    """
+    def __init__(self) -> None:
+        self.logger = logging.getLogger("Scheduler")
+        self.logger.setLevel(logging.INFO)
+        self._slots: List[List[Job]] = [[] for _ in range(WHEEL_SLOTS)]
+        self._current = 0  # the slot of the last tick processed
+        self._last_tick_ms = utime.ticks_ms()
+        self.jobs: List[Job] = []
+        # ThreadSafeFlag can be set from ISRs and the other core. The host-side tools only have asyncio.Event.
+        self._thread_safe = hasattr(asyncio, 'ThreadSafeFlag')
+        self._flag = asyncio.ThreadSafeFlag() if self._thread_safe else asyncio.Event()
+        self._started = utime.ticks_ms()
+        self.wakeups = 0
+
+    def every(self, interval_ms: int, func, name: str) -> Job:
+        """
+        Run func every interval_ms, starting interval_ms from now.
+        """
+        job = Job(self, name, func, interval_ms)
+        self.jobs.append(job)
+        self._schedule(job, interval_ms)
+        return job
+
+    def after(self, delay_ms: int, func, name: str) -> Job:
+        """
+        Run func once, delay_ms from now.
+        """
+        job = Job(self, name, func, 0)
+        job.one_shot = True
+        self.jobs.append(job)
+        self._schedule(job, delay_ms)
+        return job
+
+    def on_trigger(self, func, name: str) -> Job:
+        """
+        Run func whenever the returned job is triggered.
+        """
+        job = Job(self, name, func, 0)
+        self.jobs.append(job)
+        return job
+
+    def _wake(self) -> None:
+        self._flag.set()
+
+    def _schedule(self, job: Job, delay_ms: int) -> None:
+        self._unschedule(job)
+        ticks = max(1, (delay_ms + TICK_MS - 1) // TICK_MS)
+        job._slot = (self._current + ticks) % WHEEL_SLOTS
+        job._rounds = (ticks - 1) // WHEEL_SLOTS
+        self._slots[job._slot].append(job)
+
+    def _unschedule(self, job: Job) -> None:
+        if job._slot is not None:
+            self._slots[job._slot].remove(job)
+            job._slot = None
+
+    def _advance(self, now: int) -> List[Job]:
+        """
+        Move the wheel forward to now.
+        :return: The jobs that came due.
+        """
+        due = []
+        while utime.ticks_diff(now, self._last_tick_ms) >= TICK_MS:
+            self._last_tick_ms = utime.ticks_add(self._last_tick_ms, TICK_MS)
+            self._current = (self._current + 1) % WHEEL_SLOTS
+            slot = self._slots[self._current]
+            for job in list(slot):
+                if job._rounds > 0:
+                    job._rounds -= 1
+                else:
+                    slot.remove(job)
+                    job._slot = None
+                    due.append(job)
+        return due
+
+    def ms_until_next(self) -> Optional[int]:
+        """
+        :return: Time until the first scheduled job is due, or None if no job is scheduled.
+        """
+        best = None
+        for offset in range(1, WHEEL_SLOTS + 1):
+            for job in self._slots[(self._current + offset) % WHEEL_SLOTS]:
+                ticks = offset + job._rounds * WHEEL_SLOTS
+                if best is None or ticks < best:
+                    best = ticks
+            if best is not None and best <= offset:
+                break  # later slots can only be further out
+        if best is None:
+            return None
+        return max(0, best * TICK_MS - utime.ticks_diff(utime.ticks_ms(), self._last_tick_ms))
+
+    def _run(self, job: Job) -> None:
+        if job.cancelled:
+            return
+        if job.running:
+            job.skipped += 1
+            if job.interval_ms:
+                self._schedule(job, job.interval_ms)
+            return
+        start = utime.ticks_us()
+        try:
+            result = job.func()
+        except Exception as e:
+            self.logger.exception(e, f"Error in scheduled job {job.name}:")
+            result = None
+        elapsed = utime.ticks_diff(utime.ticks_us(), start)
+        job.runs += 1
+        job.busy_us += elapsed
+        if elapsed > job.max_us:
+            job.max_us = elapsed
+        if hasattr(result, 'send'):
+            job.running = True
+            asyncio.create_task(self._finish(job, result))
+            result = None
+        if job.interval_ms and not job.cancelled:
+            # bool is a subclass of int, but a job returning True/False doesn't mean a delay
+            delay = result if isinstance(result, int) and not isinstance(result, bool) else job.interval_ms
+            self._schedule(job, delay)
+        elif job.one_shot:
+            self.jobs.remove(job)
+
+    async def _finish(self, job: Job, coro) -> None:
+        try:
+            await coro
+        except Exception as e:
+            self.logger.exception(e, f"Error in scheduled job {job.name}:")
+        finally:
+            job.running = False
+
+    async def run(self) -> None:
+        """
+        Run the jobs forever. Start this once, on the event loop.
+        """
+        self._last_tick_ms = utime.ticks_ms()
+        while True:
+            self.wakeups += 1
+            due = self._advance(utime.ticks_ms())
+            for job in self.jobs:
+                if job.triggered:
+                    job.triggered = False
+                    job.triggers += 1
+                    if job not in due:
+                        due.append(job)
+            for job in due:
+                self._run(job)
+
+            timeout = self.ms_until_next()
+            try:
+                if timeout is None:
+                    await self._flag.wait()
+                else:
+                    await asyncio.wait_for(self._flag.wait(), timeout / 1000)
+            except asyncio.TimeoutError:
+                pass
+            if not self._thread_safe:
+                self._flag.clear()  # ThreadSafeFlag clears itself when wait() returns
+
+    def stats(self) -> Dict:
+        """
+        Wakeups of the scheduler task (total and per second since it started), and run counts and times per job.
+        """
+        elapsed_ms = utime.ticks_diff(utime.ticks_ms(), self._started)
+        return {
+            'wakeups': self.wakeups,
+            'wakeups_per_s': round(self.wakeups * 1000 / elapsed_ms, 2) if elapsed_ms > 0 else 0.0,
+            'jobs': {job.name: job.stats() for job in self.jobs},
+        }
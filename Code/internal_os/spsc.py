@@ -0,0 +1,81 @@
+""" Single-producer/single-consumer ring queues, for handing events from core 0 to the app thread on core 1 """
+try:
+    from typing import Dict
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+class SPSCQueue:
+    """
+    A bounded ring queue that one producer and one consumer can use at the same time without a lock,
+    e.g. the OS on core 0 putting events and the foreground app taking them in its loop() on core 1.
+
+    The producer only ever writes the tail and the consumer only ever writes the head, and an item is stored
+    before the tail moves past it, so neither side can see a half-written slot. put() and get() don't allocate,
+    so the producer may be an ISR. A full queue drops new items and counts them as overflows.
+    Items can be anything but None, which get() returns when the queue is empty.
+    """
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._size = capacity + 1  # one slot always stays empty, so that a full queue can be told from an empty one
+        self._slots = [None] * self._size
+        self._head = 0  # next slot to read, only written by the consumer
+        self._tail = 0  # next slot to write, only written by the producer
+        # producer side
+        self.puts = 0
+        self.overflows = 0
+        # consumer side
+        self.gets = 0
+
+    def put(self, item) -> bool:
+        """
+        Producer: add an item to the queue.
+        :return: Whether it was added (False if the queue was full).
+        """
+        tail = self._tail
+        next_tail = tail + 1
+        if next_tail == self._size:
+            next_tail = 0
+        if next_tail == self._head:
+            self.overflows += 1
+            return False
+        self._slots[tail] = item
+        self._tail = next_tail  # publish the item only once it's in its slot
+        self.puts += 1
+        return True
+
+    def get(self):
+        """
+        Consumer: take the oldest item from the queue.
+        :return: The item, or None if the queue is empty.
+        """
+        head = self._head
+        if head == self._tail:
+            return None
+        item = self._slots[head]
+        self._slots[head] = None  # don't keep the item alive
+        head += 1
+        if head == self._size:
+            head = 0
+        self._head = head
+        self.gets += 1
+        return item
+
+    def clear(self) -> None:
+        """
+        Consumer: drop everything that's queued.
+        """
+        while self.get() is not None:
+            pass
+
+    def __len__(self) -> int:
+        return (self._tail - self._head) % self._size
+
+    def stats(self) -> Dict:
+        return {
+            'capacity': self.capacity,
+            'queued': len(self),
+            'puts': self.puts,
+            'gets': self.gets,
+            'overflows': self.overflows,
+        }
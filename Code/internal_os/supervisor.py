@@ -0,0 +1,167 @@
+""" Keeps the OS's own tasks running, feeds the watchdog and accounts for their CPU time """
+import asyncio
+import logging
+import machine
+import os
+import utime
+
+try:
+    from typing import Dict
+except ImportError:
+    # we're on an MCU, typing is not available
+    pass
+
+# The watchdog is only armed when this file exists. Once armed it can't be stopped, and the webflasher (like any
+# REPL tool) starts with Ctrl-C, which stops the event loop: the badge would reset in the middle of flashing.
+WATCHDOG_FLAG_FILE = "/watchdog"
+WATCHDOG_TIMEOUT_MS = 8000  # the RP2040's maximum is about 8.3 s
+WATCHDOG_FEED_MS = 1000  # how often the scheduler job feeds it
+BACKOFF_START_MS = 100  # wait before the first restart of a failed task; doubled for each further failure
+BACKOFF_MAX_MS = 30_000
+BACKOFF_RESET_MS = 60_000  # a task that ran this long before failing starts over with BACKOFF_START_MS
+
+RUNNING = "running"
+BACKING_OFF = "backing off"
+FINISHED = "finished"
+
+def _flag_set(path: str) -> bool:
+    try:
+        os.stat(path)
+        return True
+    except OSError:
+        return False
+
+class _SupervisedTask:
+    def __init__(self, name: str, factory, critical: bool) -> None:
+        self.name = name
+        self.factory = factory  # returns a new coroutine for the task
+        self.critical = critical  # the watchdog isn't fed while a critical task is down
+        self.state = RUNNING
+        self.started = utime.ticks_ms()
+        self.backoff_ms = BACKOFF_START_MS
+        self.restarts = 0
+        self.steps = 0
+        self.busy_us = 0
+        self.max_step_us = 0
+
+class Supervisor:
+    """
+    Runs the OS's tasks, restarting them with exponential backoff when they raise, instead of letting them
+    die silently. Every task is stepped through a proxy generator (MicroPython's asyncio drives coroutines as
+    generators, so the proxy passes their yields through) that counts and times its steps: the code between
+    two awaits. That shows which task hogs the event loop.
+
+    The hardware watchdog is fed by a scheduler job, and only while every critical task is running. So the
+    badge resets if the event loop gets stuck, or if a critical task keeps failing for WATCHDOG_TIMEOUT_MS.
+    It's opt-in (see WATCHDOG_FLAG_FILE), as it would also reset a badge that is stopped over the REPL.
+    """
+    def __init__(self) -> None:
+        self.logger = logging.getLogger("Supervisor")
+        self.logger.setLevel(logging.INFO)
+        self.tasks: Dict[str, _SupervisedTask] = {}
+        self.watchdog = None
+        self.watchdog_enabled = _flag_set(WATCHDOG_FLAG_FILE)
+        self.feeds = 0
+        self.feeds_withheld = 0  # feeds skipped because a critical task was down
+        if machine.reset_cause() == machine.WDT_RESET:
+            self.logger.warning("The badge was reset by the watchdog.")
+
+    def supervise(self, name: str, factory, critical: bool = True) -> None:
+        """
+        Start a task and keep it running.
+        :param factory: Called to create the task's coroutine, again for every restart.
+        :param critical: Whether the badge can't work without it.
+        """
+        task = _SupervisedTask(name, factory, critical)
+        self.tasks[name] = task
+        asyncio.create_task(self._keep_running(task))
+
+    async def _keep_running(self, task: _SupervisedTask) -> None:
+        while True:
+            task.state = RUNNING
+            task.started = utime.ticks_ms()
+            error = await self._steps(task, task.factory())
+            if error is None:
+                self.logger.info(f"Task {task.name} finished.")
+                task.state = FINISHED
+                return
+            if utime.ticks_diff(utime.ticks_ms(), task.started) > BACKOFF_RESET_MS:
+                task.backoff_ms = BACKOFF_START_MS
+            self.logger.exception(error, f"Task {task.name} failed, restarting it in {task.backoff_ms} ms:")
+            task.state = BACKING_OFF
+            await asyncio.sleep_ms(task.backoff_ms)
+            task.backoff_ms = min(task.backoff_ms * 2, BACKOFF_MAX_MS)
+            task.restarts += 1
+
+    def _steps(self, task: _SupervisedTask, coro):
+        """
+        The proxy generator: steps `coro`, timing each step.
+        :return: The exception the coroutine raised, or None if it returned.
+        """
+        thrown = None
+        while True:
+            start = utime.ticks_us()
+            try:
+                if thrown is None:
+                    yielded = coro.send(None)
+                else:
+                    yielded = coro.throw(thrown)
+            except StopIteration:
+                return None
+            except Exception as e:
+                return e
+            finally:
+                elapsed = utime.ticks_diff(utime.ticks_us(), start)
+                task.steps += 1
+                task.busy_us += elapsed
+                if elapsed > task.max_step_us:
+                    task.max_step_us = elapsed
+            try:
+                yield yielded
+                thrown = None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as e:
+                # cancellation (or another exception the event loop throws in): pass it on to the coroutine
+                thrown = e
+
+    def healthy(self) -> bool:
+        """
+        Whether all critical tasks are running.
+        """
+        for task in self.tasks.values():
+            if task.critical and task.state != RUNNING:
+                return False
+        return True
+
+    def feed_watchdog(self) -> None:
+        """
+        Scheduler job: feed the watchdog if all critical tasks are running. Starts the watchdog on its first run.
+        """
+        if not self.watchdog_enabled:
+            return
+        if self.watchdog is None:
+            self.watchdog = machine.WDT(timeout=WATCHDOG_TIMEOUT_MS)
+        if self.healthy():
+            self.watchdog.feed()
+            self.feeds += 1
+        else:
+            self.feeds_withheld += 1
+
+    def stats(self) -> Dict:
+        """
+        Per task: state, restarts, steps, total run time and the longest step. And how often the watchdog was fed.
+        """
+        return {
+            'watchdog': {'enabled': self.watchdog_enabled, 'feeds': self.feeds, 'withheld': self.feeds_withheld},
+            'tasks': {name: {
+                'state': task.state,
+                'critical': task.critical,
+                'restarts': task.restarts,
+                'steps': task.steps,
+                'busy_ms': task.busy_us // 1000,
+                'avg_step_us': task.busy_us // task.steps if task.steps else 0,
+                'max_step_us': task.max_step_us,
+            } for name, task in self.tasks.items()},
+        }
@@ -16,9 +16,12 @@ class SX1262(SX126X):
     PREAMBLE_DETECT_32 = SX126X_GFSK_PREAMBLE_DETECT_32
     STATUS = ERROR
 
-    def __init__(self, spi_bus, clk, mosi, miso, cs, irq, rst, gpio):
-        super().__init__(spi_bus, clk, mosi, miso, cs, irq, rst, gpio)
+    def __init__(self, spi_bus, clk, mosi, miso, cs, irq, rst, gpio, spi=None):
+        super().__init__(spi_bus, clk, mosi, miso, cs, irq, rst, gpio, spi)
         self._callbackFunction = self._dummyFunction
+        self._rxDutyCyclePreamble = 0
+        self._rxDutyCycleMinSymbols = 8
+        self._cadActive = False
 
     def begin(self, freq=434.0, bw=125.0, sf=9, cr=7, syncWord=SX126X_SYNC_WORD_PRIVATE,
               power=14, currentLimit=60.0, preambleLength=8, implicit=False, implicitLen=0xFF,
@@ -148,17 +151,33 @@ class SX1262(SX126X):
     def setRxIq(self, rxIq):
         self._rxIq = rxIq
         if not self.blocking:
-            ASSERT(super().startReceive())
+            ASSERT(self._restartReceive())
 
     def setPreambleDetectorLength(self, preambleDetectorLength):
         self._preambleDetectorLength = preambleDetectorLength
         if not self.blocking:
-            ASSERT(super().startReceive())
+            ASSERT(self._restartReceive())
+
+    def setReceiveDutyCycle(self, senderPreambleLength=0, minSymbols=8):
+        """
+        Use duty-cycled RX (wake-on-radio) instead of continuous RX in non-blocking mode.
+        senderPreambleLength is the preamble length senders use; 0 goes back to continuous RX.
+        """
+        self._rxDutyCyclePreamble = senderPreambleLength
+        self._rxDutyCycleMinSymbols = minSymbols
+        if not self.blocking:
+            return self._restartReceive()
+        return ERR_NONE
+
+    def _restartReceive(self):
+        if self._rxDutyCyclePreamble:
+            return super().startReceiveDutyCycleAuto(self._rxDutyCyclePreamble, self._rxDutyCycleMinSymbols)
+        return super().startReceive()
 
     def setBlockingCallback(self, blocking, callback=None):
         self.blocking = blocking
         if not self.blocking:
-            state = super().startReceive()
+            state = self._restartReceive()
             ASSERT(state)
             if callback != None:
                 self._callbackFunction = callback
@@ -174,13 +193,63 @@ class SX1262(SX126X):
             super().clearDio1Action()
             return state
 
+    def isChannelBusy(self):
+        """
+        Listen-before-talk check: True if a packet is being received or CAD detects LoRa activity.
+        Also True if a received packet was waiting to be read; it's handed to the callback first.
+        Only for non-blocking mode; the radio goes back to receiving afterwards.
+        """
+        status = super().getIrqStatus()
+        if status & SX126X_IRQ_RX_DONE:
+            # a received packet that hasn't been read yet - CAD would clear its interrupt and lose it
+            self._onIRQ(None)
+            return True
+        if status & SX126X_IRQ_HEADER_VALID:
+            # halfway through receiving a packet - CAD would abort it
+            return True
+        # scanChannel() routes the CAD interrupts to DIO1; keep them away from the packet callback
+        self._cadActive = True
+        received = False
+        try:
+            ASSERT(super().standby())
+            # nothing comes in from here on, but a packet may have been completed since the status was read
+            received = bool(super().getIrqStatus() & SX126X_IRQ_RX_DONE)
+            if not received:
+                state = super().scanChannel()
+        finally:
+            self._cadActive = False
+            if received:
+                self._onIRQ(None)  # reads the packet, which restarts receiving
+            else:
+                ASSERT(self._restartReceive())
+        return received or state == LORA_DETECTED
+
+    def getLinkQuality(self):
+        """
+        RSSI (dBm) and SNR (dB) of the last received packet, like getRSSI() and getSNR() but with a single SPI command.
+        """
+        packetStatus = super().getPacketStatus()
+        rssi = -1.0 * int(packetStatus & 0xFF) / 2.0
+        snrPkt = int((packetStatus >> 8) & 0xFF)
+        if snrPkt >= 128:
+            snrPkt -= 256
+        return rssi, snrPkt / 4.0
+
     def recv(self, len=0, timeout_en=False, timeout_ms=0):
         if not self.blocking:
             return self._readData(len)
         else:
             return self._receive(len, timeout_en, timeout_ms)
 
-    def send(self, data):
+    def send(self, data, preambleLength=0):
+        if preambleLength:
+            # e.g. a long preamble so receivers in duty-cycled RX wake up in time. Only affects this packet.
+            defaultPreambleLength = self._preambleLength
+            self._preambleLength = preambleLength
+            try:
+                return self.send(data)
+            finally:
+                self._preambleLength = defaultPreambleLength
         if not self.blocking:
             return self._startTransmit(data)
         else:
@@ -240,7 +309,7 @@ class SX1262(SX126X):
         except AssertionError as e:
             state = list(ERROR.keys())[list(ERROR.values()).index(str(e))]
 
-        ASSERT(super().startReceive())
+        ASSERT(self._restartReceive())
 
         if state == ERR_NONE or state == ERR_CRC_MISMATCH:
             return bytes(data), state
@@ -261,7 +330,13 @@ class SX1262(SX126X):
         pass
 
     def _onIRQ(self, callback):
+        if self._cadActive:
+            return
+        if self._shared_spi and self.spi.bus.held_by_caller():
+            # the IRQ interrupted a transfer on this core: handle it once the transfer is done
+            self.spi.call_when_free(self._onIRQ, callback)
+            return
         events = self._events()
         if events & SX126X_IRQ_TX_DONE:
-            super().startReceive()
+            self._restartReceive()
         self._callbackFunction(events)
\ No newline at end of file
@@ -2,6 +2,10 @@ from _sx126x import *
 
 from sys import implementation
 
+import tracing
+
+_TRACE = const(0)  # set to 1 to compile in tracing.event() calls, see tracing.py
+
 if implementation.name == 'micropython':
     from machine import SPI, Pin
     from utime import sleep_ms, sleep_us, ticks_ms, ticks_us, ticks_diff
@@ -37,13 +41,19 @@ if implementation.name == 'circuitpython':
 
 class SX126X:
 
-    def __init__(self, spi_bus, clk, mosi, miso, cs, irq, rst, gpio):
+    def __init__(self, spi_bus, clk, mosi, miso, cs, irq, rst, gpio, spi=None):
         self._irq = irq
+        # spi: a device on a bus shared with other drivers (see internal_os/hardware/spibus.py), used instead of
+        # creating an SPI object. Every transfer is then a transaction on it.
+        self._shared_spi = spi is not None
         if implementation.name == 'micropython':
-          try:
-              self.spi = SPI(spi_bus, mode=SPI.MASTER, baudrate=2000000, pins=(clk, mosi, miso))        # Pycom variant uPy
-          except:
-              self.spi = SPI(spi_bus, baudrate=2000000, sck=Pin(clk), mosi=Pin(mosi), miso=Pin(miso))   # Generic variant uPy
+          if self._shared_spi:
+              self.spi = spi
+          else:
+            try:
+                self.spi = SPI(spi_bus, mode=SPI.MASTER, baudrate=2000000, pins=(clk, mosi, miso))        # Pycom variant uPy
+            except:
+                self.spi = SPI(spi_bus, baudrate=2000000, sck=Pin(clk), mosi=Pin(mosi), miso=Pin(miso))   # Generic variant uPy
           self.cs = Pin(cs, mode=Pin.OUT)
           self.irq = Pin(irq, mode=Pin.IN)
           self.rst = Pin(rst, mode=Pin.OUT)
@@ -404,7 +414,8 @@ class SX126X:
           self.irq.switch_to_input()
 
     def startTransmit(self, data, len_, addr=0):
-        print("radiodebug: startTransmit", len_, data)
+        if _TRACE:
+            tracing.event(tracing.TX_START, len_)
         if len_ > SX126X_MAX_PACKET_LENGTH:
             return ERR_PACKET_TOO_LONG
                 
@@ -433,8 +444,8 @@ class SX126X:
         else:
             return ERR_UNKNOWN
         ASSERT(state)
-
-        print("radiodebug: startTransmit after setPacketParams")
+        if _TRACE:
+            tracing.event(tracing.TX_PARAMS_SET, state)
         
         state = self.setDioIrqParams(SX126X_IRQ_TX_DONE | SX126X_IRQ_TIMEOUT, SX126X_IRQ_TX_DONE)
         ASSERT(state)
@@ -447,13 +458,13 @@ class SX126X:
         
         state = self.clearIrqStatus()
         ASSERT(state)
-
-        print("radiodebug: startTransmit after clearIrqStatus")
+        if _TRACE:
+            tracing.event(tracing.TX_BUFFER_WRITTEN, state)
         
         state = self.fixSensitivity()
         ASSERT(state)
-
-        print("radiodebug: startTransmit after fixSensitivity")
+        if _TRACE:
+            tracing.event(tracing.TX_SENSITIVITY_FIXED, state)
         
         state = self.setTx(SX126X_TX_TIMEOUT_NONE)
         ASSERT(state)
@@ -466,7 +477,8 @@ class SX126X:
           while self.gpio.value:
               yield_()
 
-        print("radiodebug: startTransmit done")
+        if _TRACE:
+            tracing.event(tracing.TX_DONE, state)
         return state
 		
     def startReceive(self, timeout=SX126X_RX_TIMEOUT_INF):
@@ -532,7 +544,8 @@ class SX126X:
         return self.startReceiveDutyCycle(wakePeriod, sleepPeriod)
             
     def startReceiveCommon(self):
-        state = self.setDioIrqParams(SX126X_IRQ_RX_DONE | SX126X_IRQ_TIMEOUT | SX126X_IRQ_CRC_ERR | SX126X_IRQ_HEADER_ERR, SX126X_IRQ_RX_DONE)
+        # HEADER_VALID is latched (not routed to DIO1) so listen-before-talk can tell a reception is in progress
+        state = self.setDioIrqParams(SX126X_IRQ_RX_DONE | SX126X_IRQ_TIMEOUT | SX126X_IRQ_CRC_ERR | SX126X_IRQ_HEADER_ERR | SX126X_IRQ_HEADER_VALID, SX126X_IRQ_RX_DONE)
         ASSERT(state)
         
         state = self.setBufferBaseAddress()
@@ -1185,19 +1198,13 @@ class SX126X:
         return self.setRfFrequency(frf)
 
     def fixSensitivity(self):
-        print("radiodebug: fixSensitivity")
         sensitivityConfig = bytearray(1)
         sensitivityConfig_mv = memoryview(sensitivityConfig)
-        state = self.readRegister(SX126X_REG_SENSITIVITY_CONFIG, sensitivityConfig_mv, 1)
-        print("radiodebug: sensitivityConfig read")
-        print(state)
-        #ASSERT(state)
-        print("radiodebug: sensitivityConfig before fix")
+        self.readRegister(SX126X_REG_SENSITIVITY_CONFIG, sensitivityConfig_mv, 1)
         if self.getPacketType() == SX126X_PACKET_TYPE_LORA and abs(self._bwKhz - 500.0) <= 0.001:
             sensitivityConfig_mv[0] &= 0xFB
         else:
             sensitivityConfig_mv[0] |= 0x04
-        print("radiodebug: sensitivityConfig after fix")
         return self.writeRegister(SX126X_REG_SENSITIVITY_CONFIG, sensitivityConfig, 1)
 
     def fixPaClamping(self):
@@ -1289,6 +1296,8 @@ class SX126X:
 
     def SPItransfer(self, cmd, cmdLen, write, dataOut, dataIn, numBytes, waitForBusy, timeout=5000):
         if implementation.name == 'micropython':
+          if self._shared_spi:
+              self.spi.begin()
           self.cs.value(0)
 
           start = ticks_ms()
@@ -1296,6 +1305,8 @@ class SX126X:
               yield_()
               if abs(ticks_diff(start, ticks_ms())) >= timeout:
                   self.cs.value(1)
+                  if self._shared_spi:
+                      self.spi.end()
                   return ERR_SPI_CMD_TIMEOUT
 
           for i in range(cmdLen):
@@ -1353,6 +1364,8 @@ class SX126X:
 
         if implementation.name == 'micropython':
           self.cs.value(1)
+          if self._shared_spi:
+              self.spi.end()
 
         if implementation.name == 'circuitpython':
           self.cs.value = True
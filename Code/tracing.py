@@ -0,0 +1,142 @@
+""" Binary event tracing for hot paths (radio driver, BadgeRadio) """
+import struct
+
+try:
+    from time import ticks_us
+except ImportError:
+    # host-side tools: plain integer microseconds
+    from time import perf_counter_ns
+
+    def ticks_us():
+        return (perf_counter_ns() // 1000) & 0x3FFFFFFF
+
+# Tracing costs nothing unless it's compiled in. Every module that traces has a
+#     _TRACE = const(0)
+# flag and wraps its calls in `if _TRACE:`, which the MicroPython compiler removes entirely while
+# the flag is 0. Set it to 1 in the modules you're interested in, then call tracing.enable().
+#
+# Each event is an 8-byte record: ticks_us (u32), event ID (u16), argument (u16), kept in a ring
+# buffer that's allocated once by enable(), so recording an event never allocates.
+
+# event IDs. Keep them stable: dumps from different firmware versions should decode the same way.
+TX_START = 1  # arg: frame length
+TX_PARAMS_SET = 2  # arg: state
+TX_BUFFER_WRITTEN = 3  # arg: state
+TX_SENSITIVITY_FIXED = 4  # arg: state
+TX_DONE = 5  # arg: state
+RX_DONE = 10  # arg: frame length
+RX_CRC_ERROR = 11
+RX_MALFORMED = 12  # arg: frame length
+RX_NOT_FOR_US = 13  # arg: dest
+RX_DUPLICATE = 14  # arg: message ID
+RX_QUEUED = 15  # arg: source
+DISPATCH = 16  # arg: app number
+TX_QUEUED = 20  # arg: dest
+TX_SEND = 21  # arg: dest
+TX_RELAY = 22  # arg: message ID
+TX_SENT = 23  # arg: frame length
+CHANNEL_BUSY = 24  # arg: backoff in ms
+RX_MODE_CONTINUOUS = 30
+RX_MODE_DUTY_CYCLE = 31
+
+EVENT_NAMES = {
+    TX_START: "TX_START",
+    TX_PARAMS_SET: "TX_PARAMS_SET",
+    TX_BUFFER_WRITTEN: "TX_BUFFER_WRITTEN",
+    TX_SENSITIVITY_FIXED: "TX_SENSITIVITY_FIXED",
+    TX_DONE: "TX_DONE",
+    RX_DONE: "RX_DONE",
+    RX_CRC_ERROR: "RX_CRC_ERROR",
+    RX_MALFORMED: "RX_MALFORMED",
+    RX_NOT_FOR_US: "RX_NOT_FOR_US",
+    RX_DUPLICATE: "RX_DUPLICATE",
+    RX_QUEUED: "RX_QUEUED",
+    DISPATCH: "DISPATCH",
+    TX_QUEUED: "TX_QUEUED",
+    TX_SEND: "TX_SEND",
+    TX_RELAY: "TX_RELAY",
+    TX_SENT: "TX_SENT",
+    CHANNEL_BUSY: "CHANNEL_BUSY",
+    RX_MODE_CONTINUOUS: "RX_MODE_CONTINUOUS",
+    RX_MODE_DUTY_CYCLE: "RX_MODE_DUTY_CYCLE",
+}
+
+_RECORD = "<IHH"
+_TICKS_MASK = 0x3FFFFFFF  # ticks_us wraps at 2**30
+_RECORD_SIZE = 8
+
+_buffer = None
+_capacity = 0
+_next = 0  # index of the next record to write
+_count = 0  # records written since the last clear, saturates at _capacity
+
+
+def enable(capacity: int = 256) -> None:
+    """
+    Start recording events.
+    :param capacity: Number of events kept; older events are overwritten.
+    """
+    global _buffer, _capacity
+    if _buffer is None or _capacity != capacity:
+        _buffer = bytearray(capacity * _RECORD_SIZE)
+        _capacity = capacity
+    clear()
+
+
+def disable() -> None:
+    """
+    Stop recording and free the buffer.
+    """
+    global _buffer, _capacity
+    _buffer = None
+    _capacity = 0
+    clear()
+
+
+def is_enabled() -> bool:
+    return _buffer is not None
+
+
+def clear() -> None:
+    global _next, _count
+    _next = 0
+    _count = 0
+
+
+def event(event_id: int, arg: int = 0) -> None:
+    """
+    Record an event. Safe to call from interrupt handlers.
+    :param arg: Any value that fits in 16 bits; negative values (e.g. error states) are stored in two's complement.
+    """
+    global _next, _count
+    if _buffer is None:
+        return
+    struct.pack_into(_RECORD, _buffer, _next * _RECORD_SIZE, ticks_us(), event_id, arg & 0xFFFF)
+    _next += 1
+    if _next == _capacity:
+        _next = 0
+    if _count < _capacity:
+        _count += 1
+
+
+def records() -> list:
+    """
+    The recorded events, oldest first, as (ticks_us, event_id, arg) tuples.
+    """
+    if _buffer is None:
+        return []
+    start = (_next - _count) % _capacity
+    return [struct.unpack_from(_RECORD, _buffer, ((start + i) % _capacity) * _RECORD_SIZE) for i in range(_count)]
+
+
+def dump() -> str:
+    """
+    The recorded events as text, one per line: microseconds since the previous event, event name, argument.
+    """
+    lines = []
+    previous = None
+    for timestamp, event_id, arg in records():
+        delta = 0 if previous is None else (timestamp - previous) & _TICKS_MASK
+        previous = timestamp
+        lines.append(f"+{delta} {EVENT_NAMES.get(event_id, event_id)} {arg}")
+    return "\n".join(lines)
@@ -0,0 +1,218 @@
+"""
+Load test of the real radio stack: hundreds of virtual badges, each running the firmware's BadgeRadio
+and AppManager.dispatch_packet, on one virtual LoRa channel (see virtualradio.py).
+
+A few badges send announcement-sized broadcasts to the messenger app, the rest optionally send
+small unicast packets to each other. Every badge runs BadgeRadio.service() every 100 ms of simulated
+time, like the radio job of the OS scheduler does while there is radio work. At the end it reports how many badges each announcement
+reached through app dispatch, queueing delays and channel statistics.
+
+Usage:
+    python badgesim.py --badges 500 --duration 120
+    python badgesim.py --badges 500 --relay           # with broadcast relaying on every badge
+    python badgesim.py --badges 200 --unicast 20000   # plus one unicast every 20 s per badge
+    python badgesim.py --badges 200 --unicast 20000 --reliable
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time as host_time
+
+import virtualradio  # installs the MicroPython shims, must come before the firmware imports
+from virtualradio import CODE_DIR, VirtualMedium, VirtualSX1262, clock
+
+from internal_os import apps as apps_module  # noqa: E402
+from internal_os.apps import AppManager, AppRepr  # noqa: E402
+from internal_os.hardware.radio import BROADCAST_ADDR, BadgeRadio  # noqa: E402
+import machine  # noqa: E402  (the fake one from virtualradio)
+
+MESSENGER_APP_NUMBER = 3
+ANNOUNCEMENT_LENGTH = 249  # struct.calcsize(MSG_FMT) in the messenger app
+SERVICE_PERIOD_US = 100_000  # the radio scheduler job runs service() every 100 ms while busy
+
+badges_by_address = {}
+
+
+class SimDisplay:
+    def __init__(self, asleep: bool) -> None:
+        self.is_asleep = asleep
+
+
+class SimAppManager(AppManager):
+    """
+    The real AppManager, registering the apps in Code/apps/ from the host filesystem.
+    """
+    def scan_for_apps(self) -> None:
+        apps_dir = os.path.join(CODE_DIR, 'apps')
+        for name in sorted(os.listdir(apps_dir)):
+            manifest_path = os.path.join(apps_dir, name, 'manifest.json')
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    self._register_app(AppRepr.from_json('/apps/' + name, f.read()))
+
+
+class CountingApp:
+    """
+    Stands in for an app's App instance when a packet wakes it up in the background.
+    """
+    def __init__(self, badge: 'SimBadge', app_repr: AppRepr) -> None:
+        self.badge = badge
+        self.app_number = app_repr.app_number
+
+    def on_packet(self, packet, in_foreground: bool) -> None:
+        self.badge.on_app_packet(self.app_number, packet)
+
+
+def sim_load_app(launch_logger, app_repr: AppRepr, timer=None):
+    # the real load_app() imports the app module from /apps on the badge's filesystem
+    badge = badges_by_address[int.from_bytes(machine.unique_id()[-2:], 'big')]
+    return CountingApp(badge, app_repr)
+
+
+apps_module.load_app = sim_load_app
+
+
+class SimOS:
+    """
+    The parts of InternalOS that BadgeRadio uses.
+    """
+    def __init__(self, asleep: bool) -> None:
+        self.display = SimDisplay(asleep)
+        self.apps = SimAppManager(None, self.display)
+
+
+class SimBadge:
+    def __init__(self, medium: VirtualMedium, address: int, x: float, y: float, asleep: bool, relay: bool) -> None:
+        self.medium = medium
+        self.address = address
+        self.sx = VirtualSX1262(medium, address, x, y)
+        badges_by_address[address] = self
+        self.os = SimOS(asleep)
+        self.radio = medium.run_as(self.sx, BadgeRadio, self.os, self.sx)
+        if relay:
+            self.radio.set_relay_mode(True)
+        self.received = {}  # app number -> packets dispatched
+        self.announcements = set()  # (source, sequence) of announcements seen
+        self.phase_us = random.randrange(SERVICE_PERIOD_US)
+
+    def start(self) -> None:
+        self.medium.schedule(self.phase_us, self.service)
+
+    def service(self) -> None:
+        self.medium.run_as(self.sx, self.radio.service)
+        self.medium.schedule(clock.now_us + SERVICE_PERIOD_US, self.service)
+
+    def send(self, dest: int, app_number: int, data: bytes, reliable: bool = False) -> None:
+        self.medium.run_as(self.sx, self.radio.add_to_tx_queue, dest, app_number, data, reliable)
+
+    def on_app_packet(self, app_number: int, packet) -> None:
+        self.received[app_number] = self.received.get(app_number, 0) + 1
+        if app_number == MESSENGER_APP_NUMBER:
+            self.announcements.add((packet.source, int.from_bytes(packet.data[:4], 'big')))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--badges', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=120, help="simulated seconds")
+    parser.add_argument('--area', type=float, default=150, help="side of the square venue, in m")
+    parser.add_argument('--senders', type=int, default=3, help="badges sending announcements")
+    parser.add_argument('--interval', type=float, default=20, help="seconds between announcements of one sender")
+    parser.add_argument('--unicast', type=float, default=0, help="mean ms between unicast packets per badge, 0 for none")
+    parser.add_argument('--reliable', action='store_true', help="send the unicast packets reliably (ACKs and retries)")
+    parser.add_argument('--relay', action='store_true', help="turn on broadcast relaying on every badge")
+    parser.add_argument('--awake', action='store_true', help="keep displays awake (no duty-cycled receive)")
+    parser.add_argument('--loss', type=float, default=0.0, help="random packet loss probability")
+    parser.add_argument('--path-loss-exponent', type=float, default=3.5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    medium = VirtualMedium(path_loss_exponent=args.path_loss_exponent, loss_rate=args.loss, seed=args.seed)
+    badges = [SimBadge(medium, i + 1, random.uniform(0, args.area), random.uniform(0, args.area),
+                       not args.awake, args.relay) for i in range(args.badges)]
+    for badge in badges:
+        badge.start()
+
+    sent_announcements = []
+    senders = badges[:args.senders]
+    sequence = [0]
+
+    def announce(sender: SimBadge) -> None:
+        sequence[0] += 1
+        data = sequence[0].to_bytes(4, 'big') + bytes(ANNOUNCEMENT_LENGTH - 4)
+        sender.send(BROADCAST_ADDR, MESSENGER_APP_NUMBER, data)
+        sent_announcements.append((sender.address, sequence[0], clock.now_us))
+        medium.schedule(clock.now_us + int(args.interval * 1e6), announce, sender)
+
+    for sender in senders:
+        medium.schedule(random.randrange(int(args.interval * 1e6)), announce, sender)
+
+    unicasts_sent = [0]
+
+    def chatter(badge: SimBadge) -> None:
+        peer = random.choice(badges)
+        if peer is not badge:
+            badge.send(peer.address, 0, bytes(16), args.reliable)
+            unicasts_sent[0] += 1
+        medium.schedule(clock.now_us + int(random.expovariate(1 / args.unicast) * 1000), chatter, badge)
+
+    if args.unicast:
+        for badge in badges:
+            medium.schedule(int(random.expovariate(1 / args.unicast) * 1000), chatter, badge)
+
+    started = host_time.perf_counter()
+    medium.run(int(args.duration * 1e6))
+    wall_s = host_time.perf_counter() - started
+
+    # only count announcements that had at least 10 s to spread
+    cutoff_us = int((args.duration - 10) * 1e6)
+    reach = []
+    for source, seq, sent_us in sent_announcements:
+        if sent_us <= cutoff_us:
+            reached = sum(1 for badge in badges if (source, seq) in badge.announcements)
+            reach.append(reached / (len(badges) - 1))
+
+    stats = [badge.radio.stats() for badge in badges]
+    results = {
+        'badges': args.badges,
+        'simulated_s': args.duration,
+        'wall_s': round(wall_s, 2),
+        'announcements': len(sent_announcements),
+        'announcement_reach_mean': round(statistics.mean(reach), 3) if reach else None,
+        'announcement_reach_min': round(min(reach), 3) if reach else None,
+        'unicasts_sent': unicasts_sent[0],
+        'unicasts_dispatched': sum(badge.received.get(0, 0) for badge in badges),
+        'reliable_delivered': sum(s['reliable']['delivered'] for s in stats),
+        'reliable_failed': sum(s['reliable']['failed'] for s in stats),
+        'retransmissions': sum(s['reliable']['retransmissions'] for s in stats),
+        'acks_standalone': sum(s['reliable']['acks_sent'] for s in stats),
+        'acks_piggybacked': sum(s['reliable']['acks_piggybacked'] for s in stats),
+        'ack_airtime_s': round(sum(s['ack_airtime_ms'] for s in stats) / 1000, 2),
+        'transmissions': medium.transmissions,
+        'airtime_s': round(medium.airtime_us / 1e6, 2),
+        'airtime_per_second': round(medium.airtime_us / (args.duration * 1e6), 3),  # above 1 means spatial reuse
+        'deliveries': medium.deliveries,
+        'collisions': medium.collisions,
+        'lost': medium.lost,
+        'crc_errors': sum(s['crc_errors'] for s in stats),
+        'lbt_backoffs': sum(s['lbt']['backoffs'] for s in stats),
+        'relayed': sum(s['relay']['relayed'] for s in stats),
+        'aggregated_packets': sum(s['aggregation']['packets'] for s in stats),
+        'aggregation_airtime_saved_s': round(sum(s['aggregation']['airtime_saved_ms'] for s in stats) / 1000, 2),
+        'tx_queue_latency_max_ms': max(s['tx_queue_latency_ms']['max'] for s in stats),
+        'rx_queue_latency_max_ms': max(s['rx_queue_latency_ms']['max'] for s in stats),
+        'tx_queue_max': max(s['tx_queue_size'] for s in stats),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for key, value in results.items():
+            print(f"{key:28} {value}")
+
+
+if __name__ == '__main__':
+    main()
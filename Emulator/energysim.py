@@ -0,0 +1,233 @@
+"""
+Energy estimate of a badge over a day of use, with and without low power mode.
+
+Runs the firmware's LowPowerManager on the virtual clock, with stand-ins for the display, buttons, radio
+and scheduler. machine.lightsleep() moves the clock forward until the sleep times out or the next
+button press or packet wakes the badge, like the real button and DIO1 interrupts do. The time spent in each
+state is multiplied by the typical current of the RP2040, the e-ink display and the SX1262 in that state.
+
+Usage:
+    python energysim.py --hours 24
+    python energysim.py --session-interval 600 --packets 120   # a busy badge
+    python energysim.py --inactivity 10 --battery-mah 1000
+"""
+import argparse
+import json
+import random
+
+import virtualradio  # installs the MicroPython shims, must come before the firmware imports
+from virtualradio import clock
+
+from internal_os import lpm as lpm_module  # noqa: E402
+from internal_os.lpm import LowPowerManager  # noqa: E402
+from internal_os.hardware import lora  # noqa: E402
+from internal_os.hardware.display import IDLE_TIMEOUT_MS  # noqa: E402
+from internal_os.hardware.radio import ACTIVE_HOLD_MS  # noqa: E402
+from internal_os.scheduler import TICK_MS  # noqa: E402
+import machine  # noqa: E402  (the fake one from virtualradio)
+
+# typical currents at 3.3 V, in mA
+MCU_ACTIVE_MA = 24.0  # RP2040 at 125 MHz, the app thread running its loop on core 1
+MCU_LIGHTSLEEP_MA = 1.4  # clocks stopped, XOSC and the timer running
+DISPLAY_REFRESH_MA = 8.0  # e-ink while it updates
+DISPLAY_SLEEP_MA = 0.001
+DISPLAY_REFRESH_MS = 1500  # one update per button press
+RADIO_BUSY_MS = 200  # radio work per received packet (dispatch, maybe a reply)
+JOB_PERIOD_MS = 1000  # the OS's periodic jobs all run about once a second while the badge is idle
+
+
+class SimPin:
+    def __init__(self, level: int) -> None:
+        self.level = level
+
+    def value(self) -> int:
+        return self.level
+
+
+class SimBadge:
+    """
+    The parts of InternalOS the LowPowerManager looks at.
+    """
+    def __init__(self) -> None:
+        self.buttons = self
+        self.display = self
+        self.radio = self
+        self.uart = self
+        self.apps = self
+        self.spi_bus = self
+        self.supervisor = self
+        self.scheduler = self
+        self.last_change = 0  # buttons.last_change
+        self.last_draw_ms = -IDLE_TIMEOUT_MS
+        self.last_packet_ms = -ACTIVE_HOLD_MS
+        self.busy_until_ms = 0
+        self.app_wakes = 0
+
+    @property
+    def is_asleep(self) -> bool:  # display.is_asleep
+        return clock.now_us // 1000 - self.last_draw_ms >= IDLE_TIMEOUT_MS
+
+    def has_pending_work(self) -> bool:  # radio
+        return clock.now_us // 1000 < self.busy_until_ms
+
+    def is_connected(self) -> bool:  # uart
+        return False
+
+    def can_sleep(self) -> bool:  # apps
+        return True
+
+    def notify_wake_from_lpm(self) -> None:  # apps
+        self.app_wakes += 1
+
+    def ms_until_next(self) -> int:  # scheduler
+        return JOB_PERIOD_MS - (clock.now_us // 1000) % JOB_PERIOD_MS
+
+    def restore(self) -> None:  # spi_bus
+        pass
+
+    def refresh(self) -> None:  # buttons
+        pass
+
+    def feed_watchdog(self) -> None:  # supervisor
+        pass
+
+
+def make_events(args, rng: random.Random):
+    """
+    :return: Sorted (ms, kind) of button presses in short sessions, and received packets.
+    """
+    end_ms = int(args.hours * 3_600_000)
+    events = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(1 / args.session_interval) * 1000
+        if t >= end_ms:
+            break
+        press = t
+        for _ in range(rng.randint(5, 20)):
+            events.append((int(press), 'button'))
+            press += rng.uniform(1000, 5000)
+    if args.packets:
+        t = 0.0
+        while True:
+            t += rng.expovariate(args.packets / 3_600_000)
+            if t >= end_ms:
+                break
+            events.append((int(t), 'packet'))
+    events.sort()
+    return events
+
+
+def simulate(args, use_lpm: bool) -> dict:
+    rng = random.Random(args.seed)
+    events = make_events(args, rng)
+    end_ms = int(args.hours * 3_600_000)
+    clock.now_us = 0
+    badge = SimBadge()
+    manager = LowPowerManager(badge, args.inactivity * 1000)
+    manager.enabled = use_lpm
+    manager._button_int = SimPin(1)
+    manager._radio_dio1 = SimPin(0)
+    totals = {'display_refresh_ms': 0, 'radio_continuous_ms': 0}
+    next_event = [0]
+
+    def advance(to_ms: int) -> None:
+        """
+        Move the clock to to_ms (no events in between) and account the display and radio time.
+        """
+        now = clock.now_us // 1000
+        if to_ms <= now:
+            return
+        refresh_until = badge.last_draw_ms + DISPLAY_REFRESH_MS
+        totals['display_refresh_ms'] += max(0, min(to_ms, refresh_until) - now)
+        continuous_until = max(badge.last_draw_ms + IDLE_TIMEOUT_MS, badge.last_packet_ms + ACTIVE_HOLD_MS)
+        totals['radio_continuous_ms'] += max(0, min(to_ms, continuous_until) - now)
+        clock.now_us = to_ms * 1000
+
+    def apply(kind: str) -> None:
+        now = clock.now_us // 1000
+        if kind == 'button':
+            badge.last_change = now
+            badge.last_draw_ms = now
+            manager._button_int.level = 1
+        else:
+            badge.last_packet_ms = now
+            badge.busy_until_ms = now + RADIO_BUSY_MS
+            manager._radio_dio1.level = 0
+
+    def lightsleep(ms: int) -> None:
+        now = clock.now_us // 1000
+        wake = now + ms
+        if next_event[0] < len(events) and events[next_event[0]][0] < wake:
+            wake = max(now, events[next_event[0]][0])
+            kind = events[next_event[0]][1]
+            if kind == 'button':
+                manager._button_int.level = 0
+            else:
+                manager._radio_dio1.level = 1
+        advance(wake)
+
+    machine.lightsleep = lightsleep
+    next_check = lpm_module.CHECK_MS
+    while clock.now_us // 1000 < end_ms:
+        target = min(next_check, end_ms)
+        if next_event[0] < len(events):
+            target = min(target, events[next_event[0]][0])
+        advance(target)
+        now = clock.now_us // 1000
+        while next_event[0] < len(events) and events[next_event[0]][0] <= now:
+            apply(events[next_event[0]][1])
+            next_event[0] += 1
+        if now >= next_check:
+            delay = manager.check()
+            ticks = max(1, (delay + TICK_MS - 1) // TICK_MS)
+            next_check = clock.now_us // 1000 + ticks * TICK_MS
+
+    stats = manager.stats()
+    asleep_ms = manager.asleep_ms
+    awake_ms = end_ms - asleep_ms
+    refresh_ms = totals['display_refresh_ms']
+    continuous_ms = totals['radio_continuous_ms']
+    mcu_ma = (MCU_ACTIVE_MA * awake_ms + MCU_LIGHTSLEEP_MA * asleep_ms) / end_ms
+    display_ma = (DISPLAY_REFRESH_MA * refresh_ms + DISPLAY_SLEEP_MA * (end_ms - refresh_ms)) / end_ms
+    radio_ma = (lora.average_rx_current_ma(0) * continuous_ms
+                + lora.average_rx_current_ma(lora.LONG_PREAMBLE_LENGTH, lora.DUTY_CYCLE_MIN_SYMBOLS) * (end_ms - continuous_ms)) / end_ms
+    total_ma = mcu_ma + display_ma + radio_ma
+    return {
+        'low_power_mode': use_lpm,
+        'mcu_ma': round(mcu_ma, 3),
+        'display_ma': round(display_ma, 3),
+        'radio_ma': round(radio_ma, 3),
+        'total_ma': round(total_ma, 3),
+        'battery_hours': round(args.battery_mah / total_ma, 1),
+        'asleep_share': stats['asleep_share'],
+        'sleeps': stats['sleeps'],
+        'wakes': stats['wakes'],
+        'app_wakes': badge.app_wakes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hours', type=float, default=24, help="simulated hours")
+    parser.add_argument('--session-interval', type=float, default=1200, help="mean seconds between sessions of button presses")
+    parser.add_argument('--packets', type=float, default=30, help="received packets per hour")
+    parser.add_argument('--inactivity', type=int, default=lpm_module.INACTIVITY_MS // 1000, help="seconds without input before low power mode")
+    parser.add_argument('--battery-mah', type=float, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = [simulate(args, False), simulate(args, True)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"low power mode {'on' if result['low_power_mode'] else 'off'}:")
+        for key, value in result.items():
+            if key != 'low_power_mode':
+                print(f"  {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
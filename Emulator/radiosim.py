@@ -0,0 +1,268 @@
+"""
+Host-side simulation of many badges sharing one LoRa channel.
+
+Places badges at random in a square venue and runs the firmware's own relay and channel-access
+logic (FloodRelay, ListenBeforeTalk) on each of them, so settings can be compared before they're
+flashed. Two scenarios:
+
+  flood       a few badges send announcement-sized broadcasts; reports delivery ratio and total
+              airtime for each network size.
+  contention  every badge sends small unicast packets to a random neighbour; reports goodput with
+              and without listen-before-talk.
+
+Usage:
+    python radiosim.py --sizes 25,50,100,200,400 --mode trickle
+    python radiosim.py --mode flood      # relay every first copy, no suppression
+    python radiosim.py --mode none       # no relaying at all (direct range only)
+    python radiosim.py --scenario contention --load 3000
+"""
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+
+# the firmware modules used here are plain Python, so they can be imported straight from Code/.
+# append rather than prepend: Code/ has its own logging.py that only works on MicroPython.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Code'))
+
+from internal_os.hardware import lora  # noqa: E402
+from internal_os.hardware.mac import ListenBeforeTalk  # noqa: E402
+from internal_os.hardware.mesh import FloodRelay  # noqa: E402
+
+HEADER_LENGTH = 6
+ANNOUNCEMENT_LENGTH = 249  # struct.calcsize(MSG_FMT) in the messenger app
+TX_PACING_MS = 1500  # BadgeRadio.get_time_to_next_send()
+SERVICE_PERIOD_MS = 100  # BadgeRadio.run_service() interval while busy
+
+
+class SimBadge:
+    def __init__(self, index: int, x: float, y: float, relay: FloodRelay, lbt: ListenBeforeTalk) -> None:
+        self.index = index
+        self.address = index + 1
+        self.x = x
+        self.y = y
+        self.relay = relay
+        self.lbt = lbt
+        self.neighbours = []
+        self.queue = []  # unicast frames waiting to be sent
+        # run_service() runs every 100 ms, each badge with its own phase
+        self.phase_us = random.randrange(SERVICE_PERIOD_MS * 1000)
+        self.last_tx_us = -TX_PACING_MS * 1000
+        self.tx_until_us = -1
+        self.incoming = []  # transmissions currently arriving: [frame, collided]
+        self.received = set()
+        self.poll_scheduled_us = None
+
+    def next_service_tick(self, t_us: int) -> int:
+        period = SERVICE_PERIOD_MS * 1000
+        ticks = -(-(t_us - self.phase_us) // period)
+        return self.phase_us + ticks * period
+
+
+class Simulation:
+    def __init__(self, badges) -> None:
+        self.badges = badges
+        self.events = []
+        self.seq = 0
+        self.transmissions = 0
+        self.total_airtime_us = 0
+        self.collisions = 0
+        self.delivered = 0
+
+    def schedule(self, t_us: int, action, *args) -> None:
+        self.seq += 1
+        heapq.heappush(self.events, (t_us, self.seq, action, args))
+
+    def run(self, until_us: int = None) -> None:
+        while self.events:
+            t_us, _, action, args = heapq.heappop(self.events)
+            if until_us is not None and t_us > until_us:
+                break
+            action(t_us, *args)
+
+    def transmit(self, t_us: int, badge: SimBadge, frame, length: int) -> None:
+        airtime_us = lora.time_on_air_us(length)
+        end_us = t_us + airtime_us
+        badge.last_tx_us = t_us
+        badge.tx_until_us = end_us
+        badge.lbt.on_sent()
+        self.transmissions += 1
+        self.total_airtime_us += airtime_us
+        # half duplex: anything the sender was receiving is lost
+        for rx in badge.incoming:
+            rx[1] = True
+        for neighbour in badge.neighbours:
+            rx = [frame, neighbour.tx_until_us > t_us]
+            for other in neighbour.incoming:
+                # overlapping frames destroy each other (no capture effect)
+                other[1] = True
+                rx[1] = True
+            neighbour.incoming.append(rx)
+            self.schedule(end_us, self.receive_done, neighbour, rx)
+
+    def receive_done(self, t_us: int, badge: SimBadge, rx) -> None:
+        badge.incoming.remove(rx)
+        frame, collided = rx
+        if collided:
+            self.collisions += 1
+            return
+        if frame[0] == "flood":
+            _, source, message_id, hops = frame
+            if badge.relay.on_receive(source, message_id, hops, frame, t_us // 1000):
+                badge.received.add((source, message_id))
+            self.schedule_poll(badge, t_us)
+        elif frame[2] == badge.address:
+            self.delivered += 1
+
+    def schedule_poll(self, badge: SimBadge, t_us: int) -> None:
+        if badge.queue:
+            at_us = t_us
+        else:
+            deadline_ms = badge.relay.next_deadline()
+            if deadline_ms is None:
+                return
+            at_us = max(t_us, deadline_ms * 1000)
+        at_us = max(at_us, badge.last_tx_us + TX_PACING_MS * 1000, t_us + badge.lbt.wait_ms(t_us // 1000) * 1000)
+        at_us = badge.next_service_tick(at_us)
+        if badge.poll_scheduled_us is not None and badge.poll_scheduled_us <= at_us:
+            return
+        badge.poll_scheduled_us = at_us
+        self.schedule(at_us, self.poll, badge)
+
+    def poll(self, t_us: int, badge: SimBadge) -> None:
+        # one BadgeRadio.run_service() pass
+        if badge.poll_scheduled_us != t_us:
+            return  # superseded by an earlier poll
+        badge.poll_scheduled_us = None
+        now_ms = t_us // 1000
+        deadline_ms = badge.relay.next_deadline()
+        has_work = badge.queue or (deadline_ms is not None and deadline_ms <= now_ms)
+        if has_work and t_us - badge.last_tx_us >= TX_PACING_MS * 1000 and badge.lbt.wait_ms(now_ms) == 0:
+            # CAD hears anything a neighbour is transmitting right now
+            if badge.lbt.enabled and badge.incoming and badge.lbt.on_busy(now_ms):
+                pass
+            else:
+                frame = badge.relay.next_due(now_ms)
+                if frame is not None:
+                    _, source, message_id, hops = frame
+                    self.transmit(t_us, badge, ("flood", source, message_id, hops + 1), HEADER_LENGTH + ANNOUNCEMENT_LENGTH)
+                elif badge.queue:
+                    frame, length = badge.queue.pop(0)
+                    self.transmit(t_us, badge, frame, length)
+        self.schedule_poll(badge, t_us + 1)
+
+    def originate(self, t_us: int, badge: SimBadge) -> None:
+        message_id = badge.relay.originate(badge.address)
+        badge.received.add((badge.address, message_id))
+        self.transmit(badge.next_service_tick(t_us), badge, ("flood", badge.address, message_id, 0), HEADER_LENGTH + ANNOUNCEMENT_LENGTH)
+
+    def generate(self, t_us: int, badge: SimBadge, mean_interval_ms: float, length: int) -> None:
+        if badge.neighbours:
+            dest = random.choice(badge.neighbours)
+            badge.queue.append((("data", badge.address, dest.address), length))
+            self.schedule_poll(badge, t_us)
+        self.schedule(t_us + int(random.expovariate(1 / mean_interval_ms) * 1000), self.generate, badge, mean_interval_ms, length)
+
+
+def build_network(count: int, args, mode: str = "none", lbt: bool = False):
+    badges = []
+    for i in range(count):
+        relay = FloodRelay(hop_limit=args.hop_limit, redundancy=args.redundancy if mode == "trickle" else 1_000_000,
+                           interval_ms=args.interval)
+        relay.enabled = mode != "none"
+        access = ListenBeforeTalk()
+        access.enabled = lbt
+        badges.append(SimBadge(i, random.uniform(0, args.side), random.uniform(0, args.side), relay, access))
+    for a in badges:
+        for b in badges:
+            if a is not b and math.hypot(a.x - b.x, a.y - b.y) <= args.range:
+                a.neighbours.append(b)
+    return badges
+
+
+def simulate_flood(count: int, args) -> dict:
+    badges = build_network(count, args, args.mode, args.lbt)
+    sim = Simulation(badges)
+    senders = random.sample(badges, min(args.messages, count))
+    for i, sender in enumerate(senders):
+        sim.schedule(i * args.spacing * 1000, sim.originate, sender)
+    sim.run()
+
+    delivered = sum(len(b.received) for b in badges) - len(senders)
+    expected = len(senders) * (count - 1)
+    return {
+        "delivery": delivered / expected if expected else 1.0,
+        "transmissions": sim.transmissions,
+        "airtime_s": sim.total_airtime_us / 1_000_000,
+        "collisions": sim.collisions,
+        "backoffs": sum(b.lbt.backoff_count for b in badges),
+    }
+
+
+def simulate_contention(count: int, args, lbt: bool) -> dict:
+    random.seed(args.seed)
+    badges = build_network(count, args, lbt=lbt)
+    sim = Simulation(badges)
+    for badge in badges:
+        sim.schedule(random.randrange(args.load * 1000), sim.generate, badge, args.load, HEADER_LENGTH + args.payload)
+    duration_us = args.duration * 1_000_000
+    sim.run(until_us=duration_us)
+    return {
+        "goodput": sim.delivered / args.duration,
+        "delivery": sim.delivered / sim.transmissions if sim.transmissions else 1.0,
+        "collisions": sim.collisions,
+        "backoffs": sum(b.lbt.backoff_count for b in badges),
+        "forced": sum(b.lbt.forced_count for b in badges),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["flood", "contention"], default="flood")
+    parser.add_argument("--sizes", default="25,50,100,200,400", help="comma-separated badge counts")
+    parser.add_argument("--side", type=float, default=200.0, help="side of the square venue in metres")
+    parser.add_argument("--range", type=float, default=60.0, help="radio range in metres")
+    parser.add_argument("--seed", type=int, default=1)
+    flood = parser.add_argument_group("flood scenario")
+    flood.add_argument("--mode", choices=["trickle", "flood", "none"], default="trickle")
+    flood.add_argument("--lbt", action="store_true", help="use listen-before-talk")
+    flood.add_argument("--messages", type=int, default=5, help="number of broadcasts to send")
+    flood.add_argument("--spacing", type=int, default=30_000, help="time between broadcasts in ms")
+    flood.add_argument("--hop-limit", type=int, default=4)
+    flood.add_argument("--redundancy", type=int, default=2)
+    flood.add_argument("--interval", type=int, default=4000, help="relay interval in ms")
+    contention = parser.add_argument_group("contention scenario")
+    contention.add_argument("--load", type=int, default=3000, help="mean time between packets per badge in ms")
+    contention.add_argument("--payload", type=int, default=32, help="payload size in bytes")
+    contention.add_argument("--duration", type=int, default=120, help="simulated time in seconds")
+    args = parser.parse_args()
+    sizes = [int(n) for n in args.sizes.split(",")]
+
+    if args.scenario == "flood":
+        length = HEADER_LENGTH + ANNOUNCEMENT_LENGTH
+        print(f"mode={args.mode} lbt={'on' if args.lbt else 'off'} venue={args.side:.0f}m range={args.range:.0f}m "
+              f"frame={length}B airtime={lora.time_on_air_us(length) / 1000:.1f}ms")
+        print(f"{'badges':>7} {'delivery':>9} {'tx':>6} {'airtime':>9} {'collisions':>11} {'backoffs':>9}")
+        for count in sizes:
+            random.seed(args.seed)
+            result = simulate_flood(count, args)
+            print(f"{count:>7} {result['delivery']:>8.1%} {result['transmissions']:>6} "
+                  f"{result['airtime_s']:>8.2f}s {result['collisions']:>11} {result['backoffs']:>9}")
+    else:
+        length = HEADER_LENGTH + args.payload
+        print(f"venue={args.side:.0f}m range={args.range:.0f}m frame={length}B "
+              f"airtime={lora.time_on_air_us(length) / 1000:.1f}ms load=1 packet/{args.load}ms per badge")
+        print(f"{'':>7} {'---- without LBT ----':>32} {'------------- with LBT -------------':>48}")
+        print(f"{'badges':>7} {'goodput':>11} {'delivery':>9} {'collisions':>11} "
+              f"{'goodput':>11} {'delivery':>9} {'collisions':>11} {'backoffs':>9} {'forced':>7}")
+        for count in sizes:
+            off = simulate_contention(count, args, lbt=False)
+            on = simulate_contention(count, args, lbt=True)
+            print(f"{count:>7} {off['goodput']:>9.2f}/s {off['delivery']:>8.1%} {off['collisions']:>11} "
+                  f"{on['goodput']:>9.2f}/s {on['delivery']:>8.1%} {on['collisions']:>11} {on['backoffs']:>9} {on['forced']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+A virtual LoRa channel for running the real BadgeRadio on a computer.
+
+VirtualSX1262 stands in for the SX1262 driver: BadgeRadio(internal_os, sx=VirtualSX1262(...)) runs
+unchanged on top of it. Every virtual radio is attached to a VirtualMedium, which models
+  - airtime, from the badge's LoRa settings (lora.time_on_air_us, the same formula as the SX1262),
+  - path loss (log-distance with random shadowing) and receiver sensitivity,
+  - collisions: a frame is lost if another transmission overlaps it at a similar signal strength,
+    and the receiver reports a CRC error, like the real radio does most of the time,
+  - random packet loss,
+  - half-duplex radios (a badge can't receive while it transmits) and duty-cycled receive.
+
+Importing this module installs the MicroPython shims the firmware needs on CPython: const(),
+time.ticks_*() driven by a virtual clock, gc.mem_free()/mem_alloc(), and small `machine`,
+`micropython`, `utime` and `framebuf` modules. machine.unique_id() returns the address of the badge that is currently being run, which the
+simulator sets with VirtualMedium.run_as(). Import it before anything from Code/.
+"""
+import builtins
+import gc
+import heapq
+import math
+import os
+import random
+import sys
+import time
+import types
+
+# Code/ has its own logging.py that only works on MicroPython, so append rather than prepend.
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Code')
+sys.path.append(CODE_DIR)
+
+
+class VirtualClock:
+    """
+    Simulated time in microseconds. Nothing moves it but the simulator.
+    """
+    TICKS_PERIOD = 1 << 30  # MicroPython's ticks wrap at 2**30
+
+    def __init__(self) -> None:
+        self.now_us = 0
+
+    def ticks_ms(self) -> int:
+        return (self.now_us // 1000) % self.TICKS_PERIOD
+
+    def ticks_us(self) -> int:
+        return self.now_us % self.TICKS_PERIOD
+
+    @classmethod
+    def ticks_add(cls, ticks: int, delta: int) -> int:
+        return (ticks + delta) % cls.TICKS_PERIOD
+
+    @classmethod
+    def ticks_diff(cls, end: int, start: int) -> int:
+        half = cls.TICKS_PERIOD // 2
+        return ((end - start + half) % cls.TICKS_PERIOD) - half
+
+
+clock = VirtualClock()
+_current_address = [0]  # the badge whose code is running right now
+
+
+class _FakePeripheral:
+    """
+    Pin, SPI, I2C, ...: accepts any constructor arguments and method calls and does nothing.
+    """
+    IN = OUT = PULL_UP = PULL_DOWN = IRQ_RISING = IRQ_FALLING = IRQ_RXIDLE = ONE_SHOT = PERIODIC = 0
+
+    def __init__(self, *args, **kwargs) -> None:
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: 0
+
+
+def _install_shims() -> None:
+    builtins.const = lambda value: value
+
+    for name in ('ticks_ms', 'ticks_us'):
+        setattr(time, name, getattr(clock, name))
+    time.ticks_add = VirtualClock.ticks_add
+    time.ticks_diff = VirtualClock.ticks_diff
+    time.sleep_ms = lambda ms: None
+    time.sleep_us = lambda us: None
+    sys.modules['utime'] = time
+
+    # the RP2040 has about 200 kB of heap for Python
+    gc.mem_free = lambda: 128 * 1024
+    gc.mem_alloc = lambda: 64 * 1024
+
+    machine = types.ModuleType('machine')
+    for name in ('Pin', 'SPI', 'I2C', 'UART', 'PWM', 'RTC', 'WDT', 'Timer'):
+        setattr(machine, name, type(name, (_FakePeripheral,), {}))
+    machine.unique_id = lambda: _current_address[0].to_bytes(8, 'big')
+    machine.soft_reset = lambda: None
+    machine.PWRON_RESET, machine.WDT_RESET = 1, 3
+    machine.reset_cause = lambda: machine.PWRON_RESET
+    machine.freq = lambda *args: 125_000_000
+    machine.lightsleep = lambda ms=None: None
+    sys.modules['machine'] = machine
+
+    micropython = types.ModuleType('micropython')
+    micropython.const = builtins.const
+    micropython.mem_info = lambda *args: None
+    micropython.alloc_emergency_exception_buf = lambda size: None
+    micropython.schedule = lambda func, arg: func(arg)
+    sys.modules['micropython'] = micropython
+
+    framebuf = types.ModuleType('framebuf')
+    framebuf.MONO_HLSB = framebuf.MONO_VLSB = framebuf.MONO_HMSB = 0
+    framebuf.FrameBuffer = type('FrameBuffer', (_FakePeripheral,), {})
+    sys.modules['framebuf'] = framebuf
+
+
+_install_shims()
+
+from _sx126x import ERR_CRC_MISMATCH, ERR_NONE, SX126X_IRQ_RX_DONE, SX126X_IRQ_TX_DONE  # noqa: E402
+from internal_os.hardware import lora  # noqa: E402
+
+SENSITIVITY_DBM = -116.0  # SX1262 at SF7, BW500
+CAD_THRESHOLD_DBM = -118.0  # CAD picks up preambles a little below the demodulation limit
+CAPTURE_THRESHOLD_DB = 6.0  # a frame survives interference that is at least this much weaker
+
+
+class Transmission:
+    def __init__(self, sender: 'VirtualSX1262', frame: bytes, preamble_length: int, start_us: int) -> None:
+        self.sender = sender
+        self.frame = frame
+        self.preamble_length = preamble_length
+        self.start_us = start_us
+        self.end_us = start_us + lora.time_on_air_us(len(frame), preamble_length)
+        self.rssi = {}  # receiver -> received power in dBm, for receivers that can hear it
+
+
+class VirtualMedium:
+    """
+    The shared channel, plus the event queue that drives the simulation.
+    :param path_loss_exponent: 2 in free space, 3-4 in a crowded hall.
+    :param shadowing_db: Standard deviation of the random per-reception fading.
+    :param loss_rate: Probability that an otherwise good frame is lost anyway.
+    """
+    def __init__(self, path_loss_exponent: float = 3.5, reference_loss_db: float = 40.0,
+                 shadowing_db: float = 4.0, loss_rate: float = 0.0, seed: int = None) -> None:
+        self.path_loss_exponent = path_loss_exponent
+        self.reference_loss_db = reference_loss_db
+        self.shadowing_db = shadowing_db
+        self.loss_rate = loss_rate
+        self.random = random.Random(seed)
+        self.radios = []
+        self.active = []  # transmissions on the air
+        self._recently_ended = []  # finished transmissions that may still overlap active ones
+        self._events = []
+        self._seq = 0
+
+        self.transmissions = 0
+        self.airtime_us = 0
+        self.deliveries = 0
+        self.collisions = 0
+        self.lost = 0  # random loss, duty-cycle misses and half-duplex misses
+
+    # event queue
+
+    def schedule(self, t_us: int, action, *args) -> None:
+        self._seq += 1
+        heapq.heappush(self._events, (t_us, self._seq, action, args))
+
+    def run(self, until_us: int) -> None:
+        while self._events and self._events[0][0] <= until_us:
+            t_us, _, action, args = heapq.heappop(self._events)
+            clock.now_us = t_us
+            action(*args)
+        clock.now_us = until_us
+
+    def run_as(self, radio: 'VirtualSX1262', func, *args):
+        """
+        Call func with machine.unique_id() returning the address of the badge that owns `radio`.
+        """
+        previous = _current_address[0]
+        _current_address[0] = radio.address
+        try:
+            return func(*args)
+        finally:
+            _current_address[0] = previous
+
+    # radio propagation
+
+    def attach(self, radio: 'VirtualSX1262') -> None:
+        self.radios.append(radio)
+
+    def mean_rssi(self, sender: 'VirtualSX1262', receiver: 'VirtualSX1262') -> float:
+        distance = max(1.0, math.hypot(sender.x - receiver.x, sender.y - receiver.y))
+        return sender.power_dbm - self.reference_loss_db - 10 * self.path_loss_exponent * math.log10(distance)
+
+    def transmit(self, sender: 'VirtualSX1262', frame: bytes, preamble_length: int) -> Transmission:
+        tx = Transmission(sender, frame, preamble_length, clock.now_us)
+        for radio in self.radios:
+            if radio is sender:
+                continue
+            mean = self.mean_rssi(sender, radio)
+            if mean + 3 * self.shadowing_db < CAD_THRESHOLD_DBM:
+                continue
+            rssi = mean + self.random.gauss(0, self.shadowing_db)
+            if rssi >= CAD_THRESHOLD_DBM:
+                tx.rssi[radio] = rssi
+        self.active.append(tx)
+        self.transmissions += 1
+        self.airtime_us += tx.end_us - tx.start_us
+        self.schedule(tx.end_us, self._end_transmission, tx)
+        return tx
+
+    def channel_busy(self, radio: 'VirtualSX1262') -> bool:
+        return any(radio in tx.rssi for tx in self.active)
+
+    def _end_transmission(self, tx: Transmission) -> None:
+        self.active.remove(tx)
+        tx.sender._on_tx_done()
+        overlapping = [other for other in self.active if other.start_us < tx.end_us] + \
+                      [other for other in self._recently_ended if other.end_us > tx.start_us]
+        for radio, rssi in tx.rssi.items():
+            if rssi < SENSITIVITY_DBM:
+                continue
+            if radio.transmitting_since is not None and radio.transmitting_since < tx.end_us or \
+                    radio.last_tx_end_us > tx.start_us:
+                self.lost += 1  # half duplex: it was sending while this frame arrived
+                continue
+            if not radio.is_listening_for(tx, self.random):
+                self.lost += 1
+                continue
+            interference = [other.rssi[radio] for other in overlapping if other is not tx and radio in other.rssi]
+            if interference and max(interference) > rssi - CAPTURE_THRESHOLD_DB:
+                self.collisions += 1
+                self.run_as(radio, radio._on_rx, tx.frame, ERR_CRC_MISMATCH, rssi)
+                continue
+            if self.random.random() < self.loss_rate:
+                self.lost += 1
+                continue
+            self.deliveries += 1
+            self.run_as(radio, radio._on_rx, tx.frame, ERR_NONE, rssi)
+        self._recently_ended.append(tx)
+        # keep just enough history to judge overlaps with frames still on the air
+        oldest_start = min((other.start_us for other in self.active), default=clock.now_us)
+        self._recently_ended = [other for other in self._recently_ended if other.end_us > oldest_start]
+
+
+class VirtualSX1262:
+    """
+    Drop-in replacement for the SX1262 driver, as far as BadgeRadio uses it.
+    """
+    TX_DONE = SX126X_IRQ_TX_DONE
+    RX_DONE = SX126X_IRQ_RX_DONE
+
+    def __init__(self, medium: VirtualMedium, address: int, x: float, y: float) -> None:
+        self.medium = medium
+        self.address = address
+        self.x = x
+        self.y = y
+        self.power_dbm = lora.TX_POWER_DBM
+        self.preamble_length = lora.PREAMBLE_LENGTH
+        self.callback = None
+        self.transmitting_since = None
+        self.last_tx_end_us = -1
+        self.duty_cycle_preamble = 0
+        self._rx = (b'', ERR_NONE, 0.0, 0.0)
+        self.tx_count = 0
+        self.rx_count = 0
+        medium.attach(self)
+
+    def begin(self, power=lora.TX_POWER_DBM, preambleLength=lora.PREAMBLE_LENGTH, **kwargs) -> int:
+        self.power_dbm = power
+        self.preamble_length = preambleLength
+        return ERR_NONE
+
+    def setBlockingCallback(self, blocking, callback=None) -> int:
+        self.callback = callback
+        return ERR_NONE
+
+    def setReceiveDutyCycle(self, senderPreambleLength=0, minSymbols=lora.DUTY_CYCLE_MIN_SYMBOLS) -> int:
+        self.duty_cycle_preamble = senderPreambleLength
+        return ERR_NONE
+
+    def send(self, data, preambleLength=0):
+        if self.transmitting_since is not None:
+            # the real driver would still be busy with the previous frame
+            return 0, ERR_NONE
+        self.transmitting_since = clock.now_us
+        self.tx_count += 1
+        self.medium.transmit(self, bytes(data), preambleLength or self.preamble_length)
+        return len(data), ERR_NONE
+
+    def recv(self, len=0, timeout_en=False, timeout_ms=0):
+        frame, status, _, _ = self._rx
+        return frame, status
+
+    def getLinkQuality(self):
+        _, _, rssi, snr = self._rx
+        return rssi, snr
+
+    def isChannelBusy(self) -> bool:
+        return self.medium.channel_busy(self)
+
+    def is_listening_for(self, tx: Transmission, rng: random.Random) -> bool:
+        """
+        Whether a duty-cycled receiver wakes up in time for this frame.
+        """
+        if not self.duty_cycle_preamble or tx.preamble_length >= self.duty_cycle_preamble:
+            return True
+        periods = lora.rx_duty_cycle_us(self.duty_cycle_preamble)
+        if periods is None:
+            return True
+        listen_us, sleep_us = periods
+        # it catches a short preamble only if it happens to be listening when the frame starts
+        return rng.random() < listen_us / (listen_us + sleep_us)
+
+    def _on_tx_done(self) -> None:
+        self.transmitting_since = None
+        self.last_tx_end_us = clock.now_us
+
+    def _on_rx(self, frame: bytes, status: int, rssi: float) -> None:
+        self.rx_count += 1
+        snr = max(-20.0, min(12.0, rssi - SENSITIVITY_DBM - 7.0))
+        self._rx = (frame, status, rssi, snr)
+        if self.callback:
+            self.callback(self.RX_DONE)
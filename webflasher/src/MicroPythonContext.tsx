@@ -44,6 +44,10 @@ class QueuedMicroPython {
   async uploadFileFromString(path: string, content: string) {
     return this.queue.enqueue(() => this.mp.uploadFileFromString(path, content));
   }
+
+  async createFile(path: string) {
+    return this.queue.enqueue(() => this.mp.createFile(path));
+  }
 }
 
 type MicroPythonContextType = {
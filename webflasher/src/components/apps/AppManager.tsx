@@ -118,8 +118,10 @@ export default function AppManager({ apps, onAppListChange }: AppManagerProps) {
                     await mp.uploadFile(`${appPath}/${path}`, content);
                 }
             }
+            // have the badge scan its apps again instead of trusting its app index on the next boot
+            await mp.createFile("/rescan_apps");
 
-            setStatus("App uploaded successfully");
+            setStatus("App uploaded successfully, restart the badge to see it");
             const updatedApps = [...apps, {
                 path: appPath,
                 manifest: manifest,
@@ -137,7 +139,8 @@ export default function AppManager({ apps, onAppListChange }: AppManagerProps) {
         try {
             setStatus(`Deleting ${app.manifest.displayName}...`);
             await mp.removeFolder(app.path);
-            setStatus(`${app.manifest.displayName} deleted successfully`);
+            await mp.createFile("/rescan_apps");
+            setStatus(`${app.manifest.displayName} deleted successfully, restart the badge to update its app list`);
             const updatedApps = apps.filter(a => a.path !== app.path);
             onAppListChange(updatedApps);
         } catch (error) {